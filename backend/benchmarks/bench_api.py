@@ -0,0 +1,275 @@
+"""
+Load-test the HTTP API and record throughput, latency and query counts.
+
+    python -m benchmarks.bench_api --orders 100000 --concurrency 1 8 32
+    python -m benchmarks.bench_api --compare benchmarks/results/api-<old>.json
+
+The app is served from a threaded WSGI server inside this process (or any
+server given with --url that uses the same database) and every scenario is
+driven over real HTTP by --concurrency client threads. Each run is written
+to benchmarks/results/api-<commit>-<time>.json; --compare prints the change
+against an earlier run. Query counts come from an X-Query-Count header the
+in-process server adds and are missing with --url.
+"""
+import argparse
+import json
+import platform
+import subprocess
+import threading
+import time
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
+from http.client import HTTPConnection
+from pathlib import Path
+from urllib.parse import urlencode, urlsplit
+
+from benchmarks.common import BASE_DIR, seed_orders, setup, summarize
+
+RESULTS_DIR = BASE_DIR / 'benchmarks' / 'results'
+CUSTOMER = 'bench-customer@example.com'
+STAFF = 'bench-staff@example.com'
+PASSWORD = 'benchpass123'
+
+QUERY_COUNT_HEADER = 'X-Query-Count'
+
+
+def query_counting(application):
+    # Counts the queries of each request in the thread that serves it.
+    from django.db import connection
+
+    def app(environ, start_response):
+        count = 0
+
+        def counter(execute, sql, params, many, context):
+            nonlocal count
+            count += 1
+            return execute(sql, params, many, context)
+
+        def counting_start_response(status, headers, exc_info=None):
+            return start_response(status, [*headers, (QUERY_COUNT_HEADER, str(count))], exc_info)
+
+        with connection.execute_wrapper(counter):
+            return application(environ, counting_start_response)
+
+    return app
+
+
+def start_server():
+    from django.core.handlers.wsgi import WSGIHandler
+    from django.core.servers.basehttp import ThreadedWSGIServer, WSGIRequestHandler
+
+    class QuietHandler(WSGIRequestHandler):
+        def log_message(self, *args):
+            pass
+
+    server = ThreadedWSGIServer(('127.0.0.1', 0), QuietHandler, allow_reuse_address=True)
+    server.set_app(query_counting(WSGIHandler()))
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    host, port = server.server_address
+    return server, f'http://{host}:{port}'
+
+
+class Client:
+    def __init__(self, base_url):
+        parts = urlsplit(base_url)
+        self.host, self.port = parts.hostname, parts.port
+        self.prefix = parts.path.rstrip('/')
+
+    def request(self, method, path, body=None, token=None):
+        headers = {'Accept': 'application/json'}
+        if body is not None:
+            body = json.dumps(body).encode()
+            headers['Content-Type'] = 'application/json'
+        if token:
+            headers['Authorization'] = f'Bearer {token}'
+        connection = HTTPConnection(self.host, self.port, timeout=60)
+        try:
+            connection.request(method, self.prefix + path, body=body, headers=headers)
+            response = connection.getresponse()
+            payload = response.read()
+            queries = response.getheader(QUERY_COUNT_HEADER)
+            return response.status, payload, None if queries is None else int(queries)
+        finally:
+            connection.close()
+
+
+def prepare_users():
+    from django.contrib.auth import get_user_model
+    from orders.models import Order
+
+    User = get_user_model()
+    customer = User.objects.filter(username=CUSTOMER).first()
+    if customer is None:
+        customer = User.objects.create_user(CUSTOMER, CUSTOMER, PASSWORD)
+        # Hand the benchmark customer a realistic share of existing orders.
+        donor = Order.objects.values_list('user_id', flat=True).first()
+        Order.objects.filter(user_id=donor).update(user=customer)
+    if not User.objects.filter(username=STAFF).exists():
+        User.objects.create_user(STAFF, STAFF, PASSWORD, is_staff=True)
+
+
+def build_scenarios(client, tariff_id):
+    tokens = {}
+    for username in (CUSTOMER, STAFF):
+        status, payload, _ = client.request(
+            'POST', '/api/v1/users/token/', {'username': username, 'password': PASSWORD})
+        assert status == 200, (status, payload)
+        tokens[username] = json.loads(payload)['access']
+
+    def get(path, params=None, user=None):
+        url = f'{path}?{urlencode(params)}' if params else path
+        return lambda: ('GET', url, None, tokens.get(user))
+
+    order = {
+        'tariff': tariff_id,
+        'project_name': 'Нагрузочный тест',
+        'project_description': 'Заказ, созданный бенчмарком API',
+        'requirements': 'Адаптивный дизайн',
+        'reference_links': ['https://example.com'],
+        'deadline': '2030-12-31',
+    }
+    orders = '/api/v1/orders/'
+    # name -> (request factory, share of --requests)
+    return {
+        'token obtain': (lambda: ('POST', '/api/v1/users/token/',
+                                  {'username': CUSTOMER, 'password': PASSWORD}, None), 0.1),
+        'tariff list': (get('/api/v1/tariffs/'), 1),
+        'order list customer': (get(orders, user=CUSTOMER), 1),
+        'order list staff': (get(orders, user=STAFF), 1),
+        'order list status filter': (get(orders, {'status': 'IN_PROGRESS'}, STAFF), 1),
+        'order list date range': (get(orders, {'created_at_after': '2025-01-01',
+                                                'deadline_before': '2030-01-01'}, STAFF), 1),
+        'order list search': (get(orders, {'search': 'интернет магазин'}, STAFF), 1),
+        'order list ordering': (get(orders, {'ordering': 'deadline'}, STAFF), 1),
+        'order list cursor': (get(orders, {'pagination': 'cursor'}, STAFF), 1),
+        'order create': (lambda: ('POST', orders, order, tokens[CUSTOMER]), 0.5),
+    }
+
+
+def run_scenario(client, factory, requests, concurrency):
+    def one(_):
+        method, path, body, token = factory()
+        started = time.perf_counter()
+        status, _, queries = client.request(method, path, body, token)
+        return time.perf_counter() - started, status, queries
+
+    with ThreadPoolExecutor(concurrency) as pool:
+        list(pool.map(one, range(min(concurrency * 2, requests))))  # warm up
+        started = time.perf_counter()
+        outcomes = list(pool.map(one, range(requests)))
+        elapsed = time.perf_counter() - started
+
+    statuses = Counter(status for _, status, _ in outcomes)
+    queries = [count for _, _, count in outcomes if count is not None]
+    return {
+        'requests': requests,
+        'concurrency': concurrency,
+        'errors': sum(count for status, count in statuses.items() if status >= 400),
+        'statuses': {str(status): count for status, count in sorted(statuses.items())},
+        'rps': requests / elapsed,
+        'queries_per_request': sum(queries) / len(queries) if queries else None,
+        **summarize([latency for latency, _, _ in outcomes]),
+    }
+
+
+def git_commit():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=BASE_DIR,
+                              capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return 'unknown'
+
+
+def print_results(results):
+    print(f'\n{"scenario":<28}{"conc":>6}{"req/s":>9}{"p50":>10}{"p95":>10}{"p99":>10}'
+          f'{"queries":>9}{"errors":>8}')
+    for result in results:
+        queries = result['queries_per_request']
+        print(f'{result["scenario"]:<28}{result["concurrency"]:>6}{result["rps"]:>9.0f}'
+              f'{result["p50_ms"]:>8.1f}ms{result["p95_ms"]:>8.1f}ms{result["p99_ms"]:>8.1f}ms'
+              f'{"-" if queries is None else f"{queries:.1f}":>9}{result["errors"]:>8}')
+
+
+def compare(path, results):
+    previous = json.loads(Path(path).read_text())
+    before = {(r['scenario'], r['concurrency']): r for r in previous['results']}
+    print(f'\nchange against {previous["commit"]} ({previous["started_at"]})')
+    print(f'{"scenario":<28}{"conc":>6}{"req/s":>10}{"p50":>10}{"p99":>10}')
+    for result in results:
+        old = before.get((result['scenario'], result['concurrency']))
+        if old is None:
+            continue
+        change = {key: (result[key] / old[key] - 1) * 100 if old[key] else 0
+                  for key in ('rps', 'p50_ms', 'p99_ms')}
+        print(f'{result["scenario"]:<28}{result["concurrency"]:>6}'
+              f'{change["rps"]:>+9.1f}%{change["p50_ms"]:>+9.1f}%{change["p99_ms"]:>+9.1f}%')
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--orders', type=int, default=100_000)
+    parser.add_argument('--requests', type=int, default=500,
+                        help='Requests per scenario and concurrency level')
+    parser.add_argument('--concurrency', type=int, nargs='+', default=[1, 8])
+    parser.add_argument('--scenario', action='append',
+                        help='Only run scenarios whose name contains this text')
+    parser.add_argument('--url', help='Benchmark a running server instead')
+    parser.add_argument('--output', help='Result file (default: benchmarks/results/)')
+    parser.add_argument('--compare', help='Earlier result file to compare against')
+    parser.add_argument('--db', help='SQLite file to use instead of BENCH_DB')
+    args = parser.parse_args()
+
+    setup(args.db)
+    import django
+    from django.conf import settings
+    from django.db import connection
+    from tariffs.models import Tariff
+
+    # Measure the endpoints, not the rate limits
+    settings.THROTTLE_RATES = {}
+    seed_orders(args.orders)
+    prepare_users()
+    if args.url:
+        base_url = args.url
+    else:
+        _, base_url = start_server()
+    client = Client(base_url)
+    scenarios = build_scenarios(client, Tariff.objects.values_list('id', flat=True).first())
+    if args.scenario:
+        scenarios = {name: scenario for name, scenario in scenarios.items()
+                     if any(part in name for part in args.scenario)}
+
+    started_at = datetime.now(timezone.utc).isoformat(timespec='seconds')
+    results = []
+    for name, (factory, share) in scenarios.items():
+        for concurrency in args.concurrency:
+            requests = max(concurrency, round(args.requests * share))
+            print(f'{name} x{concurrency}...', flush=True)
+            results.append({'scenario': name,
+                            **run_scenario(client, factory, requests, concurrency)})
+
+    commit = git_commit()
+    report = {
+        'commit': commit,
+        'started_at': started_at,
+        'server': args.url or 'in-process ThreadedWSGIServer',
+        'database': connection.vendor,
+        'orders': args.orders,
+        'python': platform.python_version(),
+        'django': django.get_version(),
+        'results': results,
+    }
+    output = Path(args.output) if args.output else (
+        RESULTS_DIR / f'api-{commit}-{started_at[:19].replace(":", "")}.json')
+    output.parent.mkdir(parents=True, exist_ok=True)
+    output.write_text(json.dumps(report, indent=2, ensure_ascii=False))
+
+    print_results(results)
+    print(f'\nresults written to {output}')
+    if args.compare:
+        compare(args.compare, results)
+
+
+if __name__ == '__main__':
+    main()
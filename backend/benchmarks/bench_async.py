@@ -0,0 +1,219 @@
+"""
+Compare the sync views under WSGI with the async views under ASGI at high
+concurrency with a share of slow clients.
+
+    python -m benchmarks.bench_async --concurrency 200 --slow-ratio 0.25
+
+Each mode runs in its own server process against the benchmark database:
+
+* wsgi: config.wsgi behind a WSGI server with a fixed pool of --threads
+  threads, like gunicorn's gthread worker;
+* asgi: config.asgi with ASYNC_VIEWS=True behind uvicorn (pip install uvicorn).
+
+Slow clients trickle their request out over --slow-delay seconds. A WSGI
+thread is tied up for that whole time, an ASGI server only starts working
+once the request is complete; the "fast" columns show what this does to the
+latency of everybody else. Both servers run a single process.
+"""
+import argparse
+import asyncio
+import os
+import socket
+import subprocess
+import sys
+import time
+from collections import Counter
+
+from benchmarks.common import seed_orders, setup, summarize
+
+SERVER_MODES = ('wsgi', 'asgi')
+
+
+def serve(mode, port, threads, db):
+    os.environ['ASYNC_VIEWS'] = str(mode == 'asgi')
+    setup(db, migrate=False)
+
+    if mode == 'asgi':
+        import uvicorn
+        from django.core.asgi import get_asgi_application
+
+        uvicorn.run(get_asgi_application(), host='127.0.0.1', port=port,
+                    log_level='warning', backlog=4096)
+        return
+
+    from concurrent.futures import ThreadPoolExecutor
+
+    from django.core.servers.basehttp import WSGIRequestHandler, WSGIServer
+    from django.core.wsgi import get_wsgi_application
+
+    class QuietHandler(WSGIRequestHandler):
+        def log_message(self, *args):
+            pass
+
+    class PooledWSGIServer(WSGIServer):
+        request_queue_size = 4096
+
+        def __init__(self, *args, **kwargs):
+            super().__init__(*args, **kwargs)
+            self.pool = ThreadPoolExecutor(threads)
+
+        def process_request(self, request, client_address):
+            self.pool.submit(self.process_request_thread, request, client_address)
+
+        def process_request_thread(self, request, client_address):
+            try:
+                self.finish_request(request, client_address)
+            except Exception:
+                self.handle_error(request, client_address)
+            finally:
+                self.shutdown_request(request)
+
+    server = PooledWSGIServer(('127.0.0.1', port), QuietHandler)
+    server.set_app(get_wsgi_application())
+    server.serve_forever()
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+def start_server(mode, threads, db):
+    port = free_port()
+    command = [sys.executable, '-m', 'benchmarks.bench_async', '--serve', mode,
+               '--port', str(port), '--threads', str(threads)]
+    if db:
+        command += ['--db', db]
+    process = subprocess.Popen(command)
+    deadline = time.monotonic() + 30
+    while time.monotonic() < deadline:
+        if process.poll() is not None:
+            raise SystemExit(f'{mode} server exited with {process.returncode}')
+        try:
+            socket.create_connection(('127.0.0.1', port), timeout=1).close()
+            return process, port
+        except OSError:
+            time.sleep(0.2)
+    process.kill()
+    raise SystemExit(f'{mode} server did not start')
+
+
+async def fetch(port, path, token, slow_delay):
+    request = (f'GET {path} HTTP/1.1\r\nHost: 127.0.0.1:{port}\r\n'
+               f'Authorization: Bearer {token}\r\nConnection: close\r\n\r\n').encode()
+    started = time.perf_counter()
+    try:
+        reader, writer = await asyncio.open_connection('127.0.0.1', port)
+        if slow_delay:
+            chunk = len(request) // 4 + 1
+            for offset in range(0, len(request), chunk):
+                writer.write(request[offset:offset + chunk])
+                await writer.drain()
+                await asyncio.sleep(slow_delay / 4)
+        else:
+            writer.write(request)
+            await writer.drain()
+        status_line = await reader.readline()
+        await reader.read()
+        writer.close()
+        status = int(status_line.split()[1])
+    except (OSError, IndexError, ValueError):
+        status = 0
+    return time.perf_counter() - started, status
+
+
+async def load(port, paths, token, args, requests):
+    outcomes = []
+    queue = asyncio.Queue()
+    for index in range(requests):
+        queue.put_nowait(index)
+
+    async def client(number):
+        # The first slow_ratio of the clients are slow for the whole run.
+        slow = number < args.concurrency * args.slow_ratio
+        while not queue.empty():
+            index = queue.get_nowait()
+            latency, status = await fetch(port, paths[index % len(paths)], token,
+                                          args.slow_delay if slow else 0)
+            outcomes.append((slow, latency, status))
+
+    started = time.perf_counter()
+    await asyncio.gather(*(client(number) for number in range(args.concurrency)))
+    return outcomes, time.perf_counter() - started
+
+
+def report(mode, outcomes, elapsed):
+    statuses = Counter(status for _, _, status in outcomes)
+    fast = [latency for slow, latency, _ in outcomes if not slow]
+    return {
+        'mode': mode,
+        'rps': len(outcomes) / elapsed,
+        'errors': sum(count for status, count in statuses.items() if not 200 <= status < 400),
+        'all': summarize([latency for _, latency, _ in outcomes]),
+        'fast': summarize(fast) if fast else None,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--orders', type=int, default=100_000)
+    parser.add_argument('--requests', type=int, default=3000)
+    parser.add_argument('--concurrency', type=int, default=200)
+    parser.add_argument('--threads', type=int, default=16,
+                        help='Thread pool size of the WSGI server')
+    parser.add_argument('--slow-ratio', type=float, default=0.25,
+                        help='Share of clients that send their requests slowly')
+    parser.add_argument('--slow-delay', type=float, default=0.5,
+                        help='Seconds a slow client takes to send a request')
+    parser.add_argument('--mode', choices=SERVER_MODES, action='append')
+    parser.add_argument('--db', help='SQLite file to use instead of BENCH_DB')
+    parser.add_argument('--serve', choices=SERVER_MODES, help=argparse.SUPPRESS)
+    parser.add_argument('--port', type=int, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.serve:
+        serve(args.serve, args.port, args.threads, args.db)
+        return
+
+    setup(args.db)
+    from benchmarks.bench_api import CUSTOMER, prepare_users
+    from django.contrib.auth import get_user_model
+    from orders.models import Order
+    from tariffs.models import Tariff
+    from users.tokens import UserRefreshToken
+
+    seed_orders(args.orders)
+    prepare_users()
+    customer = get_user_model().objects.get(username=CUSTOMER)
+    token = str(UserRefreshToken.for_user(customer).access_token)
+    order_id = Order.objects.filter(user=customer).values_list(
+        'id', flat=True).first()
+    tariff_id = Tariff.objects.filter(is_active=True).values_list('id', flat=True).first()
+    paths = ['/api/v1/orders/', '/api/v1/orders/?status=NEW', f'/api/v1/orders/{order_id}/',
+             '/api/v1/tariffs/', f'/api/v1/tariffs/{tariff_id}/']
+
+    results = []
+    for mode in args.mode or SERVER_MODES:
+        process, port = start_server(mode, args.threads, args.db)
+        try:
+            asyncio.run(load(port, paths, token, args, args.concurrency))  # warm up
+            outcomes, elapsed = asyncio.run(load(port, paths, token, args, args.requests))
+        finally:
+            process.terminate()
+            process.wait()
+        results.append(report(mode, outcomes, elapsed))
+
+    print(f'\n{args.requests} requests, {args.concurrency} clients, '
+          f'{args.slow_ratio:.0%} slow ({args.slow_delay}s), WSGI threads {args.threads}')
+    print(f'{"mode":<6}{"req/s":>8}{"errors":>8}{"p50":>10}{"p95":>10}{"p99":>10}'
+          f'{"fast p50":>11}{"fast p99":>11}')
+    for result in results:
+        fast = result['fast'] or {'p50_ms': 0, 'p99_ms': 0}
+        print(f'{result["mode"]:<6}{result["rps"]:>8.0f}{result["errors"]:>8}'
+              f'{result["all"]["p50_ms"]:>8.1f}ms{result["all"]["p95_ms"]:>8.1f}ms'
+              f'{result["all"]["p99_ms"]:>8.1f}ms{fast["p50_ms"]:>9.1f}ms{fast["p99_ms"]:>9.1f}ms')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,138 @@
+"""
+Order attachment uploads, downloads and thumbnails.
+
+    python -m benchmarks.bench_attachments --size-mb 256 --chunk-mb 8
+
+The app is served from a threaded WSGI server inside this process. A
+--size-mb file is uploaded from disk in --chunk-mb chunks over HTTP, then
+downloaded whole and in 1 MiB ranges; the peak memory Python allocates
+(tracemalloc, client and server together) is reported for both. Last, a
+12-megapixel JPEG is thumbnailed. Files go to a temporary ATTACHMENT_ROOT.
+"""
+import argparse
+import io
+import json
+import os
+import tempfile
+import time
+import tracemalloc
+from http.client import HTTPConnection
+from urllib.parse import urlsplit
+
+from benchmarks.bench_api import start_server
+from benchmarks.common import setup, summarize
+
+MB = 1024 * 1024
+
+
+def request(base_url, method, url, token, body=None, headers=()):
+    parts = urlsplit(base_url)
+    connection = HTTPConnection(parts.hostname, parts.port, timeout=120)
+    try:
+        connection.request(method, urlsplit(url).path, body=body,
+                           headers={'Authorization': f'Bearer {token}', **dict(headers)})
+        response = connection.getresponse()
+        received = 0
+        while data := response.read(MB):
+            received += len(data)
+            last = data
+        return response.status, received, last if received else b''
+    finally:
+        connection.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--size-mb', type=int, default=256)
+    parser.add_argument('--chunk-mb', type=int, default=8)
+    parser.add_argument('--ranges', type=int, default=200)
+    parser.add_argument('--db', help='SQLite file to use instead of BENCH_DB')
+    args = parser.parse_args()
+
+    setup(args.db)
+    from django.conf import settings
+    from django.contrib.auth import get_user_model
+    from django.urls import reverse
+    from PIL import Image
+    from orders import attachments
+    from orders.models import Order
+    from tariffs.models import Tariff
+    from users.tokens import UserRefreshToken
+
+    root = tempfile.TemporaryDirectory()
+    settings.ATTACHMENT_ROOT = root.name
+    settings.ATTACHMENT_MAX_SIZE = max(settings.ATTACHMENT_MAX_SIZE, args.size_mb * MB)
+    settings.ATTACHMENT_THUMBNAIL_WORKERS = 0
+    user, _ = get_user_model().objects.get_or_create(username='bench-attachments')
+    tariff = Tariff.objects.first() or Tariff.objects.create(
+        name='Базовый', description='Базовый', price='49999.00', features=[])
+    order = Order.objects.create(user=user, tariff=tariff, project_name='Attachments',
+                                 project_description='', requirements='',
+                                 total_price=tariff.price)
+    token = str(UserRefreshToken.for_user(user).access_token)
+    _, base_url = start_server()
+
+    size, chunk_size = args.size_mb * MB, args.chunk_mb * MB
+    source = os.path.join(root.name, 'source.bin')
+    with open(source, 'wb') as file:
+        for _ in range(0, size, MB):
+            file.write(os.urandom(MB))
+    _, _, body = request(base_url, 'POST', reverse('orders:order-attachments', args=[order.pk]),
+                         token, json.dumps({'filename': 'large.bin', 'size': size}),
+                         {'Content-Type': 'application/json'})
+    url = json.loads(body)['url']
+
+    tracemalloc.start()
+    started = time.perf_counter()
+    with open(source, 'rb') as file:
+        for start in range(0, size, chunk_size):
+            length = min(chunk_size, size - start)
+            file.seek(start)
+            status, _, body = request(base_url, 'PATCH', url, token,
+                                      attachments.RangeFile(file, length), {
+                                          'Content-Type': 'application/octet-stream',
+                                          'Content-Length': str(length),
+                                          'Content-Range': f'bytes {start}-{start + length - 1}/{size}',
+                                      })
+            assert status in (200, 201), body
+    elapsed = time.perf_counter() - started
+    _, peak = tracemalloc.get_traced_memory()
+    attachment = json.loads(body)
+    print(f'Upload of {args.size_mb} MiB in {args.chunk_mb} MiB chunks: '
+          f'{args.size_mb / elapsed:.0f} MiB/s, peak allocated {peak / MB:.1f} MiB')
+
+    tracemalloc.reset_peak()
+    started = time.perf_counter()
+    status, received, _ = request(base_url, 'GET', attachment['url'], token)
+    assert (status, received) == (200, size), (status, received)
+    elapsed = time.perf_counter() - started
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    print(f'Download: {args.size_mb / elapsed:.0f} MiB/s, peak allocated {peak / MB:.1f} MiB')
+
+    samples = []
+    for i in range(args.ranges):
+        start = (i * 7919 * MB) % (size - MB)
+        started = time.perf_counter()
+        status, received, _ = request(base_url, 'GET', attachment['url'], token,
+                                      headers={'Range': f'bytes={start}-{start + MB - 1}'})
+        samples.append(time.perf_counter() - started)
+        assert (status, received) == (206, MB), (status, received)
+    stats = summarize(samples)
+    print(f'1 MiB ranges: p50 {stats["p50_ms"]:.2f}ms, p99 {stats["p99_ms"]:.2f}ms')
+
+    buffer = io.BytesIO()
+    Image.effect_noise((4000, 3000), 60).convert('RGB').save(buffer, 'jpeg', quality=90)
+    path = attachments.blob_path('0' * 64)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_bytes(buffer.getvalue())
+    started = time.perf_counter()
+    attachments.make_thumbnail('0' * 64)
+    print(f'Thumbnail of a 4000x3000 JPEG ({len(buffer.getvalue()) / MB:.1f} MiB): '
+          f'{(time.perf_counter() - started) * 1000:.0f}ms')
+    order.delete()
+    root.cleanup()
+
+
+if __name__ == '__main__':
+    main()
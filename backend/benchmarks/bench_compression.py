@@ -0,0 +1,67 @@
+"""
+Bytes on the wire and CPU per request for response compression and
+conditional GET.
+
+    python -m benchmarks.bench_compression --orders 100000
+
+For each endpoint, prints the body size and the time to compress it with
+gzip and brotli (config.compression). The detail endpoints also get the time
+of a full 200 response and of a 304 revalidation with If-None-Match.
+"""
+import argparse
+
+from benchmarks.common import seed_orders, setup, summarize, timeit
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--orders', type=int, default=100_000)
+    parser.add_argument('--repeat', type=int, default=200)
+    parser.add_argument('--db', help='SQLite file to use instead of BENCH_DB')
+    args = parser.parse_args()
+
+    setup(args.db)
+    from django.contrib.auth import get_user_model
+    from django.test import Client
+    from config import compression
+    from orders.models import Order
+    from users.tokens import UserRefreshToken
+
+    seed_orders(args.orders)
+    order = Order.objects.select_related('user').latest('id')
+    user = order.user
+    client = Client(HTTP_AUTHORIZATION=f'Bearer {UserRefreshToken.for_user(user).access_token}')
+    staff = get_user_model().objects.filter(is_staff=True).first()
+    staff_client = Client(
+        HTTP_AUTHORIZATION=f'Bearer {UserRefreshToken.for_user(staff).access_token}')
+
+    endpoints = [
+        ('orders page', staff_client, '/api/v1/orders/'),
+        ('orders compact', staff_client, '/api/v1/orders/?compact=true'),
+        ('order detail', client, f'/api/v1/orders/{order.id}/'),
+        ('user detail', client, '/api/v1/users/me/'),
+        ('tariffs', client, '/api/v1/tariffs/'),
+    ]
+    print(f'{"":<16}{"bytes":>8}' + ''.join(
+        f'{coding + " bytes":>12}{coding + " cpu":>11}' for coding in compression.CODINGS))
+    for name, http, url in endpoints:
+        content = http.get(url).content
+        line = f'{name:<16}{len(content):>8}'
+        for compress, _ in compression.CODINGS.values():
+            cpu = summarize(timeit(lambda: compress(content), args.repeat))['p50_ms']
+            line += f'{len(compress(content)):>12}{cpu:>9.3f}ms'
+        print(line)
+
+    print(f'\n{"":<16}{"200 p50":>10}{"304 p50":>10}')
+    for name, http, url in endpoints:
+        etag = http.get(url).get('ETag')
+        if etag is None:
+            continue
+        full = summarize(timeit(lambda: http.get(url), args.repeat))['p50_ms']
+        revalidated = summarize(timeit(lambda: http.get(url, HTTP_IF_NONE_MATCH=etag),
+                                       args.repeat))['p50_ms']
+        print(f'{name:<16}{full:>8.2f}ms{revalidated:>8.2f}ms')
+
+
+if __name__ == '__main__':
+    main()
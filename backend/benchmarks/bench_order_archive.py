@@ -0,0 +1,112 @@
+"""
+Size of the orders table and order list latency before and after archiving
+finished orders.
+
+    python -m benchmarks.bench_order_archive --orders 1000000 --requests 200
+
+Seeds --orders orders over three years, times the order list (staff, one
+customer, a status filter) with django.test.Client, moves the orders
+archivable after --older-than days with orders.archive, then times the list
+again, with and without ?include_archived=true. Archiving changes the
+database: point --db at a copy. --vacuum reclaims the freed pages before the
+second measurement.
+"""
+import argparse
+import time
+from datetime import timedelta
+
+from benchmarks.common import seed_orders, setup, summarize
+
+
+def table_size(model):
+    # Table and index pages, in bytes
+    from django.db import connection
+
+    if connection.vendor != 'sqlite':
+        return None
+    with connection.cursor() as cursor:
+        cursor.execute(
+            'SELECT SUM(pgsize) FROM dbstat WHERE name IN '
+            '(SELECT name FROM sqlite_master WHERE tbl_name = %s)', [model._meta.db_table])
+        return cursor.fetchone()[0] or 0
+
+
+def measure(client, token, params, requests):
+    from django.urls import reverse
+
+    url = reverse('orders:order-list-create')
+    samples = []
+    for _ in range(requests):
+        started = time.perf_counter()
+        response = client.get(url, params, HTTP_AUTHORIZATION=f'Bearer {token}')
+        samples.append(time.perf_counter() - started)
+        assert response.status_code == 200, response.content
+    return summarize(samples)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--orders', type=int, default=1_000_000)
+    parser.add_argument('--requests', type=int, default=200)
+    parser.add_argument('--older-than', type=int, help='Days (default: ORDER_ARCHIVE_AFTER_DAYS)')
+    parser.add_argument('--vacuum', action='store_true')
+    parser.add_argument('--db', help='SQLite file to use instead of BENCH_DB')
+    args = parser.parse_args()
+
+    setup(args.db)
+    from django.contrib.auth import get_user_model
+    from django.db import connection
+    from django.db.models import Count
+    from django.test import Client
+    from orders import archive
+    from orders.models import ArchivedOrder, Order
+    from users.tokens import UserRefreshToken
+
+    User = get_user_model()
+    seed_orders(args.orders)
+    staff, _ = User.objects.get_or_create(username='bench-archive-staff',
+                                          defaults={'is_staff': True})
+    customer = User.objects.get(pk=Order.objects.values('user').annotate(n=Count('id'))
+                                .order_by('-n')[0]['user'])
+    tokens = {name: str(UserRefreshToken.for_user(user).access_token)
+              for name, user in (('staff', staff), ('customer', customer))}
+    client = Client()
+    cases = [
+        ('staff', 'staff', {}),
+        ('staff, status=NEW', 'staff', {'status': 'NEW'}),
+        ('customer', 'customer', {}),
+    ]
+
+    def report(title):
+        size = table_size(Order)
+        print(f'\n{title}: {Order.objects.all_with_deleted().count()} orders'
+              + (f', table and indexes {size / 2**20:.0f} MiB' if size is not None else ''))
+        print(f'{"order list":<36}{"p50":>10}{"p95":>10}')
+        results = {}
+        for name, user, params in cases:
+            for archived in (False, True) if title != 'Before' else (False,):
+                query = {**params, 'include_archived': 'true'} if archived else params
+                label = name + (', include_archived' if archived else '')
+                stats = measure(client, tokens[user], query, args.requests)
+                results[label] = stats
+                print(f'{label:<36}{stats["p50_ms"]:>8.1f}ms{stats["p95_ms"]:>8.1f}ms',
+                      flush=True)
+        return results
+
+    before = report('Before')
+    started = time.perf_counter()
+    moved = archive.archive(
+        older_than=None if args.older_than is None else timedelta(days=args.older_than))
+    print(f'\nArchived {moved} orders in {time.perf_counter() - started:.1f}s '
+          f'({ArchivedOrder.objects.count()} in the archive)')
+    if args.vacuum:
+        with connection.cursor() as cursor:
+            cursor.execute('VACUUM')
+    after = report('After')
+    print()
+    for label, stats in before.items():
+        print(f'{label}: p50 {stats["p50_ms"]:.1f}ms -> {after[label]["p50_ms"]:.1f}ms')
+
+
+if __name__ == '__main__':
+    main()
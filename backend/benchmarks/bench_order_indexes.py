@@ -0,0 +1,95 @@
+"""
+Compare order listing queries with and without the indexes from
+orders/migrations/0002_order_indexes.py.
+
+    python -m benchmarks.bench_order_indexes --orders 1000000
+
+The dataset is seeded once into benchmarks/bench.sqlite3 (or BENCH_DB); the
+script then migrates ``orders`` back to 0001 to drop the indexes, measures
+every filter combination the order API exposes, migrates forward again and
+measures once more.
+"""
+import argparse
+from datetime import timedelta
+
+from benchmarks.common import seed_orders, setup, summarize, timeit
+
+
+def build_scenarios(user_id, today):
+    from orders.models import Order
+    from orders.views import OrderFilter
+
+    active = Order.objects.select_related('tariff')
+    month_ago = today - timedelta(days=30)
+    quarter_ahead = today + timedelta(days=90)
+    scenarios = [
+        ('customer list', active.filter(user_id=user_id), {}, '-created_at'),
+        ('customer status', active.filter(user_id=user_id), {'status': 'NEW'}, '-created_at'),
+        ('customer by deadline', active.filter(user_id=user_id), {}, 'deadline'),
+        ('staff list', active, {}, '-created_at'),
+        ('staff status', active, {'status': 'IN_PROGRESS'}, '-created_at'),
+        ('staff created_at range', active,
+         {'created_at_after': month_ago, 'created_at_before': today}, '-created_at'),
+        ('staff deadline range', active,
+         {'deadline_after': today, 'deadline_before': quarter_ahead}, '-created_at'),
+        ('staff by deadline', active, {}, 'deadline'),
+        ('staff by total_price', active, {}, '-total_price'),
+    ]
+    return [
+        (name, OrderFilter(params, queryset=base).qs.order_by(ordering))
+        for name, base, params, ordering in scenarios
+    ]
+
+
+def measure(label, user_id, today, repeat, page_size):
+    from django.db import connection
+
+    with connection.cursor() as cursor:
+        cursor.execute('ANALYZE')
+
+    results = {}
+    print(f'\n=== {label} ===')
+    for name, queryset in build_scenarios(user_id, today):
+        page = queryset[:page_size]
+        # PageNumberPagination runs COUNT(*) followed by the page SELECT.
+        samples = timeit(lambda: (queryset.count(), list(page)), repeat)
+        results[name] = summarize(samples)
+        print(f'\n-- {name}')
+        print(page.explain())
+        print('p50 {p50_ms:.2f} ms  p99 {p99_ms:.2f} ms'.format(**results[name]))
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--orders', type=int, default=1_000_000)
+    parser.add_argument('--users', type=int, default=1000)
+    parser.add_argument('--repeat', type=int, default=50)
+    parser.add_argument('--page-size', type=int, default=10)
+    parser.add_argument('--db', help='SQLite file to use instead of BENCH_DB')
+    args = parser.parse_args()
+
+    setup(args.db)
+    from django.core.management import call_command
+    from django.utils import timezone
+    from orders.models import Order
+
+    seed_orders(args.orders, users=args.users)
+    user_id = Order.objects.values_list('user_id', flat=True).first()
+    today = timezone.now().date()
+
+    call_command('migrate', 'orders', '0001', verbosity=0)
+    before = measure('without indexes', user_id, today, args.repeat, args.page_size)
+    call_command('migrate', 'orders', verbosity=0)
+    after = measure('with indexes', user_id, today, args.repeat, args.page_size)
+
+    print(f'\n{"scenario":<26}{"p50 before":>12}{"p50 after":>12}'
+          f'{"p99 before":>12}{"p99 after":>12}')
+    for name in before:
+        print(f'{name:<26}'
+              f'{before[name]["p50_ms"]:>10.2f}ms{after[name]["p50_ms"]:>10.2f}ms'
+              f'{before[name]["p99_ms"]:>10.2f}ms{after[name]["p99_ms"]:>10.2f}ms')
+
+
+if __name__ == '__main__':
+    main()
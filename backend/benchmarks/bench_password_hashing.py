@@ -0,0 +1,98 @@
+"""
+Order API latency during a login storm, with passwords hashed on the request
+thread and in the users.hashers process pool.
+
+    python -m benchmarks.bench_password_hashing --storm 8 --seconds 10 --workers 0 2
+
+The app is served from a threaded WSGI server inside this process. --storm
+threads log in over and over while one client reads the order list; the
+order list is also measured without logins. Rate limits are off.
+"""
+import argparse
+import threading
+import time
+
+from benchmarks.bench_api import CUSTOMER, PASSWORD, STAFF, Client, prepare_users, start_server
+from benchmarks.common import seed_orders, setup, summarize
+
+
+def login(client, username):
+    status, payload, _ = client.request(
+        'POST', '/api/v1/users/token/', {'username': username, 'password': PASSWORD})
+    assert status == 200, (status, payload)
+    return payload
+
+
+def measure(client, token, seconds, storm):
+    stop = threading.Event()
+    logins = []
+
+    def storm_thread():
+        while not stop.is_set():
+            login(client, CUSTOMER)
+            logins.append(time.perf_counter())
+
+    threads = [threading.Thread(target=storm_thread) for _ in range(storm)]
+    for thread in threads:
+        thread.start()
+    samples = []
+    started = time.perf_counter()
+    while time.perf_counter() - started < seconds:
+        request_started = time.perf_counter()
+        status, _, _ = client.request('GET', '/api/v1/orders/', token=token)
+        samples.append(time.perf_counter() - request_started)
+        assert status == 200, status
+    elapsed = time.perf_counter() - started
+    stop.set()
+    for thread in threads:
+        thread.join()
+    return {'logins_per_s': len([t for t in logins if t - started <= elapsed]) / elapsed,
+            **summarize(samples)}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--orders', type=int, default=100_000)
+    parser.add_argument('--storm', type=int, default=8, help='Threads logging in')
+    parser.add_argument('--seconds', type=float, default=10)
+    parser.add_argument('--workers', type=int, nargs='+', default=[0, 2],
+                        help='PASSWORD_HASHING_WORKERS values to compare (0: inline)')
+    parser.add_argument('--iterations', type=int, help='PASSWORD_HASH_ITERATIONS')
+    parser.add_argument('--db', help='SQLite file to use instead of BENCH_DB')
+    args = parser.parse_args()
+
+    setup(args.db)
+    import json
+    from django.conf import settings
+    from users import hashers
+
+    settings.THROTTLE_RATES = {}
+    if args.iterations:
+        settings.PASSWORD_HASH_ITERATIONS = args.iterations
+    seed_orders(args.orders)
+    prepare_users()
+    _, base_url = start_server()
+    client = Client(base_url)
+    token = json.loads(login(client, STAFF))['access']
+    # Re-hashes the password if PASSWORD_HASH_ITERATIONS changed
+    login(client, CUSTOMER)
+
+    print(f'{settings.PASSWORD_HASH_ITERATIONS} PBKDF2 iterations, {args.storm} threads logging in\n')
+    print(f'{"hashing":<22}{"logins/s":>10}{"p50":>10}{"p95":>10}{"p99":>10}')
+
+    def report(name, result):
+        print(f'{name:<22}{result["logins_per_s"]:>10.1f}{result["p50_ms"]:>8.1f}ms'
+              f'{result["p95_ms"]:>8.1f}ms{result["p99_ms"]:>8.1f}ms', flush=True)
+
+    report('no logins', measure(client, token, args.seconds, 0))
+    for workers in args.workers:
+        hashers.shutdown_pool()
+        settings.PASSWORD_HASHING_WORKERS = workers
+        login(client, CUSTOMER)  # starts the pool
+        name = 'request thread' if workers == 0 else f'pool, {workers} workers'
+        report(name, measure(client, token, args.seconds, args.storm))
+    hashers.shutdown_pool()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,57 @@
+"""
+Compare order search through the full-text index with the LIKE '%term%'
+scan DRF's SearchFilter performs.
+
+    python -m benchmarks.bench_search --orders 1000000
+
+Seeding uses bulk_create, which bypasses the index signals, so the index is
+rebuilt (and timed) before measuring.
+"""
+import argparse
+import time
+
+from benchmarks.common import seed_orders, setup, summarize, timeit
+
+TERMS = ['ресторан', 'магазин одежды', 'онлайн-школа', 'бронирование столиков',
+         'интеграция CRM', 'автосервис']
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--orders', type=int, default=1_000_000)
+    parser.add_argument('--repeat', type=int, default=20)
+    parser.add_argument('--page-size', type=int, default=10)
+    parser.add_argument('--db', help='SQLite file to use instead of BENCH_DB')
+    args = parser.parse_args()
+
+    setup(args.db)
+    from config import search
+    from orders.models import Order
+
+    seed_orders(args.orders)
+    index = search.get_index(Order)
+    scan = search.SearchBackend(Order, index.fields)
+
+    started = time.perf_counter()
+    index.rebuild()
+    print(f'{type(index).__name__} rebuilt in {time.perf_counter() - started:.1f}s')
+
+    base = Order.objects.select_related('tariff')
+    print(f'\n{"term":<26}{"matches":>10}{"LIKE p50":>12}{"LIKE p99":>12}'
+          f'{"FTS p50":>12}{"FTS p99":>12}')
+    for term in TERMS:
+        results = {}
+        for name, backend in (('like', scan), ('fts', index)):
+            queryset = backend.search(base, term)
+            page = queryset[:args.page_size]
+            results[name] = summarize(
+                timeit(lambda: (queryset.count(), list(page)), args.repeat)
+            )
+        matches = index.search(base, term).count()
+        print(f'{term:<26}{matches:>10}'
+              f'{results["like"]["p50_ms"]:>10.1f}ms{results["like"]["p99_ms"]:>10.1f}ms'
+              f'{results["fts"]["p50_ms"]:>10.1f}ms{results["fts"]["p99_ms"]:>10.1f}ms')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,76 @@
+"""
+Rows per second through DRF's serializers and JSONRenderer versus the
+.values() fast path (config.fastserializers, config.renderers).
+
+    python -m benchmarks.bench_serializers --orders 100000 --rows 1000 10000
+
+Each stage is timed on its own: fetching the rows (model instances with
+select_related() versus .values()), serializing them and rendering JSON. The
+two paths are checked to produce the same bytes first.
+"""
+import argparse
+
+from benchmarks.common import seed_orders, setup, summarize, timeit
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--orders', type=int, default=100_000)
+    parser.add_argument('--rows', type=int, nargs='+', default=[100, 1000, 10000])
+    parser.add_argument('--repeat', type=int, default=10)
+    parser.add_argument('--db', help='SQLite file to use instead of BENCH_DB')
+    args = parser.parse_args()
+
+    setup(args.db)
+    from rest_framework.renderers import JSONRenderer
+    from config import renderers
+    from config.fastserializers import ValuesSerializer
+    from orders.models import Order
+    from orders.serializers import OrderSerializer
+    from tariffs.models import Tariff
+    from tariffs.serializers import TariffSerializer
+
+    seed_orders(args.orders)
+    if renderers.orjson is None:
+        print('orjson is not installed; FastJSONRenderer falls back to JSONRenderer')
+
+    cases = [
+        ('orders', Order.objects.select_related('tariff'),
+         OrderSerializer),
+        ('tariffs', Tariff.objects.all(), TariffSerializer),
+    ]
+    print(f'{"":<10}{"rows":>7}{"":>3}{"fetch":>12}{"serialize":>12}{"render":>12}'
+          f'{"total":>12}{"rows/s":>11}')
+    for name, queryset, serializer_class in cases:
+        fast = ValuesSerializer(serializer_class())
+        values = queryset.values(*dict.fromkeys(fast.lookups))
+        measured = set()
+        for size in args.rows:
+            instances = list(queryset[:size])
+            rows = list(values[:size])
+            if len(rows) in measured:
+                continue
+            measured.add(len(rows))
+            slow_data = serializer_class(instances, many=True).data
+            fast_data = fast.many(rows).data
+            if JSONRenderer().render(slow_data) != renderers.FastJSONRenderer().render(fast_data):
+                raise SystemExit(f'{name}: the fast path renders different output')
+
+            paths = {
+                'drf': (lambda: list(queryset[:size]),
+                        lambda: serializer_class(instances, many=True).data,
+                        lambda: JSONRenderer().render(slow_data)),
+                'fast': (lambda: list(values[:size]),
+                         lambda: fast.many(rows).data,
+                         lambda: renderers.FastJSONRenderer().render(fast_data)),
+            }
+            for path, stages in paths.items():
+                timings = [summarize(timeit(stage, args.repeat))['p50_ms'] for stage in stages]
+                total = sum(timings)
+                print(f'{name:<10}{len(rows):>7}{path:>6}'
+                      + ''.join(f'{value:>10.2f}ms' for value in (*timings, total))
+                      + f'{len(rows) / total * 1000:>11,.0f}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,155 @@
+"""
+Measure order creation on SQLite with parallel writers, with and without the
+SQLite tuning from config/settings.py (SQLITE_TUNING).
+
+    python -m benchmarks.bench_sqlite_writes --writers 1 4 16 --readers 4
+
+Every writer is its own process, like a gunicorn worker, and creates orders
+through the API (POST /api/v1/orders/, and /api/v1/orders/bulk/ for every
+--bulk-every'th request) for --duration seconds; readers list orders at the
+same time. The modes compare:
+
+* default: rollback journal, deferred transactions, Python's 5s busy timeout;
+* tuned: WAL, BEGIN IMMEDIATE and the pragmas of SQLITE_TUNING=True.
+
+"locked" counts requests that failed with "database is locked", "errors" any
+other failure.
+"""
+import argparse
+import multiprocessing
+import os
+import sqlite3
+import time
+
+from benchmarks.common import BASE_DIR, setup, summarize
+
+DEFAULT_DB = BASE_DIR / 'benchmarks' / 'bench_writes.sqlite3'
+MODES = ('default', 'tuned')
+BULK_SIZE = 10
+
+
+def worker(mode, role, db, args, barrier, results):
+    os.environ['SQLITE_TUNING'] = str(mode == 'tuned')
+    setup(db, migrate=False)
+    from django.test import Client
+    from benchmarks.bench_api import CUSTOMER
+    from django.contrib.auth import get_user_model
+    from tariffs.models import Tariff
+    from users.tokens import UserRefreshToken
+
+    customer = get_user_model().objects.get(username=CUSTOMER)
+    client = Client(raise_request_exception=False,
+                    HTTP_AUTHORIZATION=f'Bearer {UserRefreshToken.for_user(customer).access_token}')
+    order = {
+        'tariff': Tariff.objects.values_list('id', flat=True).first(),
+        'project_name': 'Параллельная запись',
+        'project_description': 'Заказ, созданный бенчмарком записи в SQLite',
+        'requirements': 'Адаптивный дизайн',
+        'deadline': '2030-12-31',
+    }
+    from django.db import connection
+    connection.close()
+
+    outcomes = []
+    barrier.wait()
+    deadline = time.perf_counter() + args.duration
+    count = 0
+    while time.perf_counter() < deadline:
+        count += 1
+        started = time.perf_counter()
+        if role == 'reader':
+            response = client.get('/api/v1/orders/')
+            rows = 0
+        elif args.bulk_every and count % args.bulk_every == 0:
+            response = client.post('/api/v1/orders/bulk/', [order] * BULK_SIZE,
+                                   content_type='application/json')
+            rows = BULK_SIZE
+        else:
+            response = client.post('/api/v1/orders/', order, content_type='application/json')
+            rows = 1
+        latency = time.perf_counter() - started
+        if response.status_code < 400:
+            outcome = 'ok'
+        elif response.exc_info and 'database is locked' in str(response.exc_info[1]):
+            outcome = 'locked'
+        else:
+            outcome = 'error'
+        outcomes.append((role, outcome, rows, latency))
+    results.put(outcomes)
+
+
+def set_journal_mode(db, mode):
+    # The journal mode is stored in the database file, so switch it back
+    # for the untuned run.
+    with sqlite3.connect(db) as connection:
+        connection.execute(f'PRAGMA journal_mode = {"WAL" if mode == "tuned" else "DELETE"}')
+
+
+def run(mode, writers, args):
+    set_journal_mode(args.db, mode)
+    context = multiprocessing.get_context('spawn')
+    roles = ['writer'] * writers + ['reader'] * args.readers
+    barrier = context.Barrier(len(roles))
+    results = context.Queue()
+    processes = [context.Process(target=worker, args=(mode, role, args.db, args, barrier, results))
+                 for role in roles]
+    for process in processes:
+        process.start()
+    outcomes = [outcome for _ in processes for outcome in results.get()]
+    for process in processes:
+        process.join()
+
+    writes = [outcome for outcome in outcomes if outcome[0] == 'writer']
+    reads = [outcome for outcome in outcomes if outcome[0] == 'reader']
+    return {
+        'mode': mode,
+        'writers': writers,
+        'rows_per_s': sum(rows for _, outcome, rows, _ in writes if outcome == 'ok') / args.duration,
+        'requests': len(writes),
+        'locked': sum(outcome == 'locked' for _, outcome, _, _ in outcomes),
+        'errors': sum(outcome == 'error' for _, outcome, _, _ in outcomes),
+        'write': summarize([latency for *_, latency in writes]),
+        'reads_per_s': sum(outcome == 'ok' for _, outcome, _, _ in reads) / args.duration,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--writers', type=int, nargs='+', default=[1, 4, 16])
+    parser.add_argument('--readers', type=int, default=0,
+                        help='Processes listing orders while the writers run')
+    parser.add_argument('--duration', type=float, default=10, help='Seconds per run')
+    parser.add_argument('--bulk-every', type=int, default=5,
+                        help=f'Every N-th write creates {BULK_SIZE} orders at once, 0 for never')
+    parser.add_argument('--orders', type=int, default=10_000,
+                        help='Orders in the database before the runs')
+    parser.add_argument('--mode', choices=MODES, action='append')
+    parser.add_argument('--db', default=str(DEFAULT_DB),
+                        help='SQLite file to use, separate from BENCH_DB as the runs grow it')
+    args = parser.parse_args()
+
+    setup(args.db)
+    from benchmarks.bench_api import prepare_users
+    from benchmarks.common import seed_orders
+
+    seed_orders(args.orders)
+    prepare_users()
+    from django.db import connection
+    connection.close()
+
+    results = [run(mode, writers, args)
+               for writers in args.writers for mode in args.mode or MODES]
+
+    print(f'\n{args.duration:g}s per run, {args.readers} readers, '
+          f'bulk create every {args.bulk_every or "-"} writes')
+    print(f'{"mode":<9}{"writers":>8}{"rows/s":>9}{"requests":>10}{"locked":>8}{"errors":>8}'
+          f'{"p50":>10}{"p99":>10}{"reads/s":>9}')
+    for result in results:
+        print(f'{result["mode"]:<9}{result["writers"]:>8}{result["rows_per_s"]:>9.0f}'
+              f'{result["requests"]:>10}{result["locked"]:>8}{result["errors"]:>8}'
+              f'{result["write"]["p50_ms"]:>8.1f}ms{result["write"]["p99_ms"]:>8.1f}ms'
+              f'{result["reads_per_s"]:>9.0f}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,69 @@
+"""
+Measure /api/v1/orders/ throughput with database-backed JWT authentication
+and with the stateless claims-based path.
+
+    python -m benchmarks.bench_stateless_auth --requests 2000
+
+Requests go through django.test.Client in-process, so the numbers isolate
+the server-side cost of authentication from network overhead.
+"""
+import argparse
+import time
+
+from benchmarks.common import seed_orders, setup, summarize
+
+
+def run(client, url, token, requests):
+    from django.db import connection
+    from django.test.utils import CaptureQueriesContext
+
+    headers = {'HTTP_AUTHORIZATION': f'Bearer {token}'}
+    samples = []
+    with CaptureQueriesContext(connection) as queries:
+        started = time.perf_counter()
+        for _ in range(requests):
+            request_started = time.perf_counter()
+            response = client.get(url, **headers)
+            samples.append(time.perf_counter() - request_started)
+            assert response.status_code == 200, response.status_code
+        elapsed = time.perf_counter() - started
+    return {
+        'rps': requests / elapsed,
+        'queries_per_request': len(queries) / requests,
+        **summarize(samples),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--orders', type=int, default=100_000)
+    parser.add_argument('--requests', type=int, default=2000)
+    parser.add_argument('--db', help='SQLite file to use instead of BENCH_DB')
+    args = parser.parse_args()
+
+    setup(args.db)
+    from django.contrib.auth import get_user_model
+    from django.test import Client
+    from django.urls import reverse
+    from rest_framework_simplejwt.tokens import RefreshToken
+    from users.tokens import UserRefreshToken
+
+    seed_orders(args.orders)
+    user = get_user_model().objects.filter(orders__isnull=False).first()
+    url = reverse('orders:order-list-create')
+    client = Client()
+    tokens = {
+        'database lookup': RefreshToken.for_user(user).access_token,
+        'stateless claims': UserRefreshToken.for_user(user).access_token,
+    }
+
+    print(f'\n{"authentication":<20}{"req/s":>10}{"queries":>10}{"p50":>10}{"p99":>10}')
+    for name, token in tokens.items():
+        run(client, url, str(token), min(100, args.requests))  # warm up
+        result = run(client, url, str(token), args.requests)
+        print(f'{name:<20}{result["rps"]:>10.0f}{result["queries_per_request"]:>10.1f}'
+              f'{result["p50_ms"]:>8.2f}ms{result["p99_ms"]:>8.2f}ms')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,95 @@
+"""
+Cost of a rate limit check per request (config.throttling).
+
+    python -m benchmarks.bench_throttling --checks 20000 --clients 1000
+
+Times SlidingWindowThrottle.allow_request() with the counters in the local
+memory cache and in a SQLite file, next to DRF's AnonRateThrottle (a list of
+timestamps per client in the cache). Requests come from --clients
+addresses. Then --processes processes hit one SQLite counter at the same
+time to check that no increment is lost.
+"""
+import argparse
+import multiprocessing
+import tempfile
+import time
+from pathlib import Path
+
+from benchmarks.common import setup, summarize, timeit
+
+RATE = '300/min'
+
+
+def hammer(path, hits):
+    from config.throttling import SQLiteCounterStore
+
+    store = SQLiteCounterStore(path)
+    started = time.perf_counter()
+    for _ in range(hits):
+        store.hit('shared', 'previous', 60)
+    return time.perf_counter() - started
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--checks', type=int, default=20_000)
+    parser.add_argument('--clients', type=int, default=1000)
+    parser.add_argument('--processes', type=int, default=4)
+    parser.add_argument('--db', help='SQLite file to use instead of BENCH_DB')
+    args = parser.parse_args()
+
+    setup(args.db, migrate=False)
+    from django.conf import settings
+    from django.core.cache import cache
+    from rest_framework.request import Request
+    from rest_framework.test import APIRequestFactory
+    from rest_framework.throttling import AnonRateThrottle
+    from config.throttling import SQLiteCounterStore, SlidingWindowThrottle
+
+    factory = APIRequestFactory()
+    requests = [Request(factory.get('/', REMOTE_ADDR=f'10.{i // 65536}.{i // 256 % 256}.{i % 256}'),
+                        authenticators=())
+                for i in range(args.clients)]
+    view = type('View', (), {'throttle_scope': 'bench'})()
+    settings.THROTTLE_RATES = {'bench': RATE}
+
+    class DRFThrottle(AnonRateThrottle):
+        rate = RATE
+
+    directory = tempfile.TemporaryDirectory()
+    path = str(Path(directory.name) / 'throttle.sqlite3')
+    stores = {
+        'sliding window, locmem': ('cache', SlidingWindowThrottle),
+        'sliding window, sqlite': ('sqlite', SlidingWindowThrottle),
+        'DRF AnonRateThrottle': ('cache', DRFThrottle),
+    }
+    print(f'{"":<26}{"p50":>10}{"p99":>10}{"mean":>10}{"denied":>8}')
+    for name, (store, throttle_class) in stores.items():
+        settings.THROTTLE_STORE = store
+        settings.THROTTLE_SQLITE_PATH = path
+        cache.clear()
+        counter = iter(range(args.checks))
+        denied = 0
+
+        def check():
+            nonlocal denied
+            request = requests[next(counter) % len(requests)]
+            if not throttle_class().allow_request(request, view):
+                denied += 1
+        stats = summarize(timeit(check, args.checks))
+        print(f'{name:<26}{stats["p50_ms"]:>8.3f}ms{stats["p99_ms"]:>8.3f}ms'
+              f'{stats["mean_ms"]:>8.3f}ms{denied:>8}')
+
+    hits = args.checks // args.processes
+    shared = str(Path(directory.name) / 'shared.sqlite3')
+    with multiprocessing.Pool(args.processes) as pool:
+        elapsed = pool.starmap(hammer, [(shared, hits)] * args.processes)
+    total, _ = SQLiteCounterStore(shared).hit('shared', 'previous', 60)
+    print(f'\n{args.processes} processes x {hits} SQLite increments: counter at {total - 1} '
+          f'(expected {args.processes * hits}), {max(elapsed) / hits * 1e6:.0f} us per '
+          f'increment under contention')
+    directory.cleanup()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,102 @@
+"""
+Refresh throughput with a large refresh-token blacklist, and the cost of
+purging it.
+
+    python -m benchmarks.bench_token_blacklist --tokens 2000000 --refreshes 2000
+
+Fills the blacklist with --tokens entries, --expired of them already
+expired, then rotates one refresh token --refreshes times through
+/api/v1/users/token/refresh/ with django.test.Client (each refresh checks
+and blacklists a token) and finally purges the expired entries.
+"""
+import argparse
+import io
+import time
+import uuid
+
+from benchmarks.common import setup, summarize
+
+SEED_BATCH = 50_000
+
+
+def seed(total, expired):
+    from django.db import connection, transaction
+    from users.models import BlacklistedToken
+
+    table = BlacklistedToken._meta.db_table
+    existing = BlacklistedToken.objects.count()
+    now = int(time.time())
+    with transaction.atomic(), connection.cursor() as cursor:
+        for start in range(existing, total, SEED_BATCH):
+            rows = [(uuid.uuid4().hex, now - 60 if i < expired else now + 86400)
+                    for i in range(start, min(total, start + SEED_BATCH))]
+            cursor.executemany(f'INSERT INTO {table} (jti, expires) VALUES (%s, %s)', rows)
+    return max(0, total - existing)
+
+
+def table_size():
+    from django.db import connection
+    from users.models import BlacklistedToken
+
+    if connection.vendor != 'sqlite':
+        return None
+    with connection.cursor() as cursor:
+        cursor.execute('SELECT SUM(pgsize) FROM dbstat WHERE name LIKE %s',
+                       [BlacklistedToken._meta.db_table + '%'])
+        return cursor.fetchone()[0]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--tokens', type=int, default=2_000_000)
+    parser.add_argument('--expired', type=int, default=1_000_000)
+    parser.add_argument('--refreshes', type=int, default=2000)
+    parser.add_argument('--db', help='SQLite file to use instead of BENCH_DB')
+    args = parser.parse_args()
+
+    setup(args.db)
+    from django.conf import settings
+    from django.contrib.auth import get_user_model
+    from django.core.management import call_command
+    from django.test import Client
+    from django.urls import reverse
+    from users.models import BlacklistedToken
+    from users.tokens import UserRefreshToken
+
+    # Purging is measured separately
+    settings.TOKEN_BLACKLIST_PURGE_INTERVAL = 0
+    started = time.perf_counter()
+    added = seed(args.tokens, args.expired)
+    print(f'Blacklist: {BlacklistedToken.objects.count()} tokens ({added} added in '
+          f'{time.perf_counter() - started:.1f}s)')
+    size, count = table_size(), BlacklistedToken.objects.count()
+    if size and count:
+        print(f'Table and index: {size / 2**20:.0f} MiB, {size / count:.0f} bytes per token')
+
+    user = get_user_model().objects.filter(is_active=True).first()
+    if user is None:
+        user = get_user_model().objects.create_user('bench-refresh', password='benchpass123')
+    url = reverse('users:token_refresh')
+    client = Client()
+    refresh = str(UserRefreshToken.for_user(user))
+    samples = []
+    started = time.perf_counter()
+    for _ in range(args.refreshes):
+        request_started = time.perf_counter()
+        response = client.post(url, {'refresh': refresh}, content_type='application/json')
+        samples.append(time.perf_counter() - request_started)
+        assert response.status_code == 200, response.content
+        refresh = response.json()['refresh']
+    elapsed = time.perf_counter() - started
+    stats = summarize(samples)
+    print(f'Refresh: {args.refreshes / elapsed:.0f} req/s, p50 {stats["p50_ms"]:.2f}ms, '
+          f'p99 {stats["p99_ms"]:.2f}ms')
+
+    started = time.perf_counter()
+    call_command('purge_token_blacklist', stdout=io.StringIO())
+    print(f'Purge of the expired tokens: {time.perf_counter() - started:.1f}s, '
+          f'{BlacklistedToken.objects.count()} left')
+
+
+if __name__ == '__main__':
+    main()
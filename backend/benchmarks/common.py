@@ -0,0 +1,90 @@
+import os
+import statistics
+import sys
+import time
+from decimal import Decimal
+from pathlib import Path
+
+BASE_DIR = Path(__file__).resolve().parent.parent
+DEFAULT_DB = BASE_DIR / 'benchmarks' / 'bench.sqlite3'
+
+if str(BASE_DIR) not in sys.path:
+    sys.path.insert(0, str(BASE_DIR))
+
+
+def setup(db_name=None, migrate=True):
+    # Benchmarks never touch the development database: they run against
+    # their own SQLite file (or BENCH_DB) that is kept between runs so the
+    # expensive seeding step only happens once.
+    os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'config.settings')
+    import django
+    from django.conf import settings
+
+    settings.DATABASES['default']['NAME'] = str(
+        db_name or os.getenv('BENCH_DB', DEFAULT_DB)
+    )
+    # In-process benchmarks drive the API through django.test.Client.
+    settings.ALLOWED_HOSTS = [*settings.ALLOWED_HOSTS, 'testserver']
+    django.setup()
+    if migrate:
+        from django.core.management import call_command
+        call_command('migrate', verbosity=0)
+
+
+def percentile(samples, pct):
+    ordered = sorted(samples)
+    index = min(len(ordered) - 1, max(0, round(pct / 100 * len(ordered)) - 1))
+    return ordered[index]
+
+
+def summarize(samples):
+    return {
+        'count': len(samples),
+        'mean_ms': statistics.fmean(samples) * 1000,
+        'p50_ms': percentile(samples, 50) * 1000,
+        'p95_ms': percentile(samples, 95) * 1000,
+        'p99_ms': percentile(samples, 99) * 1000,
+    }
+
+
+def timeit(func, repeat):
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        samples.append(time.perf_counter() - start)
+    return samples
+
+
+def seed_orders(total, users=1000, batch_size=10000, workers=1, stdout=sys.stdout):
+    # Tops the benchmark database up to ``total`` orders with the load data
+    # generator, so reruns only pay for what is missing.
+    from django.contrib.auth import get_user_model
+    from django.core.management import call_command
+    from orders.models import Order
+    from tariffs.models import Tariff
+
+    User = get_user_model()
+    existing = Order.objects.count()
+    if existing >= total:
+        return existing
+
+    if not Tariff.objects.exists():
+        Tariff.objects.bulk_create([
+            Tariff(name=name, description=name, price=Decimal(price), features=[])
+            for name, price in (('Базовый', '49999.00'), ('Премиум', '69999.00'),
+                                ('Корпоративный', '120000.00'))
+        ])
+
+    call_command(
+        'generate_load_data',
+        users=max(0, users - User.objects.filter(is_staff=False).count()),
+        orders=total - existing,
+        batch_size=batch_size,
+        workers=workers,
+        seed=existing,
+        created_at_distribution='uniform',
+        deleted_ratio=0.05,
+        stdout=stdout,
+    )
+    return total
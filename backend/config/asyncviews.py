@@ -0,0 +1,136 @@
+"""
+Async-native counterparts of DRF's generic list and detail views.
+
+DRF dispatches synchronously, so under an ASGI server every request holds a
+worker thread for the whole view. These views await Django's async ORM
+instead (``acount()``, ``aget()``, ``async for``), which only borrows a
+thread for the duration of each query; the rest of the request cycle
+(negotiation, permissions, serialization, rendering) is CPU-only and reuses
+DRF unchanged.
+
+Authenticators may provide ``aauthenticate(request)``; others run in a thread
+through ``sync_to_async``, and so do paginators without
+``apaginate_queryset()`` (see ``config.pagination``). Throttles may provide
+``aallow_request(request, view)``; others are called directly.
+"""
+from asgiref.sync import sync_to_async
+from django.http import Http404
+from rest_framework import exceptions, generics
+from rest_framework.response import Response
+
+from .routers import read_from_replica
+
+
+class AsyncGenericAPIView(generics.GenericAPIView):
+    view_is_async = True
+
+    async def dispatch(self, request, *args, **kwargs):
+        # APIView.dispatch() with the authentication and the handler awaited.
+        self.args = args
+        self.kwargs = kwargs
+        request = self.initialize_request(request, *args, **kwargs)
+        self.request = request
+        self.headers = self.default_response_headers
+
+        try:
+            await self.ainitial(request, *args, **kwargs)
+
+            if request.method.lower() in self.http_method_names:
+                handler = getattr(self, request.method.lower(),
+                                  self.http_method_not_allowed)
+            else:
+                handler = self.http_method_not_allowed
+            response = handler(request, *args, **kwargs)
+            if hasattr(response, '__await__'):
+                response = await response
+        except Exception as exc:
+            response = self.handle_exception(exc)
+
+        self.response = self.finalize_response(request, response, *args, **kwargs)
+        return self.response
+
+    async def ainitial(self, request, *args, **kwargs):
+        self.format_kwarg = self.get_format_suffix(**kwargs)
+        neg = self.perform_content_negotiation(request)
+        request.accepted_renderer, request.accepted_media_type = neg
+        version, scheme = self.determine_version(request, *args, **kwargs)
+        request.version, request.versioning_scheme = version, scheme
+
+        await self.aperform_authentication(request)
+        self.check_permissions(request)
+        await self.acheck_throttles(request)
+
+    async def aperform_authentication(self, request):
+        for authenticator in request.authenticators:
+            authenticate = getattr(authenticator, 'aauthenticate', None)
+            if authenticate is None:
+                authenticate = sync_to_async(authenticator.authenticate)
+            try:
+                user_auth_tuple = await authenticate(request)
+            except exceptions.APIException:
+                request._not_authenticated()
+                raise
+            if user_auth_tuple is not None:
+                request._authenticator = authenticator
+                request.user, request.auth = user_auth_tuple
+                break
+        else:
+            request._not_authenticated()
+
+    async def acheck_throttles(self, request):
+        durations = []
+        for throttle in self.get_throttles():
+            allow_request = getattr(throttle, 'aallow_request', None)
+            if allow_request is None:
+                allowed = throttle.allow_request(request, self)
+            else:
+                allowed = await allow_request(request, self)
+            if not allowed:
+                durations.append(throttle.wait())
+        if durations:
+            durations = [duration for duration in durations if duration is not None]
+            self.throttled(request, max(durations, default=None))
+
+    async def aget_object(self):
+        queryset = self.filter_queryset(self.get_queryset())
+        lookup_url_kwarg = self.lookup_url_kwarg or self.lookup_field
+        try:
+            obj = await queryset.aget(**{self.lookup_field: self.kwargs[lookup_url_kwarg]})
+        except (queryset.model.DoesNotExist, TypeError, ValueError):
+            # Same message as get_object_or_404()
+            raise Http404(f'No {queryset.model._meta.object_name} matches the given query.')
+        self.check_object_permissions(self.request, obj)
+        return obj
+
+    async def apaginate_queryset(self, queryset):
+        if self.paginator is None:
+            return None
+        if not hasattr(self.paginator, 'apaginate_queryset'):
+            return await sync_to_async(self.paginator.paginate_queryset)(
+                queryset, self.request, view=self)
+        return await self.paginator.apaginate_queryset(queryset, self.request, view=self)
+
+
+class AsyncListAPIView(AsyncGenericAPIView):
+    async def get(self, request, *args, **kwargs):
+        if getattr(self, 'read_replica', False):
+            # The context variable follows the ORM into its worker threads.
+            with read_from_replica():
+                return await self.alist(request, *args, **kwargs)
+        return await self.alist(request, *args, **kwargs)
+
+    async def alist(self, request, *args, **kwargs):
+        queryset = self.filter_queryset(self.get_queryset())
+        page = await self.apaginate_queryset(queryset)
+        if page is not None:
+            serializer = self.get_serializer(page, many=True)
+            return self.get_paginated_response(serializer.data)
+        serializer = self.get_serializer([obj async for obj in queryset], many=True)
+        return Response(serializer.data)
+
+
+class AsyncRetrieveAPIView(AsyncGenericAPIView):
+    async def get(self, request, *args, **kwargs):
+        instance = await self.aget_object()
+        serializer = self.get_serializer(instance)
+        return Response(serializer.data)
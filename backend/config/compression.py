@@ -0,0 +1,147 @@
+"""
+Response compression negotiated from ``Accept-Encoding``.
+
+``CompressionMiddleware`` compresses text responses of at least
+``COMPRESSION_MIN_SIZE`` bytes with brotli (when the ``brotli`` package is
+installed) or gzip, whichever the client prefers; brotli wins ties. Like
+Django's ``GZipMiddleware`` it keeps the compressed body only when it is
+smaller, weakens strong ETags and leaves responses that already have a
+``Content-Encoding`` alone (the order export compresses itself), as well as
+files served in byte ranges (order attachments), whose ranges count the
+bytes as stored.
+"""
+import zlib
+
+from django.conf import settings
+from django.utils.cache import patch_vary_headers
+from django.utils.deprecation import MiddlewareMixin
+from django.utils.text import compress_string
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+GZIP_LEVEL = 6
+# Quality 4 compresses better than gzip -6 at about the same speed; the
+# higher qualities are meant for static files.
+BROTLI_QUALITY = 4
+# Random gzip header padding against BREACH, as in GZipMiddleware
+MAX_RANDOM_BYTES = 100
+
+COMPRESSIBLE_TYPES = {
+    'application/json',
+    'application/javascript',
+    'application/xml',
+    'application/x-ndjson',
+    'image/svg+xml',
+}
+
+
+def gzip_compress(data):
+    return compress_string(data, max_random_bytes=MAX_RANDOM_BYTES)
+
+
+def gzip_stream():
+    compressor = zlib.compressobj(GZIP_LEVEL, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+    return compressor.compress, compressor.flush
+
+
+def brotli_compress(data):
+    return brotli.compress(data, quality=BROTLI_QUALITY)
+
+
+def brotli_stream():
+    compressor = brotli.Compressor(quality=BROTLI_QUALITY)
+    return compressor.process, compressor.finish
+
+
+# Content coding -> (compress a body, start compressing a stream), in order
+# of preference
+CODINGS = {'gzip': (gzip_compress, gzip_stream)}
+if brotli is not None:
+    CODINGS = {'br': (brotli_compress, brotli_stream), **CODINGS}
+
+
+def negotiate(accept_encoding):
+    """The content coding to use for ``accept_encoding``, or None."""
+    weights = {}
+    for item in accept_encoding.split(','):
+        coding, *params = item.split(';')
+        weight = 1.0
+        for param in params:
+            name, _, value = param.strip().partition('=')
+            if name == 'q':
+                try:
+                    weight = float(value)
+                except ValueError:
+                    weight = 0.0
+        weights[coding.strip().lower()] = weight
+
+    chosen, best = None, 0.0
+    for coding in CODINGS:
+        weight = weights.get(coding, weights.get('*', 0.0))
+        if weight > best:
+            chosen, best = coding, weight
+    return chosen
+
+
+def compress_sequence(sequence, stream):
+    compress, finish = stream()
+    for item in sequence:
+        data = compress(item)
+        if data:
+            yield data
+    yield finish()
+
+
+async def acompress_sequence(sequence, stream):
+    compress, finish = stream()
+    async for item in sequence:
+        data = compress(item)
+        if data:
+            yield data
+    yield finish()
+
+
+def is_compressible(response):
+    content_type = response.get('Content-Type', '').partition(';')[0].strip().lower()
+    return (content_type.startswith('text/')
+            or content_type in COMPRESSIBLE_TYPES
+            or content_type.endswith(('+json', '+xml')))
+
+
+class CompressionMiddleware(MiddlewareMixin):
+    def process_response(self, request, response):
+        if (response.has_header('Content-Encoding') or response.has_header('Accept-Ranges')
+                or not is_compressible(response)):
+            return response
+        if not response.streaming and len(response.content) < settings.COMPRESSION_MIN_SIZE:
+            return response
+
+        patch_vary_headers(response, ('Accept-Encoding',))
+        coding = negotiate(request.headers.get('Accept-Encoding', ''))
+        if coding is None:
+            return response
+
+        compress, stream = CODINGS[coding]
+        if response.streaming:
+            if response.is_async:
+                response.streaming_content = acompress_sequence(
+                    response.streaming_content, stream)
+            else:
+                response.streaming_content = compress_sequence(
+                    response.streaming_content, stream)
+            del response.headers['Content-Length']
+        else:
+            content = compress(response.content)
+            if len(content) >= len(response.content):
+                return response
+            response.content = content
+            response.headers['Content-Length'] = str(len(content))
+
+        etag = response.get('ETag')
+        if etag and etag.startswith('"'):
+            response.headers['ETag'] = 'W/' + etag
+        response.headers['Content-Encoding'] = coding
+        return response
@@ -0,0 +1,64 @@
+"""
+Conditional GET for detail views.
+
+The ETag is derived from the request's path and query string (which pick the
+fields and the format) and the object's modification timestamps, so it is
+known as soon as the object is fetched. A matching ``If-None-Match`` gets a
+304 without serializing or rendering the object.
+"""
+import hashlib
+
+from django.utils.cache import patch_cache_control
+from django.utils.http import parse_etags, quote_etag
+from rest_framework import status
+from rest_framework.response import Response
+
+
+def etag_matches(header, etag):
+    """
+    Whether an ``If-None-Match`` header matches ``etag``. The comparison is
+    weak: compressed responses carry the weakened tag (config.compression).
+    """
+    etags = {tag.removeprefix('W/') for tag in parse_etags(header or '')}
+    return '*' in etags or etag in etags
+
+
+class ConditionalRetrieveMixin:
+    # Fields that change whenever the representation does
+    etag_fields = ('updated_at',)
+
+    def retrieve(self, request, *args, **kwargs):
+        return self.conditional_response(request, self.get_object())
+
+    def get_etag_values(self, instance):
+        return [getattr(instance, name) for name in self.etag_fields]
+
+    def get_etag(self, request, instance):
+        values = ';'.join(str(value) for value in self.get_etag_values(instance))
+        source = (f'{request.get_full_path()}|{request.accepted_media_type}|'
+                  f'{instance.pk}|{values}')
+        return quote_etag(hashlib.md5(source.encode()).hexdigest())
+
+    def conditional_response(self, request, instance):
+        etag = self.get_etag(request, instance)
+        if self.is_not_modified(request, etag):
+            response = Response(status=status.HTTP_304_NOT_MODIFIED)
+        else:
+            response = Response(self.get_serializer(instance).data)
+        response['ETag'] = etag
+        # Clients keep the body but ask again every time
+        patch_cache_control(response, private=True, no_cache=True)
+        return response
+
+    def is_not_modified(self, request, etag):
+        return etag_matches(request.headers.get('If-None-Match'), etag)
+
+
+class AsyncConditionalRetrieveMixin(ConditionalRetrieveMixin):
+    """
+    ``ConditionalRetrieveMixin`` for async views. Goes before the async view
+    class, e.g. ``AsyncRetrieveAPIView``.
+    """
+
+    async def get(self, request, *args, **kwargs):
+        return self.conditional_response(request, await self.aget_object())
@@ -0,0 +1,204 @@
+"""
+A read-only fast path for list endpoints.
+
+``ValuesSerializer`` compiles a DRF serializer into one converter per field
+and builds the representation straight from ``.values()`` rows, skipping
+model instances and DRF's per-field ``get_attribute()``/``to_representation()``
+calls. The output is the same as the serializer's: common field types get a
+precompiled converter with DRF's formatting, anything else is handed to the
+field's own ``to_representation()``. Serializers it cannot reproduce (custom
+``to_representation()``, method fields, sources that are not model fields,
+...) raise ``UnsupportedField`` and are served by DRF as usual.
+
+``FastListMixin`` uses it for list GET requests when
+``FAST_LIST_SERIALIZATION`` is on.
+"""
+from decimal import Decimal, getcontext
+from operator import itemgetter
+
+from django.conf import settings
+from django.core.exceptions import FieldDoesNotExist
+from rest_framework import fields, relations, serializers
+from rest_framework.renderers import BrowsableAPIRenderer
+from rest_framework.settings import api_settings
+
+from .renderers import FastJSONRenderer
+
+ISO_8601 = 'iso-8601'
+
+# Field classes whose representation of a database value is the value itself
+IDENTITY_FIELDS = (fields.IntegerField, fields.BooleanField, fields.ReadOnlyField)
+
+
+class UnsupportedField(Exception):
+    pass
+
+
+def decimal_converter(field):
+    coerce_to_string = getattr(field, 'coerce_to_string', api_settings.COERCE_DECIMAL_TO_STRING)
+    if (not coerce_to_string or field.localize or field.normalize_output
+            or field.decimal_places is None):
+        return None
+    exponent = Decimal('.1') ** field.decimal_places
+    context = getcontext().copy()
+    if field.max_digits is not None:
+        context.prec = field.max_digits
+    rounding = field.rounding
+
+    def convert(value):
+        return f'{value.quantize(exponent, rounding=rounding, context=context):f}'
+    return convert
+
+
+def datetime_converter(field):
+    output_format = getattr(field, 'format', api_settings.DATETIME_FORMAT)
+    tz = field.timezone if hasattr(field, 'timezone') else field.default_timezone()
+    if output_format is None or output_format.lower() != ISO_8601 or tz is None:
+        return None
+
+    def convert(value):
+        value = value.astimezone(tz).isoformat()
+        return value[:-6] + 'Z' if value.endswith('+00:00') else value
+    return convert
+
+
+def date_converter(field):
+    output_format = getattr(field, 'format', api_settings.DATE_FORMAT)
+    if output_format is None or output_format.lower() != ISO_8601:
+        return None
+    return lambda value: value.isoformat()
+
+
+CONVERTERS = {
+    fields.DecimalField: decimal_converter,
+    fields.DateTimeField: datetime_converter,
+    fields.DateField: date_converter,
+}
+
+
+def is_identity(field, model_field):
+    if type(field) in IDENTITY_FIELDS:
+        return True
+    if type(field) is fields.CharField:
+        return model_field.get_internal_type() in ('CharField', 'TextField')
+    if type(field) is fields.ChoiceField:
+        # Choice keys are looked up by their string form
+        return (model_field.get_internal_type() in ('CharField', 'TextField')
+                and all(isinstance(key, str) for key in field.choices))
+    if type(field) is fields.JSONField:
+        return not field.binary
+    if type(field) is relations.PrimaryKeyRelatedField:
+        return field.pk_field is None
+    return False
+
+
+def getter(lookup, convert):
+    get = itemgetter(lookup)
+    if convert is None:
+        return get
+
+    def get_converted(row):
+        value = get(row)
+        return None if value is None else convert(value)
+    return get_converted
+
+
+class ValuesSerializer:
+    def __init__(self, serializer, prefix=''):
+        if type(serializer).to_representation is not serializers.Serializer.to_representation:
+            raise UnsupportedField(f'{type(serializer).__name__}.to_representation')
+        opts = serializer.Meta.model._meta
+        self.pk_lookup = prefix + opts.pk.name
+        self.lookups = [self.pk_lookup]
+        self.plan = []
+        for field in serializer._readable_fields:
+            if len(field.source_attrs) != 1:
+                raise UnsupportedField(field.field_name)
+            try:
+                model_field = opts.get_field(field.source)
+            except FieldDoesNotExist:
+                raise UnsupportedField(field.field_name)
+            if not model_field.concrete:
+                raise UnsupportedField(field.field_name)
+            lookup = prefix + field.source
+
+            if isinstance(field, serializers.BaseSerializer):
+                if not isinstance(field, serializers.Serializer) or not model_field.many_to_one:
+                    raise UnsupportedField(field.field_name)
+                nested = ValuesSerializer(field, prefix=f'{lookup}__')
+                self.lookups.extend(nested.lookups)
+                self.plan.append((field.field_name, nested.represent_related))
+                continue
+            if model_field.is_relation:
+                if type(field) is not relations.PrimaryKeyRelatedField:
+                    raise UnsupportedField(field.field_name)
+            elif type(field).get_attribute is not fields.Field.get_attribute:
+                raise UnsupportedField(field.field_name)
+
+            if is_identity(field, model_field):
+                convert = None
+            else:
+                make_converter = CONVERTERS.get(type(field))
+                convert = make_converter and make_converter(field)
+                if convert is None:
+                    convert = field.to_representation
+            self.lookups.append(lookup)
+            self.plan.append((field.field_name, getter(lookup, convert)))
+
+    def represent(self, row):
+        return {name: get(row) for name, get in self.plan}
+
+    def represent_related(self, row):
+        # A nested serializer renders a missing related object as None.
+        if row[self.pk_lookup] is None:
+            return None
+        return self.represent(row)
+
+    def many(self, rows):
+        return ValuesListSerializer(self, rows)
+
+
+class ValuesListSerializer:
+    # Stands in for ``serializer(rows, many=True)``, of which views only read
+    # ``data``.
+    def __init__(self, child, rows):
+        self.child = child
+        self.rows = rows
+
+    @property
+    def data(self):
+        represent = self.child.represent
+        return [represent(row) for row in self.rows]
+
+
+class FastListMixin:
+    """
+    Serve list GET requests from ``.values()`` through ``ValuesSerializer``
+    and render them with ``FastJSONRenderer``.
+    """
+
+    renderer_classes = (FastJSONRenderer, BrowsableAPIRenderer)
+    # Model fields the view reads itself, e.g. for pagination
+    always_fetch = ()
+    values_serializer = None
+
+    def filter_queryset(self, queryset):
+        queryset = super().filter_queryset(queryset)
+        self.values_serializer = None
+        if settings.FAST_LIST_SERIALIZATION and self.request.method == 'GET':
+            try:
+                self.values_serializer = ValuesSerializer(self.get_serializer())
+            except UnsupportedField:
+                return queryset
+            lookups = [*self.values_serializer.lookups, *self.always_fetch]
+            rows = queryset.values(*dict.fromkeys(lookups))
+            # COUNT(*) would keep the joins values() adds for nested
+            # serializers; they never change the number of rows.
+            rows.count, rows.acount = queryset.count, queryset.acount
+            return rows
+        return queryset
+
+    def get_serializer(self, *args, **kwargs):
+        if kwargs.get('many') and self.values_serializer is not None:
+            return self.values_serializer.many(args[0])
+        return super().get_serializer(*args, **kwargs)
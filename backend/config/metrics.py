@@ -0,0 +1,179 @@
+"""
+Opt-in per-request performance metrics (``PERFORMANCE_METRICS=True``).
+
+``MetricsMiddleware`` times every request, its database queries and DRF
+serialization, reports them in a ``Server-Timing`` header and aggregates
+histograms per URL name. ``MetricsView`` serves the histograms in the
+Prometheus text format to staff users. Metrics live in process memory, so
+with several workers each one reports its own.
+
+When the setting is off the middleware removes itself at startup and costs
+nothing per request.
+"""
+import threading
+import time
+from bisect import bisect_left
+from contextlib import ExitStack
+from contextvars import ContextVar
+
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import connections
+from django.http import Http404, HttpResponse
+from rest_framework import permissions
+from rest_framework.serializers import BaseSerializer
+from rest_framework.views import APIView
+
+SECONDS_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+QUERY_BUCKETS = (0, 1, 2, 3, 5, 10, 20, 50, 100)
+BYTES_BUCKETS = (256, 1024, 4096, 16384, 65536, 262144, 1048576, 4194304)
+
+# name -> (help, buckets)
+METRICS = {
+    'http_request_duration_seconds': ('Wall time of the request.', SECONDS_BUCKETS),
+    'http_request_db_queries': ('Database queries per request.', QUERY_BUCKETS),
+    'http_request_db_duration_seconds': ('Time spent in database queries.', SECONDS_BUCKETS),
+    'http_request_serializer_duration_seconds': ('Time spent in serializer.data.',
+                                                 SECONDS_BUCKETS),
+    'http_response_size_bytes': ('Size of non-streaming response bodies.', BYTES_BUCKETS),
+}
+
+_current = ContextVar('request_metrics', default=None)
+
+
+class RequestMetrics:
+    def __init__(self):
+        self.queries = 0
+        self.db_time = 0.0
+        self.serializer_time = 0.0
+        self.serializer_depth = 0
+
+    def __call__(self, execute, sql, params, many, context):
+        # Database execute wrapper
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.db_time += time.perf_counter() - started
+            self.queries += 1
+
+
+class Histogram:
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0
+
+    def observe(self, value):
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.sum += value
+
+
+class Registry:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        with self.lock:
+            self.histograms = {name: {} for name in METRICS}
+
+    def observe(self, view, values):
+        with self.lock:
+            for name, value in values.items():
+                histograms = self.histograms[name]
+                if view not in histograms:
+                    histograms[view] = Histogram(METRICS[name][1])
+                histograms[view].observe(value)
+
+    def render(self):
+        lines = []
+        with self.lock:
+            for name, (help_text, buckets) in METRICS.items():
+                lines += [f'# HELP {name} {help_text}', f'# TYPE {name} histogram']
+                for view, histogram in sorted(self.histograms[name].items()):
+                    label = f'view="{view}"'
+                    cumulative = 0
+                    for bound, count in zip((*buckets, '+Inf'), histogram.counts):
+                        cumulative += count
+                        lines.append(f'{name}_bucket{{{label},le="{bound}"}} {cumulative}')
+                    lines.append(f'{name}_sum{{{label}}} {histogram.sum:g}')
+                    lines.append(f'{name}_count{{{label}}} {cumulative}')
+        return '\n'.join(lines) + '\n'
+
+
+registry = Registry()
+
+
+def _timed_data(data):
+    def timed(serializer):
+        metrics = _current.get()
+        if metrics is None or metrics.serializer_depth:
+            return data.fget(serializer)
+        metrics.serializer_depth += 1
+        started = time.perf_counter()
+        try:
+            return data.fget(serializer)
+        finally:
+            metrics.serializer_time += time.perf_counter() - started
+            metrics.serializer_depth -= 1
+
+    timed.instrumented = True
+    return property(timed)
+
+
+def instrument_serializers():
+    # Serializer, ListSerializer and friends all reach BaseSerializer.data
+    # through super(), so wrapping it once covers every serializer.
+    if not getattr(BaseSerializer.data.fget, 'instrumented', False):
+        BaseSerializer.data = _timed_data(BaseSerializer.data)
+
+
+class MetricsMiddleware:
+    def __init__(self, get_response):
+        if not settings.PERFORMANCE_METRICS:
+            raise MiddlewareNotUsed
+        instrument_serializers()
+        self.get_response = get_response
+
+    def __call__(self, request):
+        metrics = RequestMetrics()
+        token = _current.set(metrics)
+        started = time.perf_counter()
+        try:
+            with ExitStack() as stack:
+                for connection in connections.all():
+                    stack.enter_context(connection.execute_wrapper(metrics))
+                response = self.get_response(request)
+        finally:
+            _current.reset(token)
+        duration = time.perf_counter() - started
+
+        match = request.resolver_match
+        values = {
+            'http_request_duration_seconds': duration,
+            'http_request_db_queries': metrics.queries,
+            'http_request_db_duration_seconds': metrics.db_time,
+            'http_request_serializer_duration_seconds': metrics.serializer_time,
+        }
+        if not response.streaming:
+            values['http_response_size_bytes'] = len(response.content)
+        registry.observe(match.view_name if match else 'unmatched', values)
+
+        response['Server-Timing'] = ', '.join((
+            f'total;dur={duration * 1000:.1f}',
+            f'db;dur={metrics.db_time * 1000:.1f};desc="{metrics.queries} queries"',
+            f'serializer;dur={metrics.serializer_time * 1000:.1f}',
+        ))
+        return response
+
+
+class MetricsView(APIView):
+    permission_classes = (permissions.IsAdminUser,)
+    swagger_schema = None
+
+    def get(self, request):
+        if not settings.PERFORMANCE_METRICS:
+            raise Http404
+        return HttpResponse(registry.render(),
+                            content_type='text/plain; version=0.0.4; charset=utf-8')
@@ -0,0 +1,32 @@
+"""
+``FastJSONRenderer`` renders with orjson, when installed, to the same bytes
+as DRF's ``JSONRenderer`` in its default configuration (compact, unicode,
+``\\u2028``/``\\u2029`` escaped). orjson writes floats in a different
+(shortest) form, so it is meant for responses without floats; anything
+orjson cannot encode, and indented output, goes through ``JSONRenderer``.
+"""
+from rest_framework.renderers import JSONRenderer
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+if orjson is not None:
+    # Types orjson would format itself differently from DRF's encoder
+    ORJSON_OPTIONS = orjson.OPT_PASSTHROUGH_DATETIME | orjson.OPT_PASSTHROUGH_DATACLASS
+
+
+class FastJSONRenderer(JSONRenderer):
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if (orjson is None or data is None or not self.compact or self.ensure_ascii
+                or self.get_indent(accepted_media_type, renderer_context or {}) is not None):
+            return super().render(data, accepted_media_type, renderer_context)
+        try:
+            ret = orjson.dumps(data, default=self.encoder_class().default,
+                               option=ORJSON_OPTIONS)
+        except TypeError:
+            return super().render(data, accepted_media_type, renderer_context)
+        if b'\xe2\x80\xa8' in ret or b'\xe2\x80\xa9' in ret:
+            ret = ret.replace(b'\xe2\x80\xa8', b'\\u2028').replace(b'\xe2\x80\xa9', b'\\u2029')
+        return ret
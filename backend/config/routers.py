@@ -0,0 +1,60 @@
+"""
+Read-replica routing for the GET-heavy list endpoints.
+
+Only reads made inside ``read_from_replica()`` go to the ``replica`` database,
+everything else stays on ``default``: a replica lags behind the primary, and
+most views read their own writes (or the rows they are about to change). The
+list views opt in through ``ReplicaReadMixin``.
+"""
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from django.conf import settings
+
+REPLICA_DATABASE = 'replica'
+
+_use_replica = ContextVar('use_replica', default=False)
+
+
+@contextmanager
+def read_from_replica():
+    token = _use_replica.set(True)
+    try:
+        yield
+    finally:
+        _use_replica.reset(token)
+
+
+class ReplicaRouter:
+    def db_for_read(self, model, **hints):
+        if _use_replica.get() and REPLICA_DATABASE in settings.DATABASES:
+            return REPLICA_DATABASE
+        return None
+
+    def db_for_write(self, model, **hints):
+        return None
+
+    def allow_relation(self, obj1, obj2, **hints):
+        databases = {'default', REPLICA_DATABASE}
+        if obj1._state.db in databases and obj2._state.db in databases:
+            return True
+        return None
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        # The replica gets its schema through replication.
+        if db == REPLICA_DATABASE:
+            return False
+        return None
+
+
+class ReplicaReadMixin:
+    """
+    Serve ``list()`` from the read replica. The async list views in
+    ``config.asyncviews`` honour ``read_replica`` as well.
+    """
+
+    read_replica = True
+
+    def list(self, request, *args, **kwargs):
+        with read_from_replica():
+            return super().list(request, *args, **kwargs)
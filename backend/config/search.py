@@ -0,0 +1,280 @@
+"""
+Full-text search for text-heavy models.
+
+Models are registered from their AppConfig.ready() with the fields to index.
+The backend is picked from the database vendor (or FULL_TEXT_SEARCH_BACKEND):
+
+* SQLite: an FTS5 virtual table ``<db_table>_fts`` keyed by the row id and
+  kept in sync through post_save/post_delete signals. Bulk operations bypass
+  signals, run ``manage.py rebuild_search_index`` after them.
+* PostgreSQL: a GIN expression index over ``to_tsvector('russian', ...)``,
+  maintained by the database itself.
+* Anything else: plain ``icontains`` matching, like DRF's SearchFilter.
+"""
+import re
+
+from django.conf import settings
+from django.db import connection, transaction
+from django.db.models import Q
+from django.db.models.signals import post_delete, post_save
+from django.utils.module_loading import import_string
+from rest_framework.filters import SearchFilter
+
+BACKENDS = {
+    'sqlite': 'config.search.SQLiteFTS5Backend',
+    'postgresql': 'config.search.PostgresFullTextBackend',
+}
+
+WORD_RE = re.compile(r'\w+')
+CYRILLIC_RE = re.compile('[а-я]')
+# Inflectional endings stripped from Russian query terms; the remaining stem
+# is matched as a prefix, so "сайты" finds "сайт" and "одежда" finds "одежды".
+RUSSIAN_ENDINGS = sorted((
+    'иями', 'ями', 'ами', 'ого', 'его', 'ому', 'ему', 'ыми', 'ими', 'ой', 'ей',
+    'ий', 'ый', 'ая', 'яя', 'ое', 'ее', 'ые', 'ие', 'ом', 'ем', 'ам', 'ям', 'ах',
+    'ях', 'ов', 'ев', 'ию', 'ью', 'ия', 'ья', 'ть', 'а', 'я', 'о', 'е', 'ы', 'и',
+    'у', 'ю', 'ь', 'й',
+), key=len, reverse=True)
+MIN_STEM_LENGTH = 3
+
+_registry = {}
+
+
+def normalize(text):
+    return text.lower().replace('ё', 'е')
+
+
+def stem(word):
+    if not CYRILLIC_RE.search(word):
+        return word
+    for ending in RUSSIAN_ENDINGS:
+        if word.endswith(ending) and len(word) - len(ending) >= MIN_STEM_LENGTH:
+            return word[:-len(ending)]
+    return word
+
+
+def tokenize(text):
+    return [stem(word) for word in WORD_RE.findall(normalize(text))]
+
+
+class SearchBackend:
+    def __init__(self, model, fields):
+        self.model = model
+        self.fields = list(fields)
+
+    def create(self, schema_editor):
+        pass
+
+    def drop(self, schema_editor):
+        pass
+
+    def update(self, instance):
+        pass
+
+    def update_many(self, instances):
+        # For bulk_create() and friends, which do not send post_save.
+        for instance in instances:
+            self.update(instance)
+
+    def remove(self, pk):
+        pass
+
+    def remove_many(self, pks):
+        for pk in pks:
+            self.remove(pk)
+
+    def rebuild(self):
+        pass
+
+    def search(self, queryset, text):
+        for term in text.split():
+            condition = Q()
+            for field in self.fields:
+                condition |= Q(**{f'{field}__icontains': term})
+            queryset = queryset.filter(condition)
+        return queryset
+
+
+class SQLiteFTS5Backend(SearchBackend):
+    tokenizer = 'unicode61 remove_diacritics 2'
+
+    @property
+    def table(self):
+        return f'{self.model._meta.db_table}_fts'
+
+    def quote(self, name):
+        return connection.ops.quote_name(name)
+
+    def normalized_columns(self):
+        # The same ё -> е folding as normalize(), done in SQL for rebuilds.
+        return ', '.join(
+            f"replace(replace({self.quote(field)}, 'ё', 'е'), 'Ё', 'Е')"
+            for field in self.fields
+        )
+
+    def create(self, schema_editor):
+        columns = ', '.join(self.quote(field) for field in self.fields)
+        schema_editor.execute(
+            f'CREATE VIRTUAL TABLE IF NOT EXISTS {self.quote(self.table)} '
+            f"USING fts5({columns}, tokenize='{self.tokenizer}')"
+        )
+        schema_editor.execute(self.populate_sql())
+
+    def drop(self, schema_editor):
+        schema_editor.execute(f'DROP TABLE IF EXISTS {self.quote(self.table)}')
+
+    def populate_sql(self):
+        columns = ', '.join(self.quote(field) for field in self.fields)
+        return (
+            f'INSERT INTO {self.quote(self.table)} (rowid, {columns}) '
+            f'SELECT {self.quote(self.model._meta.pk.column)}, {self.normalized_columns()} '
+            f'FROM {self.quote(self.model._meta.db_table)}'
+        )
+
+    def update(self, instance):
+        self.update_many([instance])
+
+    def update_many(self, instances):
+        columns = ', '.join(self.quote(field) for field in self.fields)
+        placeholders = ', '.join(['%s'] * (len(self.fields) + 1))
+        rows = [
+            [instance.pk] + [normalize(getattr(instance, field) or '') for field in self.fields]
+            for instance in instances
+        ]
+        with connection.cursor() as cursor:
+            cursor.executemany(
+                f'INSERT OR REPLACE INTO {self.quote(self.table)} (rowid, {columns}) '
+                f'VALUES ({placeholders})', rows
+            )
+
+    def remove(self, pk):
+        self.remove_many([pk])
+
+    def remove_many(self, pks):
+        with connection.cursor() as cursor:
+            cursor.executemany(f'DELETE FROM {self.quote(self.table)} WHERE rowid = %s',
+                               [[pk] for pk in pks])
+
+    def rebuild(self):
+        with transaction.atomic(), connection.cursor() as cursor:
+            cursor.execute(f'DELETE FROM {self.quote(self.table)}')
+            cursor.execute(self.populate_sql())
+            cursor.execute(
+                f"INSERT INTO {self.quote(self.table)}({self.quote(self.table)}) "
+                f"VALUES ('optimize')"
+            )
+
+    def match_expression(self, text):
+        return ' '.join(f'"{term}"*' for term in tokenize(text))
+
+    def search(self, queryset, text):
+        match = self.match_expression(text)
+        if not match:
+            return queryset
+        table = self.quote(self.table)
+        outer_pk = (f'{self.quote(self.model._meta.db_table)}.'
+                    f'{self.quote(self.model._meta.pk.column)}')
+        # A join against the FTS table lets SQLite drive the query from the
+        # MATCH and compute bm25() once per hit; the ORM has no other way to
+        # join a table without a model. bm25() is lower for better matches,
+        # so it is negated to make a higher search_rank better everywhere.
+        return queryset.extra(
+            tables=[self.table],
+            where=[f'{table}.rowid = {outer_pk}', f'{table} MATCH %s'],
+            params=[match],
+            select={'search_rank': f'-bm25({table})'},
+            order_by=['-search_rank', f'-{self.model._meta.pk.attname}'],
+        )
+
+
+class PostgresFullTextBackend(SearchBackend):
+    config = 'russian'
+
+    def vector(self):
+        from django.contrib.postgres.search import SearchVector
+        return SearchVector(*self.fields, config=self.config)
+
+    def index(self):
+        from django.contrib.postgres.indexes import GinIndex
+        return GinIndex(self.vector(), name=f'{self.model._meta.db_table}_fts_idx')
+
+    def create(self, schema_editor):
+        schema_editor.add_index(self.model, self.index())
+
+    def drop(self, schema_editor):
+        schema_editor.remove_index(self.model, self.index())
+
+    def search(self, queryset, text):
+        from django.contrib.postgres.search import SearchQuery, SearchRank
+        query = SearchQuery(normalize(text), config=self.config, search_type='plain')
+        vector = self.vector()
+        return (queryset.alias(search_vector=vector)
+                .filter(search_vector=query)
+                .annotate(search_rank=SearchRank(vector, query))
+                .order_by('-search_rank', '-pk'))
+
+
+def get_backend_class(db_connection=connection):
+    path = getattr(settings, 'FULL_TEXT_SEARCH_BACKEND', None)
+    if not path:
+        path = BACKENDS.get(db_connection.vendor, 'config.search.SearchBackend')
+    return import_string(path)
+
+
+def register(model, fields):
+    _registry[model] = get_backend_class()(model, fields)
+    post_save.connect(_update_index, sender=model, dispatch_uid=f'search-save-{model._meta.label}')
+    post_delete.connect(_remove_from_index, sender=model,
+                        dispatch_uid=f'search-delete-{model._meta.label}')
+
+
+def get_index(model):
+    return _registry.get(model)
+
+
+def update_many(model, instances):
+    index = get_index(model)
+    if index is not None:
+        index.update_many(instances)
+
+
+def remove_many(model, pks):
+    # For deletes that bypass post_delete.
+    index = get_index(model)
+    if index is not None:
+        index.remove_many(pks)
+
+
+def registered_indexes():
+    return list(_registry.values())
+
+
+def _update_index(sender, instance, raw=False, **kwargs):
+    if not raw:
+        _registry[sender].update(instance)
+
+
+def _remove_from_index(sender, instance, **kwargs):
+    _registry[sender].remove(instance.pk)
+
+
+def create_index(app_label, model_name, fields):
+    # RunPython helpers for app migrations.
+    def forwards(apps, schema_editor):
+        model = apps.get_model(app_label, model_name)
+        get_backend_class(schema_editor.connection)(model, fields).create(schema_editor)
+
+    def backwards(apps, schema_editor):
+        model = apps.get_model(app_label, model_name)
+        get_backend_class(schema_editor.connection)(model, fields).drop(schema_editor)
+
+    return forwards, backwards
+
+
+class FullTextSearchFilter(SearchFilter):
+    def filter_queryset(self, request, queryset, view):
+        index = get_index(queryset.model)
+        terms = self.get_search_terms(request)
+        if index is None or not terms or not getattr(view, 'search_fields', None):
+            return super().filter_queryset(request, queryset, view)
+        return index.search(queryset, ' '.join(terms))
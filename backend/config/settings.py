@@ -10,7 +10,7 @@ load_dotenv()
 BASE_DIR = Path(__file__).resolve().parent.parent
 
 # Quick-start development settings - unsuitable for production
-# See https://docs.djangoproject.com/en/4.2/howto/deployment/checklist/
+# See https://docs.djangoproject.com/en/5.1/howto/deployment/checklist/
 
 # SECURITY WARNING: keep the secret key used in production secret!
 SECRET_KEY = os.getenv('SECRET_KEY', 'django-insecure-change-this-in-production')
@@ -39,9 +39,12 @@ INSTALLED_APPS = [
     'users',
     'orders',
     'tariffs',
+    'frontend',
 ]
 
 MIDDLEWARE = [
+    'config.metrics.MetricsMiddleware',
+    'config.compression.CompressionMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'corsheaders.middleware.CorsMiddleware',
@@ -54,6 +57,13 @@ MIDDLEWARE = [
 
 ROOT_URLCONF = 'config.urls'
 
+# Smaller responses fit in a single packet anyway and are sent uncompressed,
+# see config/compression.py
+COMPRESSION_MIN_SIZE = int(os.getenv('COMPRESSION_MIN_SIZE', 1024))
+
+# Server-Timing headers and the /api/v1/metrics/ endpoint, see config/metrics.py
+PERFORMANCE_METRICS = os.getenv('PERFORMANCE_METRICS', 'False') == 'True'
+
 TEMPLATES = [
     {
         'BACKEND': 'django.template.backends.django.DjangoTemplates',
@@ -71,22 +81,127 @@ TEMPLATES = [
 ]
 
 WSGI_APPLICATION = 'config.wsgi.application'
+ASGI_APPLICATION = 'config.asgi.application'
 
-# Database - Using SQLite for simplicity
-# https://docs.djangoproject.com/en/4.2/ref/settings/#databases
+# Route the order and tariff list/detail endpoints to their async views.
+# Meant for ASGI deployments (config.asgi); under WSGI they still work but
+# each request pays for an event loop.
+ASYNC_VIEWS = os.getenv('ASYNC_VIEWS', 'False') == 'True'
 
-DATABASES = {
-    'default': {
+# Database - SQLite by default, PostgreSQL with DB_ENGINE=postgresql
+# https://docs.djangoproject.com/en/5.1/ref/settings/#databases
+
+
+def postgres_database(prefix='DB'):
+    # Settings for a replica fall back to the primary's (DB_*) when not set.
+    def env(name, default=''):
+        return os.getenv(f'{prefix}_{name}', os.getenv(f'DB_{name}', default))
+
+    database = {
+        'ENGINE': 'django.db.backends.postgresql',
+        'NAME': env('NAME', 'design_studio_db'),
+        'USER': env('USER', 'postgres'),
+        'PASSWORD': env('PASSWORD'),
+        'HOST': env('HOST', 'localhost'),
+        'PORT': env('PORT', '5432'),
+        'CONN_MAX_AGE': int(os.getenv('DB_CONN_MAX_AGE', 60)),
+        'CONN_HEALTH_CHECKS': True,
+        'OPTIONS': {},
+    }
+    if os.getenv('DB_POOL', 'False') == 'True':
+        # psycopg 3 connection pool, one per process. Pooled connections are
+        # returned after every request, so persistent connections are off.
+        database['CONN_MAX_AGE'] = 0
+        database['OPTIONS']['pool'] = {
+            'min_size': int(os.getenv('DB_POOL_MIN_SIZE', 2)),
+            'max_size': int(os.getenv('DB_POOL_MAX_SIZE', 10)),
+            'timeout': int(os.getenv('DB_POOL_TIMEOUT', 10)),
+        }
+    return database
+
+
+def sqlite_database():
+    database = {
         'ENGINE': 'django.db.backends.sqlite3',
-        'NAME': BASE_DIR / 'db.sqlite3',
+        'NAME': BASE_DIR / os.getenv('DB_NAME', 'db.sqlite3'),
+        'OPTIONS': {},
+    }
+    if os.getenv('SQLITE_TUNING', 'True') == 'True':
+        # WAL lets readers run alongside the single writer, and BEGIN IMMEDIATE
+        # takes the write lock when a transaction starts: a deferred transaction
+        # that reads first and then writes fails with "database is locked"
+        # right away, without waiting for busy_timeout, when another writer
+        # got there in between.
+        pragmas = {
+            'journal_mode': 'WAL',
+            'synchronous': os.getenv('SQLITE_SYNCHRONOUS', 'NORMAL'),
+            'busy_timeout': int(os.getenv('SQLITE_BUSY_TIMEOUT', 5000)),  # ms
+            'cache_size': -int(os.getenv('SQLITE_CACHE_SIZE', 64 * 1024)),  # KiB
+            'mmap_size': int(os.getenv('SQLITE_MMAP_SIZE', 256 * 1024 * 1024)),
+            'temp_store': 'MEMORY',
+        }
+        database['OPTIONS'] = {
+            'transaction_mode': 'IMMEDIATE',
+            'init_command': ';'.join(f'PRAGMA {name} = {value}'
+                                     for name, value in pragmas.items()),
+        }
+    return database
+
+
+DB_ENGINE = os.getenv('DB_ENGINE', 'sqlite3')
+
+if os.getenv('TEST_POSTGRES', 'False') == 'True':
+    # Throwaway local PostgreSQL for running the test suite, see config/testdb.py
+    from .testdb import postgres_stand_in
+    DATABASES = {'default': postgres_stand_in(postgres_database())}
+elif DB_ENGINE == 'postgresql':
+    DATABASES = {'default': postgres_database()}
+    if os.getenv('DB_REPLICA_HOST'):
+        DATABASES['replica'] = postgres_database('DB_REPLICA')
+        DATABASES['replica']['TEST'] = {'MIRROR': 'default'}
+else:
+    DATABASES = {'default': sqlite_database()}
+
+# Sends the list endpoints' reads to DATABASES['replica'] when there is one
+DATABASE_ROUTERS = ['config.routers.ReplicaRouter']
+
+# Cache
+# Local memory is per process; for several workers point CACHE_BACKEND at
+# django.core.cache.backends.filebased.FileBasedCache (CACHE_LOCATION is a
+# directory) or django.core.cache.backends.redis.RedisCache (CACHE_LOCATION is
+# a redis:// URL of Redis or a compatible server, needs the redis package).
+
+CACHES = {
+    'default': {
+        'BACKEND': os.getenv('CACHE_BACKEND', 'django.core.cache.backends.locmem.LocMemCache'),
+        'LOCATION': os.getenv('CACHE_LOCATION', ''),
     }
 }
 
+TARIFF_CACHE_ALIAS = 'default'
+TARIFF_CACHE_TIMEOUT = int(os.getenv('TARIFF_CACHE_TIMEOUT', 60 * 60))
+TARIFF_CACHE_MAX_AGE = int(os.getenv('TARIFF_CACHE_MAX_AGE', 0))
+
 # Custom user model
 AUTH_USER_MODEL = 'users.User'
 
+# Password hashing (users.hashers): PBKDF2 runs in a pool of
+# PASSWORD_HASHING_WORKERS processes (0 hashes on the request thread) at a
+# lower CPU priority. Passwords are re-hashed at login when
+# PASSWORD_HASH_ITERATIONS changes.
+PASSWORD_HASHERS = [
+    'users.hashers.PooledPBKDF2PasswordHasher',
+    'django.contrib.auth.hashers.PBKDF2SHA1PasswordHasher',
+    'django.contrib.auth.hashers.Argon2PasswordHasher',
+    'django.contrib.auth.hashers.BCryptSHA256PasswordHasher',
+    'django.contrib.auth.hashers.ScryptPasswordHasher',
+]
+PASSWORD_HASH_ITERATIONS = int(os.getenv('PASSWORD_HASH_ITERATIONS', 1_000_000))
+PASSWORD_HASHING_WORKERS = int(os.getenv('PASSWORD_HASHING_WORKERS', 2))
+PASSWORD_HASHING_NICE = int(os.getenv('PASSWORD_HASHING_NICE', 10))
+
 # Password validation
-# https://docs.djangoproject.com/en/4.2/ref/settings/#auth-password-validators
+# https://docs.djangoproject.com/en/5.1/ref/settings/#auth-password-validators
 
 AUTH_PASSWORD_VALIDATORS = [
     {
@@ -104,7 +219,7 @@ AUTH_PASSWORD_VALIDATORS = [
 ]
 
 # Internationalization
-# https://docs.djangoproject.com/en/4.2/topics/i18n/
+# https://docs.djangoproject.com/en/5.1/topics/i18n/
 
 LANGUAGE_CODE = 'en-us'
 TIME_ZONE = 'UTC'
@@ -112,35 +227,92 @@ USE_I18N = True
 USE_TZ = True
 
 # Static files (CSS, JavaScript, Images)
-# https://docs.djangoproject.com/en/4.2/howto/static-files/
+# https://docs.djangoproject.com/en/5.1/howto/static-files/
 
 STATIC_URL = 'static/'
 STATIC_ROOT = BASE_DIR / 'staticfiles'
 
+# The HTML/CSS/JS site and the output of `manage.py build_frontend`, which
+# collectstatic picks up once it exists
+FRONTEND_DIR = BASE_DIR.parent
+FRONTEND_BUILD_DIR = BASE_DIR / 'frontend_build'
+STATICFILES_DIRS = [FRONTEND_BUILD_DIR] if FRONTEND_BUILD_DIR.is_dir() else []
+
 MEDIA_URL = 'media/'
 MEDIA_ROOT = BASE_DIR / 'media'
 
+# Order attachments (orders.attachments). They are checked against the order
+# on every download, so they are kept out of MEDIA_ROOT, which DEBUG serves
+# to anyone.
+ATTACHMENT_ROOT = BASE_DIR / os.getenv('ATTACHMENT_ROOT', 'attachments')
+ATTACHMENT_MAX_SIZE = int(os.getenv('ATTACHMENT_MAX_SIZE', 100 * 1024 * 1024))
+# Uploads not finished within this many hours are removed by
+# manage.py purge_attachments
+ATTACHMENT_UPLOAD_EXPIRY_HOURS = int(os.getenv('ATTACHMENT_UPLOAD_EXPIRY_HOURS', 24))
+# Longest side of the WebP thumbnails of images, made by this many
+# background threads (0 makes them on the request thread)
+ATTACHMENT_THUMBNAIL_SIZE = int(os.getenv('ATTACHMENT_THUMBNAIL_SIZE', 320))
+ATTACHMENT_THUMBNAIL_WORKERS = int(os.getenv('ATTACHMENT_THUMBNAIL_WORKERS', 1))
+# With a location prefix (e.g. /protected-attachments/), downloads are handed
+# to nginx with X-Accel-Redirect once the permissions are checked
+ATTACHMENT_ACCEL_REDIRECT = os.getenv('ATTACHMENT_ACCEL_REDIRECT', '')
+
 # Default primary key field type
-# https://docs.djangoproject.com/en/4.2/ref/settings/#default-auto-field
+# https://docs.djangoproject.com/en/5.1/ref/settings/#default-auto-field
 
 DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 
 # REST Framework settings
 REST_FRAMEWORK = {
     'DEFAULT_AUTHENTICATION_CLASSES': (
-        'rest_framework_simplejwt.authentication.JWTAuthentication',
+        'users.authentication.StatelessJWTAuthentication',
     ),
     'DEFAULT_PERMISSION_CLASSES': (
         'rest_framework.permissions.IsAuthenticated',
     ),
-    'DEFAULT_PAGINATION_CLASS': 'rest_framework.pagination.PageNumberPagination',
+    'DEFAULT_PAGINATION_CLASS': 'config.pagination.AsyncPageNumberPagination',
     'PAGE_SIZE': 10,
     'DEFAULT_FILTER_BACKENDS': (
         'django_filters.rest_framework.DjangoFilterBackend',
-        'rest_framework.filters.SearchFilter',
+        'config.search.FullTextSearchFilter',
         'rest_framework.filters.OrderingFilter',
     ),
+    # Reverse proxies in front of the app: client addresses for rate limits
+    # are taken from X-Forwarded-For only when this is set
+    'NUM_PROXIES': int(os.getenv('NUM_PROXIES', 0)),
+}
+
+# Rate limits (config.throttling) per scope, in DRF's format ('20/min'); an
+# empty value turns a limit off
+THROTTLE_RATES = {
+    # Token obtain, per client address and per account
+    'login': os.getenv('THROTTLE_LOGIN_RATE', '20/min'),
+    'login_account': os.getenv('THROTTLE_LOGIN_ACCOUNT_RATE', '10/min'),
+    'register': os.getenv('THROTTLE_REGISTER_RATE', '10/hour'),
+    # The public tariff list and detail
+    'catalogue': os.getenv('THROTTLE_CATALOGUE_RATE', '300/min'),
 }
+# Where the counters live: 'cache' (THROTTLE_CACHE_ALIAS; local memory counts
+# per process, point CACHE_BACKEND at Redis to share them) or 'sqlite' (a file
+# shared by the workers on one host)
+THROTTLE_STORE = os.getenv('THROTTLE_STORE', 'cache')
+THROTTLE_CACHE_ALIAS = 'default'
+THROTTLE_SQLITE_PATH = os.getenv('THROTTLE_SQLITE_PATH', BASE_DIR / 'throttle.sqlite3')
+
+# Largest number of orders accepted by a single bulk request
+ORDER_BULK_MAX_SIZE = int(os.getenv('ORDER_BULK_MAX_SIZE', 500))
+
+# Rows fetched per database round trip by the streaming order export
+ORDER_EXPORT_CHUNK_SIZE = int(os.getenv('ORDER_EXPORT_CHUNK_SIZE', 2000))
+
+# Finished and deleted orders unchanged for this many days move to the
+# archive table, ORDER_ARCHIVE_BATCH_SIZE per transaction (orders.archive)
+ORDER_ARCHIVE_AFTER_DAYS = int(os.getenv('ORDER_ARCHIVE_AFTER_DAYS', 365))
+ORDER_ARCHIVE_BATCH_SIZE = int(os.getenv('ORDER_ARCHIVE_BATCH_SIZE', 1000))
+
+# Serve the order and tariff lists from .values() rows instead of model
+# instances and DRF fields (config.fastserializers); same output.
+FAST_LIST_SERIALIZATION = os.getenv('FAST_LIST_SERIALIZATION', 'True') == 'True'
 
 # JWT settings
 SIMPLE_JWT = {
@@ -148,7 +320,14 @@ SIMPLE_JWT = {
     'REFRESH_TOKEN_LIFETIME': timedelta(days=int(os.getenv('JWT_REFRESH_TOKEN_LIFETIME', 1))),
     'ROTATE_REFRESH_TOKENS': True,
     'BLACKLIST_AFTER_ROTATION': True,
+    'TOKEN_OBTAIN_SERIALIZER': 'users.serializers.UserTokenObtainPairSerializer',
+    'TOKEN_REFRESH_SERIALIZER': 'users.serializers.UserTokenRefreshSerializer',
 }
+# Rotated refresh tokens are blacklisted until they expire (users.tokens);
+# every PURGE_INTERVAL blacklistings up to PURGE_BATCH expired entries are
+# deleted (0 leaves it to manage.py purge_token_blacklist)
+TOKEN_BLACKLIST_PURGE_INTERVAL = int(os.getenv('TOKEN_BLACKLIST_PURGE_INTERVAL', 1000))
+TOKEN_BLACKLIST_PURGE_BATCH = int(os.getenv('TOKEN_BLACKLIST_PURGE_BATCH', 2000))
 
 # CORS settings
 CORS_ALLOWED_ORIGINS = [
@@ -0,0 +1,52 @@
+"""
+Managers for models that mark rows ``is_deleted`` instead of deleting them.
+
+``SoftDeleteManager`` as the default manager (``objects``) leaves deleted rows
+out of every query, related managers included; ``all_with_deleted()`` is the
+way to see them, e.g. in the admin or to restore. Querysets soft-delete and
+restore with one UPDATE however many rows they match.
+"""
+from django.db import models
+from django.utils import timezone
+
+
+class SoftDeleteQuerySet(models.QuerySet):
+    def soft_delete(self):
+        """Mark the rows deleted and return how many were not already."""
+        return self.set_deleted(True)
+
+    def restore(self):
+        return self.set_deleted(False)
+
+    def set_deleted(self, is_deleted):
+        return (self.filter(is_deleted=not is_deleted)
+                .update(is_deleted=is_deleted, **self.touched_fields()))
+
+    def touched_fields(self):
+        # update() skips the auto_now fields save() would set
+        now = timezone.now()
+        return {field.attname: now for field in self.model._meta.concrete_fields
+                if getattr(field, 'auto_now', False)}
+
+
+class SoftDeleteManagerMixin:
+    def get_queryset(self):
+        return super().get_queryset().filter(is_deleted=False)
+
+    def all_with_deleted(self):
+        return super().get_queryset()
+
+
+class SoftDeleteManager(SoftDeleteManagerMixin, models.Manager.from_queryset(SoftDeleteQuerySet)):
+    pass
+
+
+class SoftDeleteAdminMixin:
+    """Lists deleted rows in the admin too, to be filtered on ``is_deleted``."""
+
+    def get_queryset(self, request):
+        queryset = self.model._default_manager.all_with_deleted()
+        ordering = self.get_ordering(request)
+        if ordering:
+            queryset = queryset.order_by(*ordering)
+        return queryset
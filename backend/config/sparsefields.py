@@ -0,0 +1,88 @@
+"""
+Sparse fieldsets for read requests: ``?fields=id,status`` returns only those
+fields, ``?expand=tariff_details`` adds fields a serializer leaves out by
+default (``Meta.expandable_fields``).
+
+``SparseFieldsSerializer`` picks the fields; ``SparseFieldsViewMixin`` then
+fetches only the columns behind them with ``.only()``, and joins a related
+table only when a nested serializer needs it. Writes always use every field.
+"""
+from django.core.exceptions import FieldDoesNotExist
+from rest_framework import exceptions
+from rest_framework.permissions import SAFE_METHODS
+from rest_framework.serializers import BaseSerializer, ListSerializer
+
+FIELDS_PARAM = 'fields'
+EXPAND_PARAM = 'expand'
+
+
+def requested_names(request, param):
+    value = request.query_params.get(param, '')
+    names = [name.strip() for name in value.split(',') if name.strip()]
+    return names or None
+
+
+class SparseFieldsSerializer:
+    def get_fields(self):
+        fields = super().get_fields()
+        request = self.context.get('request')
+        # Only the top-level serializer (or its list) follows the parameters.
+        top_level = self.parent is None or (isinstance(self.parent, ListSerializer)
+                                            and self.parent.parent is None)
+        if request is None or request.method not in SAFE_METHODS or not top_level:
+            return fields
+
+        requested = requested_names(request, FIELDS_PARAM)
+        expand = requested_names(request, EXPAND_PARAM) or []
+        for param, names in ((FIELDS_PARAM, requested or []), (EXPAND_PARAM, expand)):
+            unknown = [name for name in names if name not in fields]
+            if unknown:
+                raise exceptions.ValidationError(
+                    {param: [f"Unknown fields: {', '.join(unknown)}."]}
+                )
+
+        if requested is None:
+            expandable = getattr(self.Meta, 'expandable_fields', ())
+            selected = {name for name in fields if name not in expandable}
+        else:
+            selected = set(requested)
+        selected.update(expand)
+        return {name: field for name, field in fields.items() if name in selected}
+
+
+def restrict_queryset(queryset, fields, always_fetch=()):
+    """
+    Limit ``queryset`` to the columns ``fields`` read, or return it unchanged
+    when a field reads something other than a model field.
+    """
+    opts = queryset.model._meta
+    columns = {opts.pk.name, *always_fetch}
+    related = []
+    for field in fields:
+        name = field.source.split('.')[0]
+        try:
+            model_field = opts.get_field(name)
+        except FieldDoesNotExist:
+            return queryset
+        if not model_field.concrete:
+            return queryset
+        columns.add(name)
+        if isinstance(field, BaseSerializer) and model_field.is_relation:
+            related.append(name)
+    queryset = queryset.select_related(None)
+    if related:
+        queryset = queryset.select_related(*related)
+    return queryset.only(*columns)
+
+
+class SparseFieldsViewMixin:
+    # Model fields the view reads itself, e.g. for pagination
+    always_fetch = ()
+
+    def filter_queryset(self, queryset):
+        # Not get_queryset(), which views override to scope the orders
+        queryset = super().filter_queryset(queryset)
+        if self.request.method in SAFE_METHODS:
+            fields = self.get_serializer().fields.values()
+            queryset = restrict_queryset(queryset, fields, self.always_fetch)
+        return queryset
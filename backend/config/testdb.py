@@ -0,0 +1,31 @@
+"""
+A local PostgreSQL stand-in for running the test suite without a database
+server:
+
+    pip install pgserver
+    TEST_POSTGRES=True python manage.py test
+
+pgserver ships PostgreSQL binaries as a wheel; a throwaway cluster is
+initialized in a temporary directory and removed when the process exits.
+"""
+import tempfile
+
+from django.core.exceptions import ImproperlyConfigured
+
+
+def postgres_stand_in(database):
+    try:
+        import pgserver
+    except ImportError:
+        raise ImproperlyConfigured('TEST_POSTGRES=True needs the pgserver package.')
+
+    server = pgserver.get_server(tempfile.mkdtemp(prefix='pgtest-'), cleanup_mode='delete')
+    socket_dir = server.get_uri().rpartition('host=')[2]
+    return {
+        **database,
+        'NAME': 'postgres',
+        'USER': 'postgres',
+        'PASSWORD': '',
+        'HOST': socket_dir,
+        'PORT': '',
+    }
@@ -0,0 +1,99 @@
+from contextlib import ContextDecorator
+
+from django.contrib.auth import get_user_model
+from django.db import DEFAULT_DB_ALIAS, connections
+from django.test.utils import CaptureQueriesContext
+from rest_framework_simplejwt.tokens import RefreshToken
+
+
+class QueryBudgetExceeded(AssertionError):
+    pass
+
+
+class query_budget(ContextDecorator):
+    """
+    Fail when the wrapped block runs more than ``max_queries`` queries.
+
+    Works both as a context manager and as a decorator::
+
+        with query_budget(3):
+            self.client.get(url)
+
+        @query_budget(3)
+        def test_list(self):
+            ...
+    """
+
+    def __init__(self, max_queries, using=DEFAULT_DB_ALIAS):
+        self.max_queries = max_queries
+        self.using = using
+        self.context = None
+
+    def __enter__(self):
+        self.context = CaptureQueriesContext(connections[self.using])
+        self.context.__enter__()
+        return self.context
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.context.__exit__(exc_type, exc_value, traceback)
+        if exc_type is not None:
+            return False
+        executed = len(self.context)
+        if executed > self.max_queries:
+            queries = '\n'.join(
+                f'{i}. {query["sql"]}'
+                for i, query in enumerate(self.context.captured_queries, start=1)
+            )
+            raise QueryBudgetExceeded(
+                f'{executed} queries executed on {self.using!r}, '
+                f'budget is {self.max_queries}:\n{queries}'
+            )
+        return False
+
+
+class QueryBudgetMixin:
+    def assertMaxQueries(self, max_queries, func=None, *args, using=DEFAULT_DB_ALIAS, **kwargs):
+        budget = query_budget(max_queries, using=using)
+        if func is None:
+            return budget
+        with budget:
+            return func(*args, **kwargs)
+
+    def assertQueryCountStable(self, func, grow, using=DEFAULT_DB_ALIAS):
+        # Run ``func`` before and after ``grow`` adds more rows; the number of
+        # queries must not depend on how many rows the response contains.
+        with CaptureQueriesContext(connections[using]) as before:
+            func()
+        grow()
+        with CaptureQueriesContext(connections[using]) as after:
+            func()
+        self.assertEqual(
+            len(before), len(after),
+            'Query count changed with the number of rows:\n'
+            + '\n'.join(query['sql'] for query in after.captured_queries)
+        )
+
+
+class APIUsersMixin:
+    """
+    A regular user (``self.user``) and a superuser (``self.admin``) for API
+    tests; ``authenticate()`` sends the client's requests as either.
+    """
+
+    def setUp(self):
+        super().setUp()
+        User = get_user_model()
+        self.user = User.objects.create_user(
+            username='testuser',
+            password='testpass123',
+            email='test@example.com'
+        )
+        self.admin = User.objects.create_superuser(
+            username='admin',
+            password='adminpass123',
+            email='admin@example.com'
+        )
+
+    def authenticate(self, user):
+        tokens = RefreshToken.for_user(user)
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {str(tokens.access_token)}')
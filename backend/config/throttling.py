@@ -0,0 +1,197 @@
+"""
+Rate limits for DRF views, counted in a store the worker processes share.
+
+A view opts in with ``throttle_classes`` and a ``throttle_scope``; the rate
+of each scope comes from ``THROTTLE_RATES`` (``'20/min'``, DRF's format) and
+a scope without a rate is not limited. Clients are users when authenticated,
+IP addresses otherwise (behind a proxy set ``NUM_PROXIES``).
+
+Windows slide: a client's count is the count of the current fixed window
+plus the previous window's, weighted by how much of it the sliding window
+still covers. That is two integer counters per client, updated with one
+atomic increment, instead of the list of timestamps DRF's
+``SimpleRateThrottle`` reads and rewrites on every request. Rejected requests
+count too, so a client that keeps hammering stays limited.
+
+``THROTTLE_STORE`` picks where the counters live:
+
+- ``'cache'``: the ``THROTTLE_CACHE_ALIAS`` cache through ``incr()``, atomic
+  with Redis (or a compatible server) and memcached. Local memory is per
+  process.
+- ``'sqlite'``: the SQLite file ``THROTTLE_SQLITE_PATH``, shared by the
+  workers on one host and updated with an UPSERT.
+"""
+import hashlib
+import sqlite3
+import threading
+import time
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import caches
+from rest_framework.throttling import BaseThrottle
+
+DURATIONS = {'s': 1, 'm': 60, 'h': 60 * 60, 'd': 24 * 60 * 60}
+
+
+def parse_rate(rate):
+    """``'20/min'`` -> ``(20, 60)``"""
+    num, period = rate.split('/')
+    return int(num), DURATIONS[period[0]]
+
+
+class CacheCounterStore:
+    def __init__(self, cache):
+        self.cache = cache
+
+    def hit(self, key, previous_key, timeout):
+        """Increment ``key`` and return it with the value of ``previous_key``."""
+        try:
+            current = self.cache.incr(key)
+        except ValueError:
+            if self.cache.add(key, 1, timeout):
+                current = 1
+            else:
+                current = self.cache.incr(key)
+        return current, self.cache.get(previous_key, 0)
+
+    async def ahit(self, key, previous_key, timeout):
+        try:
+            current = await self.cache.aincr(key)
+        except ValueError:
+            if await self.cache.aadd(key, 1, timeout):
+                current = 1
+            else:
+                current = await self.cache.aincr(key)
+        return current, await self.cache.aget(previous_key, 0)
+
+
+class SQLiteCounterStore:
+    def __init__(self, path):
+        self.path = path
+        self.local = threading.local()
+
+    def connection(self):
+        connection = getattr(self.local, 'connection', None)
+        if connection is None:
+            connection = sqlite3.connect(self.path, isolation_level=None, timeout=1)
+            # Counters are disposable: a crash may lose the last increments
+            connection.execute('PRAGMA journal_mode = WAL')
+            connection.execute('PRAGMA synchronous = OFF')
+            connection.execute(
+                'CREATE TABLE IF NOT EXISTS throttle_counter ('
+                'key TEXT PRIMARY KEY, count INTEGER NOT NULL, expires REAL NOT NULL'
+                ') WITHOUT ROWID')
+            connection.execute('CREATE INDEX IF NOT EXISTS throttle_counter_expires '
+                               'ON throttle_counter (expires)')
+            self.local.connection = connection
+        return connection
+
+    def hit(self, key, previous_key, timeout):
+        connection = self.connection()
+        now = time.time()
+        current, = connection.execute(
+            'INSERT INTO throttle_counter (key, count, expires) VALUES (?, 1, ?) '
+            'ON CONFLICT (key) DO UPDATE SET count = count + 1 RETURNING count',
+            (key, now + timeout)).fetchone()
+        if current == 1:
+            # A new window: drop the counters that have expired meanwhile
+            connection.execute('DELETE FROM throttle_counter WHERE expires < ?', (now,))
+        previous = connection.execute(
+            'SELECT count FROM throttle_counter WHERE key = ?', (previous_key,)).fetchone()
+        return current, previous[0] if previous else 0
+
+    async def ahit(self, key, previous_key, timeout):
+        # A write to a local file, cheaper than handing it to a thread
+        return self.hit(key, previous_key, timeout)
+
+
+SQLITE_STORES = {}
+
+
+def get_store():
+    if settings.THROTTLE_STORE == 'sqlite':
+        path = str(settings.THROTTLE_SQLITE_PATH)
+        if path not in SQLITE_STORES:
+            SQLITE_STORES[path] = SQLiteCounterStore(path)
+        return SQLITE_STORES[path]
+    return CacheCounterStore(caches[settings.THROTTLE_CACHE_ALIAS])
+
+
+class SlidingWindowThrottle(BaseThrottle):
+    """
+    Limit each client to the rate of the view's ``throttle_scope``.
+
+    Async views (``config.asyncviews``) call ``aallow_request()``.
+    """
+
+    scope_attr = 'throttle_scope'
+    timer = time.time
+
+    def __init__(self):
+        self.wait_seconds = None
+
+    def get_ident(self, request):
+        user = getattr(request, 'user', None)
+        if user is not None and user.is_authenticated:
+            return f'user:{user.pk}'
+        return f'ip:{super().get_ident(request)}'
+
+    def prepare(self, request, view):
+        """The keys to hit, or None when the request is not limited."""
+        scope = getattr(view, self.scope_attr, None)
+        rate = settings.THROTTLE_RATES.get(scope) if scope else None
+        if not rate:
+            return None
+        ident = self.get_ident(request)
+        if ident is None:
+            return None
+        self.num_requests, self.duration = parse_rate(rate)
+        window, self.elapsed = divmod(self.timer(), self.duration)
+        prefix = f'throttle:{scope}:{ident}:'
+        return prefix + str(int(window)), prefix + str(int(window) - 1), 2 * self.duration
+
+    def allow_request(self, request, view):
+        keys = self.prepare(request, view)
+        if keys is None:
+            return True
+        return self.check(*get_store().hit(*keys))
+
+    async def aallow_request(self, request, view):
+        keys = self.prepare(request, view)
+        if keys is None:
+            return True
+        return self.check(*await get_store().ahit(*keys))
+
+    def check(self, current, previous):
+        weight = 1 - self.elapsed / self.duration
+        if previous * weight + current <= self.num_requests:
+            return True
+        # Until the next request fits: the previous window's weight falls to
+        # zero over this window, then this window becomes the previous one.
+        if current < self.num_requests:
+            fits = 1 - (self.num_requests - current - 1) / previous
+            self.wait_seconds = self.duration * fits - self.elapsed
+        else:
+            fits = 1 - (self.num_requests - 1) / current
+            self.wait_seconds = self.duration * (1 + fits) - self.elapsed
+        return False
+
+    def wait(self):
+        return self.wait_seconds
+
+
+class CredentialThrottle(SlidingWindowThrottle):
+    """
+    Limit login attempts per account, whatever address they come from, to
+    the rate of the view's ``credential_throttle_scope``.
+    """
+
+    scope_attr = 'credential_throttle_scope'
+
+    def get_ident(self, request):
+        data = request.data
+        username = data.get(get_user_model().USERNAME_FIELD) if hasattr(data, 'get') else None
+        if not isinstance(username, str) or not username:
+            return None
+        return 'account:' + hashlib.md5(username.strip().lower().encode()).hexdigest()
@@ -6,6 +6,8 @@ from rest_framework import permissions
 from drf_yasg.views import get_schema_view
 from drf_yasg import openapi
 
+from .metrics import MetricsView
+
 schema_view = get_schema_view(
     openapi.Info(
         title="Design Studio API",
@@ -27,6 +29,7 @@ urlpatterns = [
     path('api/v1/users/', include('users.urls')),
     path('api/v1/orders/', include('orders.urls')),
     path('api/v1/tariffs/', include('tariffs.urls')),
+    path('api/v1/metrics/', MetricsView.as_view(), name='metrics'),
     
     # API documentation
     path('swagger/', schema_view.with_ui('swagger', cache_timeout=0),
@@ -0,0 +1,243 @@
+"""
+Offline build of the static frontend: the HTML pages at the repository root
+and the ``css/``, ``js/``, ``fonts/`` and ``images/`` files they reference.
+
+For every page the stylesheets and the scripts are concatenated in document
+order and minified into one bundle each. Bundles, fonts and images get a
+content hash in their names (``css/index.3f2a9c0d41be.css``) so they can be
+cached forever. SVGs that only wrap a bitmap become ``<picture>`` elements
+with AVIF/WebP/PNG sources at 1x and 2x. Text files get ``.gz`` and ``.br``
+siblings for servers that serve precompressed files. The pages keep their
+names; ``manifest.json`` maps every source path to its built path.
+
+The output directory is listed in ``STATICFILES_DIRS``, so ``collectstatic``
+copies the build into ``STATIC_ROOT``.
+"""
+import gzip
+import hashlib
+import html
+import json
+import posixpath
+import re
+import shutil
+from pathlib import Path
+
+from . import images, minify
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+ASSET_DIRS = ('fonts', 'images')
+PRECOMPRESSED = ('.html', '.css', '.js', '.svg')
+GZIP_LEVEL = 9
+BROTLI_QUALITY = 11
+MANIFEST = 'manifest.json'
+
+STYLESHEET = re.compile(r'([ \t]*)(<link\b[^>]*\brel="stylesheet"[^>]*>)([ \t]*\n)?')
+SCRIPT = re.compile(r'([ \t]*)(<script\b[^>]*\bsrc="[^"]*"[^>]*>\s*</script>)([ \t]*\n)?')
+IMG = re.compile(r'<img\b[^>]*>')
+ATTRIBUTE = re.compile(r'([\w:-]+)(?:\s*=\s*"([^"]*)")?')
+CSS_URL = re.compile(r'url\(\s*([\'"]?)([^\'")]+)\1\s*\)')
+# Splits e.g. ``font.eot?#iefix`` into the path and the suffix
+URL_SUFFIX = re.compile(r'([^?#]*)(.*)', re.S)
+TAG_BODY = re.compile(r'<\w+(.*?)/?>', re.S)
+
+
+class BuildError(Exception):
+    pass
+
+
+def attributes(tag):
+    """The attributes of an HTML start tag, in order."""
+    body = TAG_BODY.fullmatch(tag).group(1)
+    return {name: html.unescape(value or '') for name, value in ATTRIBUTE.findall(body)}
+
+
+def is_local(url):
+    return not (url.startswith(('/', '#', 'data:')) or '://' in url)
+
+
+def fingerprinted(path, content):
+    stem, dot, extension = path.rpartition('.')
+    return f'{stem}.{hashlib.md5(content).hexdigest()[:12]}{dot}{extension}'
+
+
+def precompress(content):
+    """``{suffix: compressed}`` for the codings that make ``content`` smaller."""
+    result = {'.gz': gzip.compress(content, GZIP_LEVEL, mtime=0)}
+    if brotli is not None:
+        result['.br'] = brotli.compress(content, quality=BROTLI_QUALITY)
+    return {suffix: data for suffix, data in result.items() if len(data) < len(content)}
+
+
+class Builder:
+    def __init__(self, source, output):
+        self.source = Path(source)
+        self.output = Path(output)
+        # Source path -> built path, both relative and in URL form
+        self.manifest = {}
+        # Page -> (source files it loads, built files it loads)
+        self.pages = {}
+        self.pictures = {}
+
+    def build(self):
+        self.clean()
+        for directory in ASSET_DIRS:
+            for path in sorted((self.source / directory).rglob('*')):
+                if path.is_file():
+                    self.add_asset(path.relative_to(self.source).as_posix())
+        for page in sorted(self.source.glob('*.html')):
+            self.build_page(page.name)
+        # Fingerprinted files are copies of their plain-named originals
+        compressed = {}
+        for path in sorted(self.output.rglob('*')):
+            if path.suffix in PRECOMPRESSED:
+                content = path.read_bytes()
+                key = hashlib.md5(content).digest()
+                if key not in compressed:
+                    compressed[key] = precompress(content)
+                for suffix, data in compressed[key].items():
+                    path.with_name(path.name + suffix).write_bytes(data)
+        (self.output / MANIFEST).write_text(json.dumps(self.manifest, indent=2, sort_keys=True))
+        return self.manifest
+
+    def clean(self):
+        if self.output.exists():
+            if not (self.output / MANIFEST).exists() and any(self.output.iterdir()):
+                raise BuildError(f'{self.output} is not empty and is not a previous build')
+            shutil.rmtree(self.output)
+        self.output.mkdir(parents=True)
+
+    def write(self, path, content):
+        target = self.output / path
+        target.parent.mkdir(parents=True, exist_ok=True)
+        target.write_bytes(content)
+        return path
+
+    def emit(self, path, content):
+        self.manifest[path] = self.write(fingerprinted(path, content), content)
+        return self.manifest[path]
+
+    def add_asset(self, path):
+        content = (self.source / path).read_bytes()
+        # The plain name stays for URLs built at runtime
+        self.write(path, content)
+        self.emit(path, content)
+
+    def build_page(self, name):
+        page = (self.source / name).read_text(encoding='utf-8')
+        stem = name.rpartition('.')[0]
+        loaded = ([], [])
+
+        stylesheets = [attributes(match.group(2)).get('href', '')
+                       for match in STYLESHEET.finditer(page)]
+        stylesheets = [href for href in stylesheets if is_local(href)]
+        if stylesheets:
+            bundle = f'css/{stem}.css'
+            css = '\n'.join(self.stylesheet(href, bundle) for href in stylesheets)
+            url = self.emit(bundle, minify.css(css).encode())
+            page = self.replace_tags(page, STYLESHEET, 'href', stylesheets,
+                                     f'<link rel="stylesheet" href="{url}">')
+            loaded[0].extend(stylesheets)
+            loaded[1].append(url)
+
+        scripts = [attributes(match.group(2)).get('src', '') for match in SCRIPT.finditer(page)]
+        scripts = [src for src in scripts if is_local(src)]
+        if scripts:
+            js = ';\n'.join(minify.js((self.source / src).read_text(encoding='utf-8'))
+                            for src in scripts)
+            url = self.emit(f'js/{stem}.js', js.encode())
+            page = self.replace_tags(page, SCRIPT, 'src', scripts,
+                                     f'<script src="{url}"></script>')
+            loaded[0].extend(scripts)
+            loaded[1].append(url)
+
+        page = IMG.sub(lambda match: self.image(match.group(0), loaded), page)
+        self.write(name, page.encode('utf-8'))
+        self.manifest[name] = name
+        self.pages[name] = loaded
+
+    def replace_tags(self, page, pattern, attribute, urls, replacement):
+        # The first tag gives way to the bundle, the others are dropped
+        replaced = False
+
+        def replace(match):
+            nonlocal replaced
+            if attributes(match.group(2)).get(attribute) not in urls:
+                return match.group(0)
+            if replaced:
+                return ''
+            replaced = True
+            return match.group(1) + replacement + (match.group(3) or '')
+        return pattern.sub(replace, page)
+
+    def stylesheet(self, href, bundle):
+        # url()s are relative to the stylesheet; make them relative to the bundle
+        directory = posixpath.dirname(href)
+
+        def rewrite(match):
+            url = match.group(2)
+            if not is_local(url):
+                return match.group(0)
+            path, suffix = URL_SUFFIX.match(url).groups()
+            target = self.manifest.get(posixpath.normpath(posixpath.join(directory, path)))
+            if target is None:
+                return match.group(0)
+            relative = posixpath.relpath(target, posixpath.dirname(bundle))
+            return f'url("{relative}{suffix}")'
+        return CSS_URL.sub(rewrite, (self.source / href).read_text(encoding='utf-8'))
+
+    def image(self, tag, loaded):
+        attrs = attributes(tag)
+        src = attrs.get('src', '')
+        path = posixpath.normpath(src) if is_local(src) else None
+        if path not in self.manifest:
+            return tag
+        loaded[0].append(path)
+        picture = self.picture(path) if path.endswith('.svg') else None
+        if picture is None:
+            loaded[1].append(self.manifest[path])
+            return tag.replace(f'src="{src}"', f'src="{self.manifest[path]}"', 1)
+
+        sources, (width, height) = picture
+        loaded[1].append(sources[0][1][0][1])
+        *modern, (_, fallback) = sources
+        attrs = {'src': fallback[0][1], 'srcset': self.srcset(fallback),
+                 **{name: value for name, value in attrs.items() if name != 'src'}}
+        attrs.setdefault('width', str(width))
+        attrs.setdefault('height', str(height))
+        attrs.setdefault('loading', 'lazy')
+        attrs.setdefault('decoding', 'async')
+        img = '<img' + ''.join(f' {name}="{html.escape(value)}"'
+                               for name, value in attrs.items()) + '>'
+        return ('<picture>' + ''.join(
+            f'<source type="{mime_type}" srcset="{self.srcset(files)}">'
+            for mime_type, files in modern) + img + '</picture>')
+
+    def picture(self, path):
+        """
+        ``([(mime_type, [(scale, url), ...]), ...], (width, height))`` for a
+        bitmap-in-SVG, best format first, or None.
+        """
+        if path not in self.pictures:
+            content = (self.source / path).read_bytes()
+            rendered = images.variants(content)
+            if rendered is None:
+                self.pictures[path] = None
+            else:
+                stem = path.removesuffix('.svg')
+                sources = []
+                for mime_type, encoded in rendered.items():
+                    extension = images.FORMATS[mime_type][0]
+                    sources.append((mime_type, [
+                        (scale, self.emit(f'{stem}{"" if scale == 1 else f"@{scale}x"}.{extension}',
+                                          data))
+                        for scale, data in encoded]))
+                self.pictures[path] = sources, images.size(content)
+        return self.pictures[path]
+
+    @staticmethod
+    def srcset(files):
+        return ', '.join(url if scale == 1 else f'{url} {scale}x' for scale, url in files)
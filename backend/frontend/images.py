@@ -0,0 +1,146 @@
+"""
+Responsive raster variants of SVGs that only wrap an embedded bitmap.
+
+Design tools export a cropped photo as an SVG whose single ``<rect>`` is
+filled with a pattern showing a base64 PNG. Browsers decode the full bitmap
+to draw a small crop of it. ``flatten_svg`` renders that crop and
+``variants`` encodes it at 1x and 2x in the formats Pillow supports here.
+"""
+import base64
+import io
+import math
+import re
+import xml.etree.ElementTree as ET
+
+from PIL import Image, ImageChops, ImageDraw, features
+
+SVG = '{http://www.w3.org/2000/svg}'
+XLINK_HREF = '{http://www.w3.org/1999/xlink}href'
+DATA_URI = re.compile(r'data:image/[\w+.-]+;base64,(.*)', re.S)
+TRANSFORM = re.compile(r'(matrix|translate|scale)\s*\(([^)]*)\)')
+PAINTED = {'path', 'circle', 'ellipse', 'line', 'polygon', 'polyline', 'text', 'rect'}
+
+SCALES = (1, 2)
+# MIME type -> (extension, Pillow save options), best first; PNG is the
+# fallback every browser decodes
+FORMATS = {
+    'image/avif': ('avif', {'quality': 60}),
+    'image/webp': ('webp', {'quality': 80}),
+    'image/png': ('png', {'optimize': True}),
+}
+if not features.check('avif'):
+    del FORMATS['image/avif']
+
+
+def parse_transform(value):
+    """The affine matrix (a, b, c, d, e, f) of an SVG transform list."""
+    a, b, c, d, e, f = 1, 0, 0, 1, 0, 0
+    for name, args in TRANSFORM.findall(value or ''):
+        numbers = [float(arg) for arg in re.split(r'[\s,]+', args.strip()) if arg]
+        if name == 'matrix':
+            m = numbers
+        elif name == 'translate':
+            m = [1, 0, 0, 1, numbers[0], numbers[1] if len(numbers) > 1 else 0]
+        else:
+            m = [numbers[0], 0, 0, numbers[-1], 0, 0]
+        a, b, c, d, e, f = (a * m[0] + c * m[1], b * m[0] + d * m[1],
+                            a * m[2] + c * m[3], b * m[2] + d * m[3],
+                            a * m[4] + c * m[5] + e, b * m[4] + d * m[5] + f)
+    return a, b, c, d, e, f
+
+
+def length(element, name, default=0.0):
+    value = element.get(name)
+    return default if value is None else float(value.removesuffix('px'))
+
+
+def flatten_svg(data, scale=1):
+    """
+    Render an SVG that only shows a bitmap through a pattern fill, at
+    ``scale`` times its size. Returns None for any other SVG.
+    """
+    try:
+        root = ET.fromstring(data)
+    except ET.ParseError:
+        return None
+    painted = [el for el in root.iter() if el.tag.removeprefix(SVG) in PAINTED]
+    if len(painted) != 1 or painted[0].tag != f'{SVG}rect':
+        return None
+    rect = painted[0]
+    fill = re.fullmatch(r'url\(#([^)]+)\)', rect.get('fill', ''))
+    elements = {el.get('id'): el for el in root.iter() if el.get('id')}
+    pattern = elements.get(fill and fill.group(1))
+    if (pattern is None or pattern.get('patternContentUnits') != 'objectBoundingBox'
+            or len(pattern) != 1 or pattern[0].tag != f'{SVG}use'):
+        return None
+    use = pattern[0]
+    image = elements.get(use.get(XLINK_HREF, use.get('href', '')).removeprefix('#'))
+    uri = image is not None and DATA_URI.fullmatch(image.get(XLINK_HREF, image.get('href', '')))
+    if not uri:
+        return None
+
+    try:
+        width, height = length(root, 'width'), length(root, 'height')
+        x, y = length(rect, 'x'), length(rect, 'y')
+        rect_width, rect_height = length(rect, 'width'), length(rect, 'height')
+        radius = length(rect, 'rx', length(rect, 'ry'))
+        bitmap = Image.open(io.BytesIO(base64.b64decode(uri.group(1)))).convert('RGBA')
+        # Bitmap pixels per image unit
+        px = bitmap.width / length(image, 'width', bitmap.width)
+        py = bitmap.height / length(image, 'height', bitmap.height)
+        a, b, c, d, e, f = parse_transform(use.get('transform'))
+    except (ValueError, IndexError, OSError):
+        return None
+    determinant = a * d - b * c
+    if not (width and height and rect_width and rect_height and determinant):
+        return None
+
+    # Output pixel -> bounding box units -> image units -> bitmap pixel
+    u0, v0 = -x / rect_width, -y / rect_height
+    su, sv = 1 / (rect_width * scale), 1 / (rect_height * scale)
+    ia, ib, ic, id_ = d / determinant, -b / determinant, -c / determinant, a / determinant
+    ie, if_ = -(ia * e + ic * f), -(ib * e + id_ * f)
+    xx, xy, yx, yy = px * ia * su, px * ic * sv, py * ib * su, py * id_ * sv
+    # The affine transform samples without filtering: render at about the
+    # bitmap's resolution and scale down.
+    oversample = max(1, math.ceil(max(math.hypot(xx, yx), math.hypot(xy, yy))))
+    size = round(width * scale), round(height * scale)
+    large = size[0] * oversample, size[1] * oversample
+    coefficients = (xx / oversample, xy / oversample, px * (ia * u0 + ic * v0 + ie),
+                    yx / oversample, yy / oversample, py * (ib * u0 + id_ * v0 + if_))
+    rendered = bitmap.transform(large, Image.Transform.AFFINE, coefficients,
+                                resample=Image.Resampling.BILINEAR)
+
+    k = scale * oversample
+    mask = Image.new('L', large, 0)
+    ImageDraw.Draw(mask).rounded_rectangle(
+        (x * k, y * k, (x + rect_width) * k - 1, (y + rect_height) * k - 1),
+        radius=radius * k, fill=255)
+    rendered.putalpha(ImageChops.multiply(rendered.getchannel('A'), mask))
+    rendered = rendered.resize(size, Image.Resampling.LANCZOS)
+    return rendered
+
+
+def variants(data):
+    """
+    ``{mime_type: [(scale, encoded bytes), ...]}`` for a flattenable SVG, or
+    None.
+    """
+    rendered = {scale: flatten_svg(data, scale) for scale in SCALES}
+    if rendered[1] is None:
+        return None
+    result = {}
+    for mime_type, (extension, options) in FORMATS.items():
+        result[mime_type] = []
+        for scale, image in rendered.items():
+            if image.getextrema()[3][0] == 255 and extension == 'png':
+                image = image.convert('RGB')
+            buffer = io.BytesIO()
+            image.save(buffer, extension, **options)
+            result[mime_type].append((scale, buffer.getvalue()))
+    return result
+
+
+def size(data):
+    root = ET.fromstring(data)
+    return round(length(root, 'width')), round(length(root, 'height'))
@@ -0,0 +1,44 @@
+import time
+from pathlib import Path
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from frontend.build import Builder, BuildError
+
+
+class Command(BaseCommand):
+    help = 'Bundle, minify, fingerprint and precompress the frontend for collectstatic'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--source', default=settings.FRONTEND_DIR,
+                            help='Directory with the HTML pages (default: FRONTEND_DIR)')
+        parser.add_argument('--output', default=settings.FRONTEND_BUILD_DIR,
+                            help='Build directory (default: FRONTEND_BUILD_DIR)')
+
+    def handle(self, *args, **options):
+        started = time.perf_counter()
+        builder = Builder(options['source'], options['output'])
+        try:
+            manifest = builder.build()
+        except BuildError as e:
+            raise CommandError(str(e))
+
+        # What each page loads besides itself, before and after the build
+        self.stdout.write(f'{"page":<16}{"files":>7}{"bytes":>10}{"built":>8}'
+                          f'{"bytes":>10}{"br/gz":>10}')
+        for page, (sources, built) in builder.pages.items():
+            sources, built = dict.fromkeys(sources), dict.fromkeys(built)
+            before = sum((builder.source / path).stat().st_size for path in sources)
+            after = sum((builder.output / path).stat().st_size for path in built)
+            wire = sum(self.smallest(builder.output / path) for path in built)
+            self.stdout.write(f'{page:<16}{len(sources):>7}{before:>10}{len(built):>8}'
+                              f'{after:>10}{wire:>10}')
+        self.stdout.write(self.style.SUCCESS(
+            f'Built {len(manifest)} files into {builder.output} in '
+            f'{time.perf_counter() - started:.1f}s. Run collectstatic to publish them.'
+        ))
+
+    @staticmethod
+    def smallest(path):
+        siblings = [Path(f'{path}{suffix}') for suffix in ('.br', '.gz')]
+        return min(p.stat().st_size for p in [path, *siblings] if p.exists())
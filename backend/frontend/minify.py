@@ -0,0 +1,179 @@
+"""
+Conservative CSS and JavaScript minifiers for the site's own sources.
+
+Both drop comments and collapse whitespace but never rewrite tokens: strings,
+template literals and regular expressions are copied verbatim. The JS
+minifier keeps a line break wherever removing it could change automatic
+semicolon insertion.
+"""
+import re
+
+SPACE = re.compile(r'\s+')
+WORD = re.compile(r'[\w$]+')
+
+# No space is needed next to these
+CSS_TIGHT_BEFORE = set('{};,>)!')
+CSS_TIGHT_AFTER = set('{};,:>(')
+# Pairs that would fuse into a different token without a space
+JS_FUSING = {'++', '--', '//', '/*'}
+# A line break after or before these never ends a statement
+JS_JOIN_AFTER = set('{([;,:?=&|!')
+JS_JOIN_BEFORE = set('})];,')
+# After these a slash starts a regular expression, not a division
+JS_REGEX_AFTER = set('(,=:[!&|?{};+-*%<>~^')
+JS_REGEX_KEYWORDS = {
+    'return', 'typeof', 'case', 'do', 'else', 'in', 'of', 'new', 'delete',
+    'void', 'throw', 'instanceof', 'yield', 'await',
+}
+
+
+def skip_string(source, i):
+    quote = source[i]
+    i += 1
+    while i < len(source) and source[i] != quote:
+        if source[i] == '\\':
+            i += 1
+        i += 1
+    return i + 1
+
+
+def skip_template(source, i):
+    i += 1
+    while i < len(source) and source[i] != '`':
+        if source[i] == '\\':
+            i += 2
+        elif source.startswith('${', i):
+            i = skip_expression(source, i + 2)
+        else:
+            i += 1
+    return i + 1
+
+
+def skip_expression(source, i):
+    # Up to and including the ``}`` that closes a template substitution
+    depth = 0
+    while i < len(source):
+        char = source[i]
+        if char in '\'"':
+            i = skip_string(source, i)
+            continue
+        if char == '`':
+            i = skip_template(source, i)
+            continue
+        if char == '{':
+            depth += 1
+        elif char == '}':
+            if depth == 0:
+                return i + 1
+            depth -= 1
+        i += 1
+    return i
+
+
+def skip_regex(source, i):
+    i += 1
+    in_class = False
+    while i < len(source):
+        char = source[i]
+        if char == '\\':
+            i += 1
+        elif char == '[':
+            in_class = True
+        elif char == ']':
+            in_class = False
+        elif char == '/' and not in_class:
+            break
+        i += 1
+    match = WORD.match(source, i + 1)
+    return match.end() if match else i + 1
+
+
+def css(source):
+    out = []
+    space = False
+    i = 0
+    while i < len(source):
+        char = source[i]
+        if char.isspace():
+            space = True
+            i = SPACE.match(source, i).end()
+            continue
+        if source.startswith('/*', i):
+            end = source.find('*/', i + 2)
+            i = len(source) if end == -1 else end + 2
+            space = True
+            continue
+        if char in '\'"':
+            end = skip_string(source, i)
+            token = source[i:end]
+            i = end
+        else:
+            token = char
+            i += 1
+        if out:
+            if token == '}' and out[-1] == ';':
+                out.pop()
+            elif space and out[-1][-1] not in CSS_TIGHT_AFTER and token[0] not in CSS_TIGHT_BEFORE:
+                out.append(' ')
+        space = False
+        out.append(token)
+    return ''.join(out)
+
+
+def needs_space(last, first):
+    if WORD.match(last) and WORD.match(first):
+        return True
+    return last + first in JS_FUSING or (first == '.' and last.isdigit())
+
+
+def js(source):
+    out = []
+    # Whitespace since the last token: None, ' ' or '\n'
+    gap = None
+    previous = ''
+    i = 0
+    while i < len(source):
+        char = source[i]
+        if char.isspace():
+            end = SPACE.match(source, i).end()
+            if gap != '\n':
+                gap = '\n' if '\n' in source[i:end] else ' '
+            i = end
+            continue
+        if source.startswith('//', i):
+            end = source.find('\n', i)
+            i = len(source) if end == -1 else end
+            continue
+        if source.startswith('/*', i):
+            end = source.find('*/', i + 2)
+            end = len(source) if end == -1 else end + 2
+            if gap != '\n':
+                gap = '\n' if '\n' in source[i:end] else ' '
+            i = end
+            continue
+
+        if char in '\'"':
+            end = skip_string(source, i)
+        elif char == '`':
+            end = skip_template(source, i)
+        elif char == '/' and (not previous or previous in JS_REGEX_AFTER
+                              or previous in JS_REGEX_KEYWORDS):
+            end = skip_regex(source, i)
+        elif WORD.match(source, i):
+            end = WORD.match(source, i).end()
+        else:
+            end = i + 1
+        token = source[i:end]
+        i = end
+
+        if out and gap:
+            last, first = out[-1][-1], token[0]
+            if gap == '\n':
+                if last not in JS_JOIN_AFTER and first not in JS_JOIN_BEFORE:
+                    out.append('\n')
+            elif needs_space(last, first):
+                out.append(' ')
+        gap = None
+        previous = token
+        out.append(token)
+    return ''.join(out)
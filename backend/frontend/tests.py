@@ -0,0 +1,196 @@
+import base64
+import io
+import json
+import tempfile
+from pathlib import Path
+from django.core.management import CommandError, call_command
+from django.test import SimpleTestCase
+from PIL import Image
+from . import images, minify
+from .build import Builder, BuildError
+
+
+def bitmap_svg(width=10, height=10, transform='matrix(0.05 0 0 0.1 -1 0)'):
+    # A 40x20 bitmap, red on the left and blue on the right; the default
+    # transform shows the right half.
+    bitmap = Image.new('RGB', (40, 20), 'red')
+    bitmap.paste('blue', (20, 0, 40, 20))
+    buffer = io.BytesIO()
+    bitmap.save(buffer, 'png')
+    data = base64.b64encode(buffer.getvalue()).decode()
+    return (
+        f'<svg width="{width}" height="{height}" xmlns="http://www.w3.org/2000/svg" '
+        f'xmlns:xlink="http://www.w3.org/1999/xlink">'
+        f'<rect width="{width}" height="{height}" fill="url(#p)"/><defs>'
+        f'<pattern id="p" patternContentUnits="objectBoundingBox" width="1" height="1">'
+        f'<use xlink:href="#i" transform="{transform}"/></pattern>'
+        f'<image id="i" width="40" height="20" xlink:href="data:image/png;base64,{data}"/>'
+        f'</defs></svg>'
+    ).encode()
+
+
+class MinifyTests(SimpleTestCase):
+    def test_css(self):
+        source = """
+            /* header */
+            .a > .b ,  .c {
+                color : red ;
+                content: "  x  /* y */ ";
+                margin: 0 auto;
+            }
+            @media (max-width: 600px) and (min-width: 100px) { .d { width: calc(100% - 2px) } }
+        """
+        self.assertEqual(
+            minify.css(source),
+            '.a>.b,.c{color :red;content:"  x  /* y */ ";margin:0 auto}'
+            '@media (max-width:600px) and (min-width:100px){.d{width:calc(100% - 2px)}}'
+        )
+
+    def test_js_keeps_literals(self):
+        source = (
+            "const re = /^[^\\s@]+@[^\\s@]+\\.[^\\s@]+$/; // email\n"
+            "const half = total / 2 / count;\n"
+            "el.style.cssText = `\n    color: red;  // not a comment\n    width: ${w / 2}px;\n`;\n"
+            "const s = 'a  /* b */  c';\n"
+        )
+        self.assertEqual(
+            minify.js(source),
+            "const re=/^[^\\s@]+@[^\\s@]+\\.[^\\s@]+$/;const half=total/2/count;"
+            "el.style.cssText=`\n    color: red;  // not a comment\n    width: ${w / 2}px;\n`;"
+            "const s='a  /* b */  c';"
+        )
+
+    def test_js_keeps_significant_whitespace(self):
+        source = (
+            "function f(a, b) {\n"
+            "    /* sum */\n"
+            "    let x = a - -b\n"
+            "    let y = x + +b\n"
+            "    return x\n"
+            "}\n"
+        )
+        self.assertEqual(minify.js(source),
+                         'function f(a,b){let x=a- -b\nlet y=x+ +b\nreturn x}')
+
+
+class ImageTests(SimpleTestCase):
+    def test_flatten_crops_the_bitmap(self):
+        image = images.flatten_svg(bitmap_svg())
+        self.assertEqual(image.size, (10, 10))
+        self.assertEqual(image.getpixel((5, 5)), (0, 0, 255, 255))
+        self.assertEqual(images.flatten_svg(bitmap_svg(), scale=2).size, (20, 20))
+
+    def test_flatten_leaves_uncovered_area_transparent(self):
+        image = images.flatten_svg(bitmap_svg(transform='translate(0.5 0) scale(0.05 0.1)'))
+        self.assertEqual(image.getpixel((1, 5))[3], 0)
+        self.assertEqual(image.getpixel((8, 5)), (255, 0, 0, 255))
+
+    def test_other_svgs_are_not_flattened(self):
+        svg = b'<svg width="10" height="10" xmlns="http://www.w3.org/2000/svg"><path d="M0 0h10"/></svg>'
+        self.assertIsNone(images.flatten_svg(svg))
+        self.assertIsNone(images.variants(svg))
+
+    def test_variants(self):
+        variants = images.variants(bitmap_svg())
+        self.assertEqual(list(variants)[-1], 'image/png')
+        for mime_type, encoded in variants.items():
+            self.assertEqual([scale for scale, _ in encoded], [1, 2])
+            self.assertEqual(Image.open(io.BytesIO(encoded[1][1])).size, (20, 20))
+
+
+class BuildTests(SimpleTestCase):
+    def setUp(self):
+        temp = tempfile.TemporaryDirectory()
+        self.addCleanup(temp.cleanup)
+        self.source = Path(temp.name) / 'site'
+        self.output = Path(temp.name) / 'build'
+        files = {
+            'index.html': (
+                '<html><head>\n'
+                '    <link rel="stylesheet" href="css/fonts.css">\n'
+                '    <link rel="stylesheet" href="css/pages/main.css">\n'
+                '</head><body>\n'
+                '    <img src="images/logo.svg" alt="logo">\n'
+                '    <img src="images/photo.svg" alt="photo" class="photo">\n'
+                '    <script src="js/a.js"></script>\n'
+                '    <script src="js/b.js"></script>\n'
+                '</body></html>\n'
+            ),
+            'css/fonts.css': '@font-face { src: url("../fonts/f.woff2") format("woff2"); }\n',
+            'css/pages/main.css': 'body { margin: 0; }\n' * 20,
+            'js/a.js': 'const a = 1  // one\n',
+            'js/b.js': 'console.log(a)\n',
+            'fonts/f.woff2': 'font',
+            'images/logo.svg': '<svg xmlns="http://www.w3.org/2000/svg"><path d="M0 0"/></svg>',
+            'images/photo.svg': bitmap_svg(),
+        }
+        for name, content in files.items():
+            path = self.source / name
+            path.parent.mkdir(parents=True, exist_ok=True)
+            path.write_bytes(content if isinstance(content, bytes) else content.encode())
+
+    def build(self):
+        builder = Builder(self.source, self.output)
+        builder.build()
+        return builder
+
+    def read(self, path):
+        return (self.output / path).read_text()
+
+    def test_bundles_and_fingerprints(self):
+        manifest = self.build().manifest
+        page = self.read('index.html')
+        css, js = manifest['css/index.css'], manifest['js/index.js']
+        self.assertRegex(css, r'^css/index\.[0-9a-f]{12}\.css$')
+        self.assertIn(f'    <link rel="stylesheet" href="{css}">\n</head>', page)
+        self.assertIn(f'    <script src="{js}"></script>\n</body>', page)
+        self.assertNotIn('fonts.css', page)
+        self.assertEqual(self.read(js), 'const a=1;\nconsole.log(a)')
+        font = manifest['fonts/f.woff2']
+        self.assertTrue(self.read(css).startswith(
+            f'@font-face{{src:url("../{font}") format("woff2")}}body{{margin:0}}'))
+        self.assertEqual(json.loads(self.read('manifest.json')), manifest)
+        # Plain names stay for URLs built by scripts
+        self.assertEqual(self.read('images/logo.svg'), self.read(manifest['images/logo.svg']))
+
+    def test_images(self):
+        manifest = self.build().manifest
+        page = self.read('index.html')
+        self.assertIn(f'<img src="{manifest["images/logo.svg"]}" alt="logo">', page)
+        png, png2x = manifest['images/photo.png'], manifest['images/photo@2x.png']
+        self.assertIn(f'<img src="{png}" srcset="{png}, {png2x} 2x" alt="photo" class="photo" '
+                      f'width="10" height="10" loading="lazy" decoding="async"></picture>', page)
+        webp = manifest['images/photo.webp']
+        self.assertIn(f'<source type="image/webp" srcset="{webp}, ', page)
+        self.assertEqual(page.count('<picture><source type="image/'), 1)
+
+    def test_precompressed_siblings(self):
+        manifest = self.build().manifest
+        css = self.output / manifest['css/index.css']
+        self.assertLess(css.with_name(css.name + '.gz').stat().st_size, css.stat().st_size)
+        self.assertTrue((self.output / 'index.html.gz').exists())
+        woff2 = self.output / manifest['fonts/f.woff2']
+        self.assertFalse(woff2.with_name(woff2.name + '.gz').exists())
+
+    def test_rebuild_replaces_previous_build(self):
+        self.build()
+        (self.source / 'js/b.js').write_text('console.log(a + 1)\n')
+        manifest = self.build().manifest
+        self.assertEqual(len(list((self.output / 'js').glob('index.*.js'))), 1)
+        self.assertIn('a+1', self.read(manifest['js/index.js']))
+
+    def test_refuses_foreign_output_directory(self):
+        self.output.mkdir()
+        (self.output / 'keep.txt').write_text('keep')
+        with self.assertRaises(BuildError):
+            self.build()
+        with self.assertRaises(CommandError):
+            call_command('build_frontend', source=self.source, output=self.output,
+                         stdout=io.StringIO())
+        self.assertTrue((self.output / 'keep.txt').exists())
+
+    def test_command(self):
+        stdout = io.StringIO()
+        call_command('build_frontend', source=self.source, output=self.output, stdout=stdout)
+        self.assertIn('index.html', stdout.getvalue())
+        self.assertTrue((self.output / 'manifest.json').exists())
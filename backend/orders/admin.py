@@ -1,9 +1,10 @@
 from django.contrib import admin
-from .models import Order
+from config.softdelete import SoftDeleteAdminMixin
+from .models import ArchivedOrder, Order
 
 
 @admin.register(Order)
-class OrderAdmin(admin.ModelAdmin):
+class OrderAdmin(SoftDeleteAdminMixin, admin.ModelAdmin):
     list_display = ('id', 'user', 'project_name', 'tariff', 'status',
                    'total_price', 'deadline', 'created_at')
     list_filter = ('status', 'created_at', 'deadline', 'is_deleted')
@@ -14,4 +15,23 @@ class OrderAdmin(admin.ModelAdmin):
     ordering = ('-created_at',)
 
     def get_queryset(self, request):
-        return super().get_queryset(request).select_related('user', 'tariff') 
\ No newline at end of file
+        return super().get_queryset(request).select_related('user', 'tariff')
+
+
+@admin.register(ArchivedOrder)
+class ArchivedOrderAdmin(admin.ModelAdmin):
+    """Archived orders (orders.archive) are shown but never changed."""
+
+    list_display = OrderAdmin.list_display
+    list_filter = OrderAdmin.list_filter
+    search_fields = OrderAdmin.search_fields
+    ordering = OrderAdmin.ordering
+
+    def get_queryset(self, request):
+        return super().get_queryset(request).select_related('user', 'tariff')
+
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
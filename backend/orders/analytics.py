@@ -0,0 +1,161 @@
+"""
+Order analytics, precomputed per day, tariff and status in ``OrderDailyStats``.
+
+Every change to an order moves it between buckets: the stored state is read
+just before a save or delete (one primary key lookup) and the difference is
+applied with one upsert. Writes that bypass the signals go through
+``record_created()`` (bulk creation), ``update_status()`` (bulk status
+changes) and ``set_deleted()`` (``Order.objects`` querysets' ``soft_delete()``
+and ``restore()``). Anything else that changes orders in bulk, such as
+``QuerySet.update()`` or raw SQL, leaves the table behind until
+``manage.py rebuild_order_stats``, which also repairs drift from concurrent
+updates of the same order. Archiving (``orders.archive``) moves orders
+without changing what they count towards.
+"""
+from collections import defaultdict
+from decimal import Decimal
+
+from django.db import connection, transaction
+from django.db.models import Count, Sum
+from django.db.models.functions import TruncDate
+from django.utils import timezone
+
+from .models import CombinedOrder, Order, OrderDailyStats
+
+TRACKED_FIELDS = ('created_at', 'tariff_id', 'status', 'total_price', 'is_deleted')
+
+
+def state(created_at, tariff_id, status, total_price, is_deleted):
+    # (bucket, price) an order counts towards, None if it counts nowhere.
+    if is_deleted or created_at is None:
+        return None
+    return (timezone.localdate(created_at), tariff_id, status), Decimal(total_price)
+
+
+def order_state(order):
+    return state(*(getattr(order, name) for name in TRACKED_FIELDS))
+
+
+def stored_state(pk):
+    # What the stats currently count the order as; the instance at hand may
+    # be stale.
+    stored = Order.objects.all_with_deleted().filter(pk=pk).values_list(*TRACKED_FIELDS).first()
+    return None if stored is None else state(*stored)
+
+
+def order_saving(sender, instance, raw=False, **kwargs):
+    instance._stats_state = None
+    if not raw and not instance._state.adding:
+        instance._stats_state = stored_state(instance.pk)
+
+
+def order_saved(sender, instance, raw=False, **kwargs):
+    if raw:
+        return
+    old, new = getattr(instance, '_stats_state', None), order_state(instance)
+    if old != new:
+        record(changes(removed=[old], added=[new]))
+
+
+def order_deleting(sender, instance, **kwargs):
+    record(changes(removed=[stored_state(instance.pk)]))
+
+
+def changes(removed=(), added=()):
+    deltas = defaultdict(lambda: [0, Decimal(0)])
+    for sign, states in ((-1, removed), (1, added)):
+        for item in states:
+            if item is not None:
+                bucket, price = item
+                deltas[bucket][0] += sign
+                deltas[bucket][1] += sign * price
+    return deltas
+
+
+def record(deltas):
+    """
+    Add ``{(day, tariff_id, status): [count, revenue]}`` to the stats with a
+    single upsert, which concurrent writers cannot lose updates to.
+    """
+    rows = [(day, tariff_id, status, count, revenue)
+            for (day, tariff_id, status), (count, revenue) in deltas.items()
+            if count or revenue]
+    if not rows:
+        return
+    fields = OrderDailyStats._meta
+    day_field = fields.get_field('day')
+    revenue_field = fields.get_field('revenue')
+    table = connection.ops.quote_name(fields.db_table)
+    with connection.cursor() as cursor:
+        cursor.executemany(
+            f'INSERT INTO {table} (day, tariff_id, status, order_count, revenue) '
+            f'VALUES (%s, %s, %s, %s, %s) '
+            f'ON CONFLICT (day, tariff_id, status) DO UPDATE SET '
+            f'order_count = {table}.order_count + excluded.order_count, '
+            f'revenue = {table}.revenue + excluded.revenue',
+            [(day_field.get_db_prep_value(day, connection), tariff_id, status, count,
+              revenue_field.get_db_prep_value(revenue, connection))
+             for day, tariff_id, status, count, revenue in rows]
+        )
+
+
+def record_created(orders):
+    # For bulk_create(), which does not send post_save.
+    record(changes(added=[order_state(order) for order in orders]))
+
+
+def buckets(queryset, is_deleted=False):
+    return (queryset.filter(is_deleted=is_deleted)
+            .values('tariff', 'status', day=TruncDate('created_at'))
+            .annotate(count=Count('id'), revenue=Sum('total_price'))
+            .order_by())
+
+
+def update_status(queryset, status, **fields):
+    """
+    ``queryset.update(status=status, **fields)`` that moves the updated orders
+    to their new bucket. Returns the number of orders updated.
+    """
+    with transaction.atomic():
+        deltas = defaultdict(lambda: [0, Decimal(0)])
+        for row in buckets(queryset.exclude(status=status)):
+            for bucket_status, sign in ((row['status'], -1), (status, 1)):
+                delta = deltas[row['day'], row['tariff'], bucket_status]
+                delta[0] += sign * row['count']
+                delta[1] += sign * row['revenue']
+        updated = queryset.update(status=status, **fields)
+        record(deltas)
+    return updated
+
+
+def set_deleted(queryset, is_deleted, **fields):
+    """
+    ``queryset.update(is_deleted=is_deleted, **fields)`` for the orders not
+    deleted (or restored) yet, taking them out of (or back into) the stats.
+    Returns the number of orders updated.
+    """
+    queryset = queryset.filter(is_deleted=not is_deleted)
+    sign = -1 if is_deleted else 1
+    with transaction.atomic():
+        deltas = defaultdict(lambda: [0, Decimal(0)])
+        for row in buckets(queryset, is_deleted=not is_deleted):
+            delta = deltas[row['day'], row['tariff'], row['status']]
+            delta[0] += sign * row['count']
+            delta[1] += sign * row['revenue']
+        updated = queryset.update(is_deleted=is_deleted, **fields)
+        record(deltas)
+    return updated
+
+
+def rebuild():
+    """Recompute the whole table from the orders, archived ones included, in one pass."""
+    with transaction.atomic():
+        OrderDailyStats.objects.all().delete()
+        stats = OrderDailyStats.objects.bulk_create(
+            (OrderDailyStats(day=row['day'], tariff_id=row['tariff'],
+                             status=row['status'], order_count=row['count'],
+                             revenue=row['revenue'])
+             for row in buckets(CombinedOrder.objects.all()).iterator()),
+            batch_size=1000,
+        )
+    return len(stats)
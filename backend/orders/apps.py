@@ -0,0 +1,20 @@
+from django.apps import AppConfig
+
+
+class OrdersConfig(AppConfig):
+    default_auto_field = 'django.db.models.BigAutoField'
+    name = 'orders'
+
+    def ready(self):
+        from django.db.models.signals import post_save, pre_delete, pre_save
+        from config import search
+        from . import analytics
+        from .models import Order
+
+        search.register(Order, ['project_name', 'project_description'])
+        pre_save.connect(analytics.order_saving, sender=Order,
+                         dispatch_uid='orders-analytics-saving')
+        post_save.connect(analytics.order_saved, sender=Order,
+                          dispatch_uid='orders-analytics-saved')
+        pre_delete.connect(analytics.order_deleting, sender=Order,
+                           dispatch_uid='orders-analytics-deleting')
@@ -0,0 +1,72 @@
+"""
+Hot and cold storage for orders.
+
+Orders that are finished (completed or cancelled) or soft-deleted and have
+not changed for ``ORDER_ARCHIVE_AFTER_DAYS`` move from ``orders_order`` to
+``orders_archivedorder``, keeping their ids and columns, so the table and the
+indexes behind the order list only hold the orders still being worked on.
+Each batch of ``ORDER_ARCHIVE_BATCH_SIZE`` orders is copied and deleted in
+one transaction: an interrupted run loses nothing and the next run carries
+on from there.
+
+Archived orders are read-only. ``CombinedOrder`` reads both tables, as the
+order endpoints do with ``?include_archived=true``. The analytics stats keep
+counting archived orders.
+"""
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import connection, transaction
+from django.db.models import Q
+from django.utils import timezone
+
+from config import search
+from .models import ArchivedOrder, Order
+
+ARCHIVABLE_STATUSES = (Order.Status.COMPLETED, Order.Status.CANCELLED)
+
+
+def archivable(cutoff):
+    return (Order.objects.all_with_deleted()
+            .filter(Q(status__in=ARCHIVABLE_STATUSES) | Q(is_deleted=True),
+                    updated_at__lt=cutoff))
+
+
+def archive_batch(cutoff, batch_size, after=0):
+    """
+    Move up to ``batch_size`` archivable orders with an id above ``after``,
+    lowest ids first. Returns the ids moved.
+    """
+    quote = connection.ops.quote_name
+    columns = ', '.join(quote(field.column) for field in Order._meta.concrete_fields)
+    orders, pk = quote(Order._meta.db_table), quote(Order._meta.pk.column)
+    with transaction.atomic():
+        # Orders being updated right now are left for the next run
+        ids = list(archivable(cutoff).filter(pk__gt=after).order_by('pk')
+                   .select_for_update(skip_locked=True)
+                   .values_list('pk', flat=True)[:batch_size])
+        if not ids:
+            return ids
+        placeholders = ', '.join(['%s'] * len(ids))
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f'INSERT INTO {quote(ArchivedOrder._meta.db_table)} ({columns}) '
+                f'SELECT {columns} FROM {orders} WHERE {pk} IN ({placeholders})', ids)
+            cursor.execute(f'DELETE FROM {orders} WHERE {pk} IN ({placeholders})', ids)
+        search.remove_many(Order, ids)
+    return ids
+
+
+def archive(older_than=None, batch_size=None, progress=None):
+    """Move every archivable order in batches and return how many moved."""
+    if older_than is None:
+        older_than = timedelta(days=settings.ORDER_ARCHIVE_AFTER_DAYS)
+    cutoff = timezone.now() - older_than
+    batch_size = batch_size or settings.ORDER_ARCHIVE_BATCH_SIZE
+    moved, last = 0, 0
+    while ids := archive_batch(cutoff, batch_size, after=last):
+        moved += len(ids)
+        last = ids[-1]
+        if progress:
+            progress(moved)
+    return moved
@@ -0,0 +1,297 @@
+"""
+Order attachments: resumable uploads, content-addressed storage, downloads
+with byte ranges and image thumbnails.
+
+An upload is announced with its size, then sent in chunks, each a ``PATCH``
+with a ``Content-Range`` header. Chunks are written from the request stream
+straight into ``ATTACHMENT_ROOT/uploads/<id>``, never held in memory whole.
+After a dropped connection the client asks for the upload's offset and
+carries on from there. The finished file is stored once under the SHA-256
+of its content (``blobs/ab/cd/abcd...``); an identical upload, to any order,
+only adds an ``Attachment`` row pointing at it.
+
+Downloads are ``FileResponse`` of the stored file, which WSGI servers send
+with ``sendfile()``, or a single byte range of it. With
+``ATTACHMENT_ACCEL_REDIRECT`` nginx sends the file instead. Thumbnails of
+images are made after the upload's response, by ``ATTACHMENT_THUMBNAIL_WORKERS``
+background threads.
+"""
+import hashlib
+import os
+import re
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+from pathlib import Path
+
+from django.conf import settings
+from django.db import connections, transaction
+from django.http import FileResponse, Http404, HttpResponse, HttpResponseNotModified
+from django.utils.http import content_disposition_header, quote_etag
+from PIL import Image, ImageOps
+
+from config.conditional import etag_matches
+from .models import Attachment, Blob, Upload
+
+CHUNK_SIZE = 256 * 1024
+CONTENT_RANGE = re.compile(r'bytes (\d+)-(\d+)/(\d+)$')
+RANGE = re.compile(r'bytes=(\d*)-(\d*)$')
+
+_pool = None
+_pool_lock = threading.Lock()
+# Blobs queued for a thumbnail
+_pending = set()
+
+
+def root():
+    return Path(settings.ATTACHMENT_ROOT)
+
+
+def blob_path(sha256):
+    return root() / 'blobs' / sha256[:2] / sha256[2:4] / sha256
+
+
+def thumbnail_path(sha256):
+    return root() / 'thumbnails' / sha256[:2] / f'{sha256}.webp'
+
+
+def upload_path(upload_id):
+    return root() / 'uploads' / str(upload_id)
+
+
+def start_upload(**fields):
+    upload = Upload.objects.create(**fields)
+    path = upload_path(upload.pk)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.touch()
+    return upload
+
+
+def parse_content_range(value, size):
+    """``(start, end)`` of a ``Content-Range: bytes start-end/size`` header, or None."""
+    match = CONTENT_RANGE.match(value or '')
+    if not match:
+        return None
+    start, end, total = map(int, match.groups())
+    if total != size or start > end or end >= size:
+        return None
+    return start, end
+
+
+def write_chunk(upload, start, end, stream):
+    """
+    Write bytes ``start`` to ``end`` of the upload from ``stream`` and return
+    the upload's new offset, which is less than ``end + 1`` when the client
+    went away; the bytes that did arrive are kept. Returns None when another
+    request moved the offset in the meantime.
+    """
+    remaining = end + 1 - start
+    with open(upload_path(upload.pk), 'r+b') as part:
+        part.seek(start)
+        while remaining:
+            data = stream.read(min(CHUNK_SIZE, remaining))
+            if not data:
+                break
+            part.write(data)
+            remaining -= len(data)
+    offset = end + 1 - remaining
+    if not Upload.objects.filter(pk=upload.pk, received=start).update(received=offset):
+        return None
+    upload.received = offset
+    return offset
+
+
+def complete_upload(upload):
+    """Store a fully received upload and return its ``Attachment``."""
+    path = upload_path(upload.pk)
+    digest = hashlib.sha256()
+    with open(path, 'rb') as part:
+        while data := part.read(CHUNK_SIZE):
+            digest.update(data)
+    sha256 = digest.hexdigest()
+    target = blob_path(sha256)
+    with transaction.atomic():
+        # Locked until the attachment is in: a purge deleting the blob
+        # meanwhile finishes first, and the row and file are made again
+        blob, _ = (Blob.objects.select_for_update()
+                   .get_or_create(sha256=sha256, defaults={'size': upload.size}))
+        if target.exists():
+            path.unlink()
+        else:
+            target.parent.mkdir(parents=True, exist_ok=True)
+            os.replace(path, target)
+        attachment = Attachment.objects.create(
+            order_id=upload.order_id, blob=blob, filename=upload.filename,
+            content_type=upload.content_type, uploaded_by_id=upload.user_id,
+        )
+        upload.delete()
+        if blob.has_thumbnail is None and upload.content_type.startswith('image/'):
+            transaction.on_commit(partial(schedule_thumbnail, sha256))
+    return attachment
+
+
+def cancel_upload(upload):
+    upload_path(upload.pk).unlink(missing_ok=True)
+    upload.delete()
+
+
+def purge(before):
+    """
+    Delete the uploads not touched since ``before`` and the blobs no
+    attachment uses any more. Returns the numbers of each.
+    """
+    uploads = 0
+    for upload in Upload.objects.filter(updated_at__lt=before).iterator():
+        cancel_upload(upload)
+        uploads += 1
+    with transaction.atomic():
+        # complete_upload locks a blob before attaching to it; a blob that
+        # got an attachment while this waited for the locks is kept
+        locked = list(Blob.objects.filter(attachments__isnull=True, created_at__lt=before)
+                      .select_for_update(of=('self',)).values_list('pk', flat=True))
+        blobs = list(Blob.objects.filter(pk__in=locked, attachments__isnull=True)
+                     .values_list('pk', flat=True))
+        Blob.objects.filter(pk__in=blobs).delete()
+        for sha256 in blobs:
+            blob_path(sha256).unlink(missing_ok=True)
+            thumbnail_path(sha256).unlink(missing_ok=True)
+    return uploads, len(blobs)
+
+
+def get_pool():
+    """The thumbnail threads, started on first use, or None when disabled."""
+    global _pool
+    if not settings.ATTACHMENT_THUMBNAIL_WORKERS:
+        return None
+    with _pool_lock:
+        if _pool is None:
+            _pool = ThreadPoolExecutor(max_workers=settings.ATTACHMENT_THUMBNAIL_WORKERS,
+                                       thread_name_prefix='thumbnails')
+        return _pool
+
+
+def schedule_thumbnail(sha256):
+    pool = get_pool()
+    if pool is None:
+        make_thumbnail(sha256)
+        return
+    with _pool_lock:
+        if sha256 in _pending:
+            return
+        _pending.add(sha256)
+    pool.submit(make_thumbnail_in_thread, sha256)
+
+
+def make_thumbnail_in_thread(sha256):
+    try:
+        make_thumbnail(sha256)
+    finally:
+        _pending.discard(sha256)
+        # Database connections are per thread
+        connections.close_all()
+
+
+def make_thumbnail(sha256):
+    size = settings.ATTACHMENT_THUMBNAIL_SIZE
+    target = thumbnail_path(sha256)
+    try:
+        with Image.open(blob_path(sha256)) as image:
+            # JPEGs are decoded at the smallest scale that is still large enough
+            image.draft('RGB', (size, size))
+            thumbnail = ImageOps.exif_transpose(image)
+            thumbnail.thumbnail((size, size))
+            if thumbnail.mode not in ('RGB', 'RGBA'):
+                thumbnail = thumbnail.convert('RGBA')
+            target.parent.mkdir(parents=True, exist_ok=True)
+            temporary = target.with_suffix('.tmp')
+            thumbnail.save(temporary, 'webp', quality=80)
+            os.replace(temporary, target)
+        made = True
+    except (OSError, ValueError, SyntaxError, Image.DecompressionBombError):
+        # Not an image Pillow reads, or a damaged one
+        made = False
+    Blob.objects.filter(pk=sha256).update(has_thumbnail=made)
+    return made
+
+
+def parse_range(value, size):
+    """
+    ``(start, end)`` of a single ``Range: bytes=`` header, None to send the
+    whole file (no header, or several ranges), or ValueError when the range
+    is past the end.
+    """
+    match = RANGE.match(value or '')
+    if not match or not any(match.groups()):
+        return None
+    first, last = match.groups()
+    if not first:
+        # The last N bytes
+        start, end = max(0, size - int(last)), size - 1
+    else:
+        start, end = int(first), min(int(last), size - 1) if last else size - 1
+    if start >= size or start > end:
+        raise ValueError(value)
+    return start, end
+
+
+class RangeFile:
+    """``length`` bytes of an open file, from where it is positioned."""
+
+    def __init__(self, file, length):
+        self.file = file
+        self.remaining = length
+
+    def read(self, size=-1):
+        if size < 0 or size > self.remaining:
+            size = self.remaining
+        data = self.file.read(size)
+        self.remaining -= len(data)
+        return data
+
+    def close(self):
+        self.file.close()
+
+
+def file_response(request, path, size, etag, filename, content_type, as_attachment=True):
+    """
+    The file at ``path`` with ``Range``, ``If-Range`` and ``If-None-Match``
+    support. Attachments are immutable, so the ETag never changes.
+    """
+    etag = quote_etag(etag)
+    if etag_matches(request.headers.get('If-None-Match'), etag):
+        response = HttpResponseNotModified()
+    elif settings.ATTACHMENT_ACCEL_REDIRECT:
+        # nginx answers ranges and conditional requests itself
+        response = HttpResponse(content_type=content_type)
+        response['X-Accel-Redirect'] = (settings.ATTACHMENT_ACCEL_REDIRECT.rstrip('/') + '/'
+                                        + path.relative_to(root()).as_posix())
+        response['Content-Disposition'] = content_disposition_header(as_attachment, filename)
+    else:
+        byte_range = None
+        if request.headers.get('If-Range', etag) == etag:
+            try:
+                byte_range = parse_range(request.headers.get('Range'), size)
+            except ValueError:
+                response = HttpResponse(status=416)
+                response['Content-Range'] = f'bytes */{size}'
+                return response
+        try:
+            file = open(path, 'rb')
+        except FileNotFoundError:
+            # Purged, or the volume holding it is gone
+            raise Http404
+        if byte_range is None:
+            response = FileResponse(file, as_attachment=as_attachment, filename=filename,
+                                    content_type=content_type)
+        else:
+            start, end = byte_range
+            file.seek(start)
+            response = FileResponse(RangeFile(file, end + 1 - start), status=206,
+                                    as_attachment=as_attachment, filename=filename,
+                                    content_type=content_type)
+            response['Content-Range'] = f'bytes {start}-{end}/{size}'
+            response['Content-Length'] = str(end + 1 - start)
+        response['Accept-Ranges'] = 'bytes'
+    response['ETag'] = etag
+    response['Cache-Control'] = 'private, max-age=31536000, immutable'
+    return response
@@ -0,0 +1,133 @@
+"""
+Streaming export of orders as CSV or NDJSON.
+
+Rows come from ``.values()`` through ``.iterator()``, so neither model
+instances nor the whole result are ever held in memory: the export costs the
+same memory for ten rows as for millions. Rows are written into buffers of
+roughly ``BUFFER_SIZE`` bytes, which are then (optionally gzipped and) sent.
+"""
+import csv
+import json
+from datetime import date, datetime
+from decimal import Decimal
+
+from django.http import StreamingHttpResponse
+from django.utils import timezone
+from django.utils.text import compress_sequence
+from rest_framework import renderers
+
+BUFFER_SIZE = 64 * 1024
+
+# Column name -> lookup for values()
+EXPORT_FIELDS = {
+    'id': 'id',
+    'user_id': 'user_id',
+    'user_email': 'user__email',
+    'tariff_id': 'tariff_id',
+    'tariff_name': 'tariff__name',
+    'status': 'status',
+    'project_name': 'project_name',
+    'project_description': 'project_description',
+    'requirements': 'requirements',
+    'reference_links': 'reference_links',
+    'attachments': 'attachments',
+    'comments': 'comments',
+    'deadline': 'deadline',
+    'total_price': 'total_price',
+    'created_at': 'created_at',
+    'updated_at': 'updated_at',
+}
+
+
+class ExportRenderer(renderers.BaseRenderer):
+    # Exports stream past the renderer; it only renders error responses,
+    # which are JSON whichever format was asked for.
+    charset = 'utf-8'
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        response = (renderer_context or {}).get('response')
+        if response is not None and response.exception:
+            response['Content-Type'] = renderers.JSONRenderer.media_type
+            return renderers.JSONRenderer().render(data, accepted_media_type, renderer_context)
+        return json.dumps(data, ensure_ascii=False).encode()
+
+
+class CSVRenderer(ExportRenderer):
+    media_type = 'text/csv'
+    format = 'csv'
+
+
+class NDJSONRenderer(ExportRenderer):
+    media_type = 'application/x-ndjson'
+    format = 'ndjson'
+
+
+def export_value(value):
+    # The same representation the API uses for these types.
+    if isinstance(value, datetime):
+        value = timezone.localtime(value).isoformat()
+        return value[:-6] + 'Z' if value.endswith('+00:00') else value
+    if isinstance(value, (date, Decimal)):
+        return str(value)
+    return value
+
+
+class Buffer:
+    def __init__(self):
+        self.parts = []
+        self.size = 0
+
+    def write(self, text):
+        self.parts.append(text)
+        self.size += len(text)
+
+    def flush(self):
+        data = ''.join(self.parts).encode()
+        self.parts = []
+        self.size = 0
+        return data
+
+
+def csv_rows(rows):
+    buffer = Buffer()
+    writer = csv.writer(buffer)
+    writer.writerow(EXPORT_FIELDS)
+    for row in rows:
+        writer.writerow([
+            json.dumps(value, ensure_ascii=False) if isinstance(value, (list, dict))
+            else export_value(value)
+            for value in row
+        ])
+        if buffer.size >= BUFFER_SIZE:
+            yield buffer.flush()
+    yield buffer.flush()
+
+
+def ndjson_rows(rows):
+    buffer = Buffer()
+    for row in rows:
+        record = {name: export_value(value) for name, value in zip(EXPORT_FIELDS, row)}
+        buffer.write(json.dumps(record, ensure_ascii=False))
+        buffer.write('\n')
+        if buffer.size >= BUFFER_SIZE:
+            yield buffer.flush()
+    yield buffer.flush()
+
+
+WRITERS = {'csv': csv_rows, 'ndjson': ndjson_rows}
+
+
+def export_response(queryset, export_format, chunk_size, gzip=False):
+    rows = queryset.values_list(*EXPORT_FIELDS.values()).iterator(chunk_size=chunk_size)
+    content = WRITERS[export_format](rows)
+    if gzip:
+        content = compress_sequence(content)
+    renderer = {'csv': CSVRenderer, 'ndjson': NDJSONRenderer}[export_format]
+    response = StreamingHttpResponse(
+        content, content_type=f'{renderer.media_type}; charset={renderer.charset}'
+    )
+    if gzip:
+        response['Content-Encoding'] = 'gzip'
+    filename = f'orders-{timezone.now():%Y%m%d-%H%M%S}.{export_format}'
+    response['Content-Disposition'] = f'attachment; filename="{filename}"'
+    return response
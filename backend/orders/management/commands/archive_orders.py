@@ -0,0 +1,30 @@
+import time
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+from orders.archive import archive
+from orders.models import ArchivedOrder, Order
+
+
+class Command(BaseCommand):
+    help = 'Move finished and deleted orders to the archive table, in batches'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--older-than', type=int, default=None, metavar='DAYS',
+                            help='Days since the last change (default: ORDER_ARCHIVE_AFTER_DAYS)')
+        parser.add_argument('--batch-size', type=int, default=None,
+                            help='Orders per transaction (default: ORDER_ARCHIVE_BATCH_SIZE)')
+
+    def handle(self, *args, **options):
+        older_than = options['older_than']
+        started = time.perf_counter()
+        moved = archive(
+            older_than=None if older_than is None else timedelta(days=older_than),
+            batch_size=options['batch_size'],
+            progress=lambda moved: self.stdout.write(f'{moved} orders archived...'),
+        )
+        self.stdout.write(self.style.SUCCESS(
+            f'Archived {moved} orders in {time.perf_counter() - started:.1f}s: '
+            f'{Order.objects.all_with_deleted().count()} in the orders table, '
+            f'{ArchivedOrder.objects.count()} in the archive.'
+        ))
@@ -0,0 +1,26 @@
+import time
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+from orders import attachments
+
+
+class Command(BaseCommand):
+    help = 'Delete abandoned attachment uploads and files no attachment uses'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--older-than', type=int, default=None, metavar='HOURS',
+                            help='Hours since the last change (default: ATTACHMENT_UPLOAD_EXPIRY_HOURS)')
+
+    def handle(self, *args, **options):
+        hours = options['older_than']
+        if hours is None:
+            hours = settings.ATTACHMENT_UPLOAD_EXPIRY_HOURS
+        started = time.perf_counter()
+        uploads, blobs = attachments.purge(timezone.now() - timedelta(hours=hours))
+        self.stdout.write(self.style.SUCCESS(
+            f'Purged {uploads} uploads and {blobs} unused files '
+            f'in {time.perf_counter() - started:.1f}s.'
+        ))
@@ -0,0 +1,12 @@
+from django.core.management.base import BaseCommand
+from config import search
+
+
+class Command(BaseCommand):
+    help = 'Rebuild the full-text search indexes for orders and tariffs'
+
+    def handle(self, *args, **options):
+        for index in search.registered_indexes():
+            self.stdout.write(f'Rebuilding {index.model._meta.label}...')
+            index.rebuild()
+        self.stdout.write(self.style.SUCCESS('Search indexes rebuilt.'))
@@ -0,0 +1,18 @@
+from django.db import migrations
+
+from config.search import create_index
+
+create_search_index, drop_search_index = create_index(
+    'orders', 'Order', ['project_name', 'project_description']
+)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('orders', '0002_order_indexes'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_search_index, drop_search_index),
+    ]
@@ -0,0 +1,51 @@
+# Generated by Django 5.2.18 on 2026-10-18 19:24
+
+import django.db.models.deletion
+from django.db import migrations, models
+from django.db.models import Count, Sum
+from django.db.models.functions import TruncDate
+
+
+def populate_stats(apps, schema_editor):
+    # Same as orders.analytics.rebuild(), on the historical models.
+    Order = apps.get_model('orders', 'Order')
+    OrderDailyStats = apps.get_model('orders', 'OrderDailyStats')
+    rows = (Order.objects.using(schema_editor.connection.alias)
+            .filter(is_deleted=False)
+            .values('tariff', 'status', day=TruncDate('created_at'))
+            .annotate(count=Count('id'), revenue=Sum('total_price'))
+            .order_by())
+    OrderDailyStats.objects.using(schema_editor.connection.alias).bulk_create(
+        (OrderDailyStats(day=row['day'], tariff_id=row['tariff'], status=row['status'],
+                         order_count=row['count'], revenue=row['revenue'])
+         for row in rows.iterator()),
+        batch_size=1000,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('orders', '0003_order_search_index'),
+        ('tariffs', '0002_tariff_search_index'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='OrderDailyStats',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('day', models.DateField()),
+                ('status', models.CharField(choices=[('NEW', 'New'), ('IN_PROGRESS', 'In Progress'), ('COMPLETED', 'Completed'), ('CANCELLED', 'Cancelled')], max_length=20)),
+                ('order_count', models.IntegerField(default=0)),
+                ('revenue', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+                ('tariff', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='tariffs.tariff')),
+            ],
+            options={
+                'verbose_name': 'Order daily stats',
+                'verbose_name_plural': 'Order daily stats',
+                'constraints': [models.UniqueConstraint(fields=('day', 'tariff', 'status'), name='order_stats_bucket_uniq')],
+            },
+        ),
+        migrations.RunPython(populate_stats, migrations.RunPython.noop),
+    ]
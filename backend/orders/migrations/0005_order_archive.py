@@ -0,0 +1,79 @@
+# Generated by Django 5.2.18 on 2026-10-18 20:40
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+# Both tables' columns, in the same order. Migrations that change the
+# columns of orders_order must change orders_archivedorder and recreate
+# the view.
+COLUMNS = ('id, user_id, tariff_id, status, project_name, project_description, '
+           'reference_links, requirements, deadline, attachments, comments, total_price, '
+           'is_deleted, created_at, updated_at')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('orders', '0004_order_daily_stats'),
+        ('tariffs', '0002_tariff_search_index'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CombinedOrder',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('status', models.CharField(choices=[('NEW', 'New'), ('IN_PROGRESS', 'In Progress'), ('COMPLETED', 'Completed'), ('CANCELLED', 'Cancelled')], default='NEW', max_length=20)),
+                ('project_name', models.CharField(max_length=200)),
+                ('project_description', models.TextField()),
+                ('reference_links', models.JSONField(default=list)),
+                ('requirements', models.TextField()),
+                ('deadline', models.DateField(blank=True, null=True)),
+                ('attachments', models.JSONField(default=list)),
+                ('comments', models.TextField(blank=True)),
+                ('total_price', models.DecimalField(decimal_places=2, max_digits=10)),
+                ('is_deleted', models.BooleanField(default=False)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'db_table': 'orders_order_combined',
+                'ordering': ['-created_at'],
+                'managed': False,
+            },
+        ),
+        migrations.CreateModel(
+            name='ArchivedOrder',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('status', models.CharField(choices=[('NEW', 'New'), ('IN_PROGRESS', 'In Progress'), ('COMPLETED', 'Completed'), ('CANCELLED', 'Cancelled')], default='NEW', max_length=20)),
+                ('project_name', models.CharField(max_length=200)),
+                ('project_description', models.TextField()),
+                ('reference_links', models.JSONField(default=list)),
+                ('requirements', models.TextField()),
+                ('deadline', models.DateField(blank=True, null=True)),
+                ('attachments', models.JSONField(default=list)),
+                ('comments', models.TextField(blank=True)),
+                ('total_price', models.DecimalField(decimal_places=2, max_digits=10)),
+                ('is_deleted', models.BooleanField(default=False)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('tariff', models.ForeignKey(on_delete=django.db.models.deletion.PROTECT, related_name='archived_orders', to='tariffs.tariff')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='archived_orders', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'verbose_name': 'Archived order',
+                'verbose_name_plural': 'Archived orders',
+                'ordering': ['-created_at'],
+                'indexes': [models.Index(fields=['user', '-created_at'], name='archived_order_user_idx'), models.Index(fields=['-created_at'], name='archived_order_created_idx')],
+            },
+        ),
+        migrations.RunSQL(
+            f'CREATE VIEW orders_order_combined AS '
+            f'SELECT {COLUMNS} FROM orders_order '
+            f'UNION ALL SELECT {COLUMNS} FROM orders_archivedorder',
+            'DROP VIEW orders_order_combined',
+        ),
+    ]
@@ -1,8 +1,21 @@
+import uuid
+
 from django.db import models
 from django.conf import settings
+from config.softdelete import SoftDeleteManager, SoftDeleteQuerySet
+
+
+class OrderQuerySet(SoftDeleteQuerySet):
+    def set_deleted(self, is_deleted):
+        # The analytics stats count only orders that are not deleted
+        from . import analytics
 
+        return analytics.set_deleted(self, is_deleted, **self.touched_fields())
+
+
+class OrderBase(models.Model):
+    """The columns shared by ``Order``, ``ArchivedOrder`` and ``CombinedOrder``."""
 
-class Order(models.Model):
     class Status(models.TextChoices):
         NEW = 'NEW', 'New'
         IN_PROGRESS = 'IN_PROGRESS', 'In Progress'
@@ -37,17 +50,209 @@ class Order(models.Model):
     updated_at = models.DateTimeField(auto_now=True)
 
     class Meta:
-        verbose_name = 'Order'
-        verbose_name_plural = 'Orders'
-        ordering = ['-created_at']
+        abstract = True
 
     def __str__(self):
         return f"Order #{self.id} - {self.project_name} ({self.status})"
 
+
+class Order(OrderBase):
+    objects = SoftDeleteManager.from_queryset(OrderQuerySet)()
+
+    class Meta:
+        verbose_name = 'Order'
+        verbose_name_plural = 'Orders'
+        ordering = ['-created_at']
+        # Every API listing excludes soft-deleted rows, so the hot indexes are
+        # partial on backends that support it (SQLite, PostgreSQL).
+        indexes = [
+            models.Index(
+                fields=['user', '-created_at'],
+                condition=models.Q(is_deleted=False),
+                name='order_user_created_idx',
+            ),
+            models.Index(
+                fields=['-created_at'],
+                condition=models.Q(is_deleted=False),
+                name='order_created_idx',
+            ),
+            models.Index(
+                fields=['status', '-created_at'],
+                condition=models.Q(is_deleted=False),
+                name='order_status_created_idx',
+            ),
+            models.Index(
+                fields=['deadline'],
+                condition=models.Q(is_deleted=False),
+                name='order_deadline_idx',
+            ),
+            models.Index(
+                fields=['total_price'],
+                condition=models.Q(is_deleted=False),
+                name='order_total_price_idx',
+            ),
+        ]
+
     def soft_delete(self):
         self.is_deleted = True
-        self.save()
+        self.save(update_fields=['is_deleted', 'updated_at'])
 
     def restore(self):
         self.is_deleted = False
-        self.save() 
\ No newline at end of file
+        self.save(update_fields=['is_deleted', 'updated_at'])
+
+
+class ArchivedOrder(OrderBase):
+    """
+    A finished or deleted order moved out of ``orders_order`` by
+    ``orders.archive``, with the same id and columns. Read-only.
+    """
+
+    user = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.CASCADE,
+        related_name='archived_orders'
+    )
+    tariff = models.ForeignKey(
+        'tariffs.Tariff',
+        on_delete=models.PROTECT,
+        related_name='archived_orders'
+    )
+
+    class Meta:
+        verbose_name = 'Archived order'
+        verbose_name_plural = 'Archived orders'
+        ordering = ['-created_at']
+        indexes = [
+            models.Index(fields=['user', '-created_at'], name='archived_order_user_idx'),
+            models.Index(fields=['-created_at'], name='archived_order_created_idx'),
+        ]
+
+
+class CombinedOrder(OrderBase):
+    """
+    Orders and archived orders together: the ``orders_order_combined`` view
+    (``UNION ALL`` of both tables), for reads that include the archive.
+    Soft-deleted orders are left out unless read through
+    ``all_with_deleted()``.
+    """
+
+    user = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.DO_NOTHING,
+        related_name='+',
+        db_constraint=False
+    )
+    tariff = models.ForeignKey(
+        'tariffs.Tariff',
+        on_delete=models.DO_NOTHING,
+        related_name='+',
+        db_constraint=False
+    )
+
+    objects = SoftDeleteManager()
+
+    class Meta:
+        managed = False
+        db_table = 'orders_order_combined'
+        ordering = ['-created_at']
+
+
+class OrderDailyStats(models.Model):
+    """
+    Number and value of the orders created on a day, per tariff and status,
+    not counting soft-deleted ones. Kept up to date by ``orders.analytics``.
+    """
+
+    day = models.DateField()
+    tariff = models.ForeignKey(
+        'tariffs.Tariff',
+        on_delete=models.CASCADE,
+        related_name='+'
+    )
+    status = models.CharField(max_length=20, choices=Order.Status.choices)
+    order_count = models.IntegerField(default=0)
+    revenue = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+
+    class Meta:
+        verbose_name = 'Order daily stats'
+        verbose_name_plural = 'Order daily stats'
+        constraints = [
+            models.UniqueConstraint(
+                fields=['day', 'tariff', 'status'],
+                name='order_stats_bucket_uniq',
+            ),
+        ]
+
+    def __str__(self):
+        return f"{self.day} {self.tariff_id} {self.status}: {self.order_count}"
+
+
+class Blob(models.Model):
+    """
+    An attachment file, stored once under the SHA-256 of its content however
+    many attachments share it (see ``orders.attachments``).
+    """
+
+    sha256 = models.CharField(max_length=64, primary_key=True)
+    size = models.BigIntegerField()
+    # None until a thumbnail has been tried, False when the file has none
+    has_thumbnail = models.BooleanField(null=True, default=None)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    def __str__(self):
+        return self.sha256
+
+
+class Attachment(models.Model):
+    # No database constraint: archived orders (orders.archive) keep their
+    # ids and their attachments
+    order = models.ForeignKey(
+        Order,
+        on_delete=models.CASCADE,
+        related_name='files',
+        db_constraint=False
+    )
+    blob = models.ForeignKey(
+        Blob,
+        on_delete=models.PROTECT,
+        related_name='attachments'
+    )
+    filename = models.CharField(max_length=255)
+    content_type = models.CharField(max_length=100)
+    uploaded_by = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.SET_NULL,
+        null=True,
+        related_name='+'
+    )
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        ordering = ['created_at']
+
+    def __str__(self):
+        return self.filename
+
+
+class Upload(models.Model):
+    """An attachment being uploaded in chunks; ``received`` bytes are on disk."""
+
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    order = models.ForeignKey(
+        Order,
+        on_delete=models.CASCADE,
+        related_name='uploads',
+        db_constraint=False
+    )
+    user = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.CASCADE,
+        related_name='+'
+    )
+    filename = models.CharField(max_length=255)
+    content_type = models.CharField(max_length=100)
+    size = models.BigIntegerField()
+    received = models.BigIntegerField(default=0)
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
@@ -0,0 +1,209 @@
+import json
+from base64 import urlsafe_b64decode, urlsafe_b64encode
+
+from django.core.exceptions import ValidationError
+from django.db.models import F, Q
+from rest_framework.exceptions import NotFound
+from rest_framework.response import Response
+from rest_framework.utils.urls import remove_query_param, replace_query_param
+
+from config.pagination import AsyncPageNumberPagination
+
+
+class OrderPagination(AsyncPageNumberPagination):
+    """
+    Page-number pagination with an opt-in keyset (cursor) mode.
+
+    Existing clients keep using ``?page=N``. Sending ``?pagination=cursor``
+    (or following a ``next``/``previous`` link carrying ``?cursor=``) switches
+    to keyset pagination on ``(<ordering field>, id)``: no ``COUNT(*)`` and no
+    ``OFFSET``, so every page costs the same regardless of depth.
+    """
+
+    cursor_query_param = 'cursor'
+    mode_query_param = 'pagination'
+    keyset_fields = ('created_at', 'deadline', 'total_price')
+    default_keyset_field = '-created_at'
+    invalid_cursor_message = 'Invalid cursor'
+
+    def use_keyset(self, request):
+        params = request.query_params
+        return (self.cursor_query_param in params
+                or params.get(self.mode_query_param) == 'cursor')
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.keyset = self.use_keyset(request)
+        if not self.keyset:
+            return super().paginate_queryset(queryset, request, view)
+        queryset = self.keyset_queryset(queryset, request)
+        if queryset is None:
+            return None
+        return self.keyset_page(list(queryset[:self.page_size + 1]))
+
+    async def apaginate_queryset(self, queryset, request, view=None):
+        self.keyset = self.use_keyset(request)
+        if not self.keyset:
+            return await super().apaginate_queryset(queryset, request, view)
+        queryset = self.keyset_queryset(queryset, request)
+        if queryset is None:
+            return None
+        return self.keyset_page([obj async for obj in queryset[:self.page_size + 1]])
+
+    def keyset_queryset(self, queryset, request):
+        self.request = request
+        self.page_size = self.get_page_size(request)
+        if not self.page_size:
+            return None
+
+        self.ordering = self.get_keyset_ordering(queryset)
+        self.cursor = cursor = self.decode_cursor(request)
+        reverse = cursor is not None and cursor['reverse']
+        field_name = self.ordering.lstrip('-')
+        field = queryset.model._meta.get_field(field_name)
+        # Walking backwards flips the direction of both the field and the
+        # id tie-breaker; NULLs always sit at the end of the forward order.
+        descending = self.ordering.startswith('-') != reverse
+        nulls_last = not reverse if field.null else None
+
+        queryset = queryset.order_by(
+            self.order_expression(field_name, descending, nulls_last),
+            '-id' if descending else 'id',
+        )
+        if cursor is not None:
+            try:
+                value = None if cursor['value'] is None else field.to_python(cursor['value'])
+            except (ValidationError, TypeError, ValueError):
+                raise NotFound(self.invalid_cursor_message)
+            queryset = queryset.filter(
+                self.after_position(field, descending, nulls_last, value, cursor['id'])
+            )
+        return queryset
+
+    def keyset_page(self, results):
+        # ``results`` holds up to one row more than a page, telling whether
+        # there is another page in the direction of travel.
+        has_more = len(results) > self.page_size
+        results = results[:self.page_size]
+        if self.cursor is not None and self.cursor['reverse']:
+            results.reverse()
+            self.has_next, self.has_previous = True, has_more
+        else:
+            self.has_next, self.has_previous = has_more, self.cursor is not None
+        self.page_results = results
+        return results
+
+    def get_keyset_ordering(self, queryset):
+        ordering = list(queryset.query.order_by) or list(queryset.model._meta.ordering)
+        for field in ordering:
+            if isinstance(field, str) and field.lstrip('-') in self.keyset_fields:
+                return field
+        return self.default_keyset_field
+
+    def order_expression(self, field_name, descending, nulls_last):
+        expression = F(field_name)
+        if nulls_last is None:
+            return expression.desc() if descending else expression.asc()
+        nulls = {'nulls_last': True} if nulls_last else {'nulls_first': True}
+        return expression.desc(**nulls) if descending else expression.asc(**nulls)
+
+    def after_position(self, field, descending, nulls_last, value, pk):
+        lookup = 'lt' if descending else 'gt'
+        name = field.name
+        tie = Q(**{f'id__{lookup}': pk})
+        if value is None:
+            condition = Q(**{f'{name}__isnull': True}) & tie
+            if nulls_last is False:
+                # NULLs come first in this direction, every non-NULL row follows.
+                condition |= Q(**{f'{name}__isnull': False})
+            return condition
+        condition = Q(**{f'{name}__{lookup}': value}) | (Q(**{name: value}) & tie)
+        if nulls_last:
+            condition |= Q(**{f'{name}__isnull': True})
+        return condition
+
+    def decode_cursor(self, request):
+        encoded = request.query_params.get(self.cursor_query_param)
+        if not encoded:
+            return None
+        try:
+            padded = encoded + '=' * (-len(encoded) % 4)
+            data = json.loads(urlsafe_b64decode(padded.encode('ascii')))
+            cursor = {
+                'ordering': str(data['o']),
+                'value': data['v'],
+                'id': int(data['id']),
+                'reverse': bool(data.get('r')),
+            }
+        except (TypeError, ValueError, KeyError):
+            raise NotFound(self.invalid_cursor_message)
+        if cursor['ordering'] != self.ordering:
+            # The ordering changed since the link was issued; the position is
+            # meaningless for the new sort key.
+            raise NotFound(self.invalid_cursor_message)
+        return cursor
+
+    def encode_cursor(self, instance, reverse):
+        name = self.ordering.lstrip('-')
+        if isinstance(instance, dict):
+            # A .values() row, see config.fastserializers
+            value, pk = instance[name], instance['id']
+        else:
+            value, pk = getattr(instance, name), instance.pk
+        data = {'o': self.ordering, 'v': None if value is None else str(value), 'id': pk}
+        if reverse:
+            data['r'] = 1
+        encoded = urlsafe_b64encode(json.dumps(data, separators=(',', ':')).encode())
+        return encoded.decode('ascii').rstrip('=')
+
+    def get_keyset_link(self, instance, reverse):
+        url = remove_query_param(self.request.build_absolute_uri(), self.page_query_param)
+        return replace_query_param(url, self.cursor_query_param,
+                                   self.encode_cursor(instance, reverse))
+
+    def get_next_link(self):
+        if not self.keyset:
+            return super().get_next_link()
+        if not self.has_next or not self.page_results:
+            return None
+        return self.get_keyset_link(self.page_results[-1], reverse=False)
+
+    def get_previous_link(self):
+        if not self.keyset:
+            return super().get_previous_link()
+        if not self.has_previous or not self.page_results:
+            return None
+        return self.get_keyset_link(self.page_results[0], reverse=True)
+
+    def get_paginated_response(self, data):
+        if not self.keyset:
+            return super().get_paginated_response(data)
+        return Response({
+            'next': self.get_next_link(),
+            'previous': self.get_previous_link(),
+            'results': data,
+        })
+
+    def get_paginated_response_schema(self, schema):
+        response_schema = super().get_paginated_response_schema(schema)
+        response_schema['required'] = ['results']
+        return response_schema
+
+    def get_schema_operation_parameters(self, view):
+        parameters = super().get_schema_operation_parameters(view)
+        parameters += [
+            {
+                'name': self.mode_query_param,
+                'required': False,
+                'in': 'query',
+                'description': 'Set to "cursor" to use keyset pagination.',
+                'schema': {'type': 'string', 'enum': ['cursor']},
+            },
+            {
+                'name': self.cursor_query_param,
+                'required': False,
+                'in': 'query',
+                'description': 'The pagination cursor value.',
+                'schema': {'type': 'string'},
+            },
+        ]
+        return parameters
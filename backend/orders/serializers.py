@@ -1,9 +1,18 @@
+import mimetypes
+
+from django.conf import settings
+from django.db import transaction
 from rest_framework import serializers
-from .models import Order
+from rest_framework.reverse import reverse
+from config import search
+from config.sparsefields import SparseFieldsSerializer
+from . import analytics
+from .models import Attachment, Order, Upload
+from tariffs.models import Tariff
 from tariffs.serializers import TariffSerializer
 
 
-class OrderSerializer(serializers.ModelSerializer):
+class OrderSerializer(SparseFieldsSerializer, serializers.ModelSerializer):
     tariff_details = TariffSerializer(source='tariff', read_only=True)
 
     class Meta:
@@ -20,6 +29,15 @@ class OrderSerializer(serializers.ModelSerializer):
         return super().create(validated_data)
 
 
+class OrderListSerializer(OrderSerializer):
+    # What an order list shows; the long texts, JSON lists and the nested
+    # tariff are left out (and not fetched) unless asked for.
+    class Meta(OrderSerializer.Meta):
+        fields = ('id', 'tariff', 'tariff_details', 'status', 'project_name',
+                  'deadline', 'total_price', 'created_at', 'updated_at')
+        expandable_fields = ('tariff_details',)
+
+
 class OrderUpdateSerializer(serializers.ModelSerializer):
     class Meta:
         model = Order
@@ -33,4 +51,128 @@ class OrderUpdateSerializer(serializers.ModelSerializer):
             raise serializers.ValidationError(
                 "Cannot update a cancelled order."
             )
-        return attrs 
\ No newline at end of file
+        return attrs 
+
+
+class PrefetchedTariffField(serializers.PrimaryKeyRelatedField):
+    # Resolves tariffs from the ``tariffs`` dict in the serializer context,
+    # filled with a single query for the whole batch.
+    def to_internal_value(self, data):
+        tariffs = self.context.get('tariffs')
+        if tariffs is None:
+            return super().to_internal_value(data)
+        if isinstance(data, bool):
+            self.fail('incorrect_type', data_type=type(data).__name__)
+        try:
+            return tariffs[int(data)]
+        except (TypeError, ValueError):
+            self.fail('incorrect_type', data_type=type(data).__name__)
+        except KeyError:
+            self.fail('does_not_exist', pk_value=data)
+
+
+class OrderBulkListSerializer(serializers.ListSerializer):
+    def create(self, validated_data):
+        user = self.context['request'].user
+        with transaction.atomic():
+            orders = Order.objects.bulk_create([
+                Order(user=user, total_price=item['tariff'].price, **item)
+                for item in validated_data
+            ])
+            # bulk_create() does not send post_save
+            search.update_many(Order, orders)
+            analytics.record_created(orders)
+        return orders
+
+
+class OrderBulkCreateSerializer(OrderSerializer):
+    tariff = PrefetchedTariffField(queryset=Tariff.objects.all())
+
+    class Meta(OrderSerializer.Meta):
+        list_serializer_class = OrderBulkListSerializer
+
+
+class OrderBulkStatusSerializer(serializers.Serializer):
+    status = serializers.ChoiceField(choices=Order.Status.choices)
+    ids = serializers.ListField(
+        child=serializers.IntegerField(min_value=1),
+        required=False,
+        allow_empty=False,
+        max_length=settings.ORDER_BULK_MAX_SIZE
+    )
+    filter = serializers.DictField(required=False, allow_empty=False)
+
+    def validate(self, attrs):
+        if ('ids' in attrs) == ('filter' in attrs):
+            raise serializers.ValidationError(
+                "Provide either a list of order ids or a filter."
+            )
+        return attrs
+
+
+class OrderStatsSerializer(serializers.Serializer):
+    period = serializers.DateField()
+    tariff = serializers.IntegerField(required=False)
+    tariff_name = serializers.CharField(source='tariff__name', required=False)
+    status = serializers.ChoiceField(choices=Order.Status.choices, required=False)
+    orders = serializers.IntegerField()
+    revenue = serializers.DecimalField(max_digits=14, decimal_places=2)
+
+
+class AttachmentSerializer(serializers.ModelSerializer):
+    size = serializers.IntegerField(source='blob.size', read_only=True)
+    sha256 = serializers.CharField(source='blob_id', read_only=True)
+    url = serializers.SerializerMethodField()
+    thumbnail_url = serializers.SerializerMethodField()
+
+    class Meta:
+        model = Attachment
+        fields = ('id', 'filename', 'content_type', 'size', 'sha256', 'url',
+                  'thumbnail_url', 'uploaded_by', 'created_at')
+
+    def get_url(self, obj):
+        return reverse('orders:order-attachment', args=[obj.order_id, obj.pk],
+                       request=self.context.get('request'))
+
+    def get_thumbnail_url(self, obj):
+        if not obj.blob.has_thumbnail:
+            return None
+        return reverse('orders:order-attachment-thumbnail', args=[obj.order_id, obj.pk],
+                       request=self.context.get('request'))
+
+
+class UploadSerializer(serializers.ModelSerializer):
+    content_type = serializers.CharField(max_length=100, required=False)
+    offset = serializers.IntegerField(source='received', read_only=True)
+    url = serializers.SerializerMethodField()
+
+    class Meta:
+        model = Upload
+        fields = ('id', 'filename', 'content_type', 'size', 'offset', 'url', 'created_at')
+        read_only_fields = ('id', 'created_at')
+
+    def get_url(self, obj):
+        return reverse('orders:order-upload', args=[obj.order_id, obj.pk],
+                       request=self.context.get('request'))
+
+    def validate_filename(self, value):
+        # A name for Content-Disposition, not a path
+        value = value.replace('\\', '/').rsplit('/', 1)[-1].strip()
+        if not value:
+            raise serializers.ValidationError("A file name is required.")
+        return value
+
+    def validate_size(self, value):
+        if value < 1:
+            raise serializers.ValidationError("Empty files cannot be attached.")
+        if value > settings.ATTACHMENT_MAX_SIZE:
+            raise serializers.ValidationError(
+                f"Attachments are limited to {settings.ATTACHMENT_MAX_SIZE} bytes."
+            )
+        return value
+
+    def validate(self, attrs):
+        if not attrs.get('content_type'):
+            attrs['content_type'] = (mimetypes.guess_type(attrs['filename'])[0]
+                                     or 'application/octet-stream')
+        return attrs
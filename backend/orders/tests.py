@@ -1,10 +1,41 @@
-from django.test import TestCase
+import asyncio
+import csv
+import gzip
+import hashlib
+import io
+import json
+import re
+import tempfile
+from base64 import urlsafe_b64encode
+from datetime import date, timedelta
+from decimal import Decimal
+from unittest import mock, skipUnless
+from urllib.parse import parse_qs, urlsplit
+from asgiref.sync import async_to_sync
+from django.conf import settings
+from django.core.management import call_command
+from django.db import connection
+from django.db.models import F
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
 from django.urls import reverse
-from rest_framework import status
-from rest_framework.test import APITestCase
+from rest_framework import serializers, status
+from rest_framework.renderers import JSONRenderer
+from rest_framework.test import APIRequestFactory, APITestCase
 from django.contrib.auth import get_user_model
+from PIL import Image
 from rest_framework_simplejwt.tokens import RefreshToken
-from .models import Order
+from config import compression, metrics, routers
+from config.fastserializers import UnsupportedField, ValuesSerializer
+from config.renderers import FastJSONRenderer
+from config.routers import ReplicaRouter, read_from_replica
+from config.testing import APIUsersMixin, QueryBudgetMixin, query_budget
+from users.tokens import UserRefreshToken
+from . import analytics, archive, attachments, views
+from .models import (ArchivedOrder, Attachment, Blob, CombinedOrder, Order, OrderDailyStats,
+                     Upload)
+from .serializers import OrderSerializer
 from tariffs.models import Tariff
 
 User = get_user_model()
@@ -145,4 +176,1510 @@ class OrderTests(APITestCase):
         response = self.client.put(url, update_data, format='json')
         self.assertEqual(response.status_code, status.HTTP_200_OK)
         order.refresh_from_db()
-        self.assertEqual(order.status, Order.Status.IN_PROGRESS) 
\ No newline at end of file
+        self.assertEqual(order.status, Order.Status.IN_PROGRESS) 
+
+
+class OrderQueryBudgetTests(APIUsersMixin, QueryBudgetMixin, APITestCase):
+    def setUp(self):
+        super().setUp()
+        self.tariffs = [
+            Tariff.objects.create(
+                name=f'Package {i}',
+                description='Web design package',
+                price='999.99',
+                features=['Responsive Design']
+            )
+            for i in range(3)
+        ]
+        self.authenticate(self.user)
+
+    def create_orders(self, count, user=None):
+        orders = []
+        for i in range(count):
+            tariff = self.tariffs[i % len(self.tariffs)]
+            orders.append(Order.objects.create(
+                user=user or self.user,
+                tariff=tariff,
+                project_name=f'Project {i}',
+                project_description='Description',
+                requirements='Requirements',
+                total_price=tariff.price
+            ))
+        return orders
+
+    def list_orders(self):
+        response = self.client.get(reverse('orders:order-list-create'))
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return response
+
+    def test_list_query_count_does_not_grow_with_rows(self):
+        self.create_orders(2)
+        self.assertQueryCountStable(self.list_orders, lambda: self.create_orders(8))
+
+    def test_list_query_budget(self):
+        self.create_orders(10)
+        # user lookup, COUNT(*), page SELECT joined with tariff
+        with self.assertMaxQueries(3):
+            response = self.list_orders()
+        self.assertEqual(len(response.data['results']), 10)
+
+    def test_staff_list_query_budget(self):
+        other = User.objects.create_user(username='other', password='otherpass123')
+        self.create_orders(5)
+        self.create_orders(5, user=other)
+        self.authenticate(self.admin)
+        with self.assertMaxQueries(3):
+            response = self.list_orders()
+        self.assertEqual(len(response.data['results']), 10)
+
+    def test_create_query_budget(self):
+        url = reverse('orders:order-list-create')
+        data = {
+            'tariff': self.tariffs[0].id,
+            'project_name': 'Test Project',
+            'project_description': 'A test project description',
+            'requirements': 'Test requirements',
+        }
+        # user lookup, tariff lookup, INSERT, search index upsert, stats upsert
+        with self.assertMaxQueries(5):
+            response = self.client.post(url, data, format='json')
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(response.data['tariff_details']['id'], self.tariffs[0].id)
+
+    def test_retrieve_query_budget(self):
+        order = self.create_orders(1)[0]
+        url = reverse('orders:order-detail', args=[order.id])
+        # user lookup, order SELECT joined with tariff
+        with self.assertMaxQueries(2):
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+    def test_update_query_budget(self):
+        order = self.create_orders(1)[0]
+        url = reverse('orders:order-update', args=[order.id])
+        # user lookup, order SELECT, stored state for the stats, UPDATE,
+        # search index upsert; the stats are untouched as the bucket stays
+        with self.assertMaxQueries(5):
+            response = self.client.patch(url, {'comments': 'Call me'}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+    def test_delete_query_budget(self):
+        order = self.create_orders(1)[0]
+        url = reverse('orders:order-delete', args=[order.id])
+        # user lookup, order SELECT, stored state for the stats, UPDATE,
+        # search index upsert, stats upsert
+        with self.assertMaxQueries(6):
+            response = self.client.delete(url)
+        self.assertEqual(response.status_code, status.HTTP_204_NO_CONTENT)
+
+    def test_budget_exceeded_fails(self):
+        with self.assertRaises(AssertionError):
+            with query_budget(0):
+                Order.objects.count()
+
+
+class OrderCursorPaginationTests(APIUsersMixin, QueryBudgetMixin, APITestCase):
+    def setUp(self):
+        super().setUp()
+        self.tariff = Tariff.objects.create(
+            name='Basic Package',
+            description='Basic web design package',
+            price='999.99',
+            features=['Responsive Design']
+        )
+        self.now = timezone.now()
+        for i in range(25):
+            order = Order.objects.create(
+                user=self.user,
+                tariff=self.tariff,
+                status=Order.Status.NEW if i % 2 else Order.Status.COMPLETED,
+                project_name=f'Project {i}',
+                project_description='Description',
+                requirements='Requirements',
+                # Leave some gaps and ties to exercise the id tie-breaker
+                deadline=None if i % 5 == 0 else date(2025, 1, 1) + timedelta(days=i % 7),
+                total_price=Decimal('100.00') * (i % 4 + 1)
+            )
+            # created_at is auto_now_add; pairs of orders share a timestamp
+            Order.objects.filter(pk=order.pk).update(
+                created_at=self.now - timedelta(hours=i // 2)
+            )
+        self.authenticate(self.user)
+        self.url = reverse('orders:order-list-create')
+
+    def walk(self, params, link='next'):
+        response = self.client.get(self.url, {'pagination': 'cursor', **params})
+        pages = []
+        while True:
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+            self.assertNotIn('count', response.data)
+            pages.append([order['id'] for order in response.data['results']])
+            if not response.data[link]:
+                return pages
+            response = self.client.get(response.data[link])
+
+    def expected_ids(self, ordering, **filters):
+        return list(
+            Order.objects.filter(is_deleted=False, **filters)
+            .order_by(ordering, '-id' if ordering.startswith('-') else 'id')
+            .values_list('id', flat=True)
+        )
+
+    def test_page_number_is_default(self):
+        response = self.client.get(self.url, {'page': 2})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['count'], 25)
+        self.assertEqual(len(response.data['results']), 10)
+
+    def test_walks_all_orders_by_created_at(self):
+        pages = self.walk({})
+        self.assertEqual([len(page) for page in pages], [10, 10, 5])
+        self.assertEqual(sum(pages, []), self.expected_ids('-created_at'))
+
+    def test_previous_link_returns_previous_page(self):
+        first = self.client.get(self.url, {'pagination': 'cursor'})
+        self.assertIsNone(first.data['previous'])
+        second = self.client.get(first.data['next'])
+        back = self.client.get(second.data['previous'])
+        self.assertEqual(back.data['results'], first.data['results'])
+        self.assertIsNotNone(back.data['next'])
+
+    def test_ordering_by_nullable_deadline(self):
+        expected = list(
+            Order.objects.order_by(F('deadline').asc(nulls_last=True), 'id')
+            .values_list('id', flat=True)
+        )
+        self.assertEqual(sum(self.walk({'ordering': 'deadline'}), []), expected)
+
+    def test_ordering_by_descending_deadline_backwards(self):
+        forward = self.walk({'ordering': '-deadline'})
+        self.assertEqual(len(sum(forward, [])), 25)
+        response = self.client.get(self.url, {'pagination': 'cursor', 'ordering': '-deadline'})
+        while response.data['next']:
+            response = self.client.get(response.data['next'])
+        backward = [[order['id'] for order in response.data['results']]]
+        while response.data['previous']:
+            response = self.client.get(response.data['previous'])
+            backward.insert(0, [order['id'] for order in response.data['results']])
+        self.assertEqual(sum(backward, []), sum(forward, []))
+
+    def test_ordering_by_total_price_with_ties(self):
+        pages = self.walk({'ordering': '-total_price'})
+        self.assertEqual(sum(pages, []), self.expected_ids('-total_price'))
+
+    def test_composes_with_filter_and_search(self):
+        for order in Order.objects.filter(pk__in=self.expected_ids('-created_at')[::3]):
+            order.project_name = 'Landing'
+            order.save()
+        pages = self.walk({'status': Order.Status.NEW, 'search': 'project'})
+        expected = self.expected_ids(
+            '-created_at', status=Order.Status.NEW, project_name__startswith='Project'
+        )
+        self.assertEqual(sum(pages, []), expected)
+
+    def test_cursor_for_other_ordering_is_rejected(self):
+        response = self.client.get(self.url, {'pagination': 'cursor'})
+        cursor = response.data['next'].split('cursor=')[1]
+        response = self.client.get(self.url, {'cursor': cursor, 'ordering': 'total_price'})
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+    def test_invalid_cursor(self):
+        response = self.client.get(self.url, {'cursor': 'garbage'})
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+    def test_forged_cursor_value(self):
+        for value in ('garbage', {'a': 1}, [1, 2]):
+            cursor = urlsafe_b64encode(json.dumps(
+                {'o': '-created_at', 'v': value, 'id': 1}).encode()).decode()
+            response = self.client.get(self.url, {'cursor': cursor})
+            self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND, value)
+
+    def test_deep_page_query_budget(self):
+        response = self.client.get(self.url, {'pagination': 'cursor'})
+        response = self.client.get(response.data['next'])
+        # user lookup and the keyset SELECT, no COUNT(*)
+        with self.assertMaxQueries(2):
+            response = self.client.get(response.data['next'])
+        self.assertEqual(len(response.data['results']), 5)
+
+
+class OrderSearchTests(APIUsersMixin, APITestCase):
+    def setUp(self):
+        super().setUp()
+        self.tariff = Tariff.objects.create(
+            name='Базовый',
+            description='Базовый пакет',
+            price='49999.00',
+            features=[]
+        )
+        self.shop = self.create_order(
+            'Интернет-магазин одежды',
+            'Интернет-магазин женской одежды с системой заказов'
+        )
+        self.landing = self.create_order(
+            'Лендинг IT-услуг',
+            'Одностраничный сайт для IT-компании'
+        )
+        self.restaurant = self.create_order(
+            'Сайт ресторана',
+            'Сайт для ресторана с меню и бронированием столиков, ёлка в зале'
+        )
+        self.authenticate(self.user)
+
+    def create_order(self, name, description):
+        return Order.objects.create(
+            user=self.user,
+            tariff=self.tariff,
+            project_name=name,
+            project_description=description,
+            requirements='Адаптивный дизайн',
+            total_price=self.tariff.price
+        )
+
+    def search(self, term, **params):
+        url = reverse('orders:order-list-create')
+        response = self.client.get(url, {'search': term, **params})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return [order['id'] for order in response.data['results']]
+
+    def test_search_is_case_insensitive(self):
+        self.assertEqual(self.search('ИНТЕРНЕТ'), [self.shop.id])
+
+    def test_search_matches_other_word_forms(self):
+        self.assertEqual(self.search('одежда'), [self.shop.id])
+        self.assertEqual(self.search('ресторан'), [self.restaurant.id])
+
+    def test_search_folds_yo(self):
+        self.assertEqual(self.search('елка'), [self.restaurant.id])
+
+    def test_search_requires_all_terms(self):
+        self.assertEqual(self.search('сайт ресторан'), [self.restaurant.id])
+
+    def test_results_are_ranked(self):
+        # "сайт" appears twice in the restaurant order and once in the landing
+        self.assertEqual(self.search('сайт'), [self.restaurant.id, self.landing.id])
+
+    def test_explicit_ordering_overrides_rank(self):
+        self.assertEqual(
+            self.search('сайт', ordering='created_at'),
+            [self.landing.id, self.restaurant.id]
+        )
+
+    def test_index_follows_updates_and_deletes(self):
+        self.landing.project_description = 'Промо-страница для конференции'
+        self.landing.save()
+        self.assertEqual(self.search('конференция'), [self.landing.id])
+        self.assertEqual(self.search('сайт'), [self.restaurant.id])
+        self.restaurant.delete()
+        self.assertEqual(self.search('сайт'), [])
+
+
+class OrderBulkTests(APIUsersMixin, QueryBudgetMixin, APITestCase):
+    def setUp(self):
+        super().setUp()
+        self.other = User.objects.create_user(
+            username='otheruser',
+            password='otherpass123',
+            email='other@example.com'
+        )
+        self.tariffs = [
+            Tariff.objects.create(name='Basic', description='Basic', price='999.99'),
+            Tariff.objects.create(name='Premium', description='Premium', price='1999.99'),
+        ]
+        self.authenticate(self.user)
+
+    def create_order(self, user, status=Order.Status.NEW):
+        return Order.objects.create(
+            user=user,
+            tariff=self.tariffs[0],
+            status=status,
+            project_name='Project',
+            project_description='Description',
+            requirements='Requirements',
+            total_price=self.tariffs[0].price
+        )
+
+    def order_data(self, i):
+        return {
+            'tariff': self.tariffs[i % 2].id,
+            'project_name': f'Лендинг {i}',
+            'project_description': 'Одностраничный сайт',
+            'requirements': 'Форма обратной связи',
+        }
+
+    def test_bulk_create(self):
+        url = reverse('orders:order-bulk-create')
+        data = [self.order_data(i) for i in range(50)]
+        # user lookup, tariffs, INSERT, search index, stats upsert, plus the
+        # savepoint pair
+        with self.assertMaxQueries(7):
+            response = self.client.post(url, data, format='json')
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(len(response.data), 50)
+        self.assertEqual(Order.objects.filter(user=self.user).count(), 50)
+        self.assertEqual(response.data[1]['total_price'], '1999.99')
+        self.assertEqual(response.data[1]['tariff_details']['name'], 'Premium')
+
+        response = self.client.get(reverse('orders:order-list-create'), {'search': 'лендинг'})
+        self.assertEqual(response.data['count'], 50)
+
+    def test_bulk_create_is_all_or_nothing(self):
+        url = reverse('orders:order-bulk-create')
+        data = [self.order_data(0), {**self.order_data(1), 'tariff': 9999}]
+        response = self.client.post(url, data, format='json')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn('tariff', response.data[1])
+        self.assertEqual(Order.objects.count(), 0)
+
+    def test_bulk_create_requires_list(self):
+        url = reverse('orders:order-bulk-create')
+        response = self.client.post(url, self.order_data(0), format='json')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        response = self.client.post(url, [], format='json')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    @override_settings(ORDER_BULK_MAX_SIZE=2)
+    def test_bulk_create_size_limit(self):
+        url = reverse('orders:order-bulk-create')
+        response = self.client.post(url, [self.order_data(i) for i in range(3)], format='json')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_status_by_ids(self):
+        orders = [self.create_order(self.user) for _ in range(3)]
+        self.authenticate(self.admin)
+        url = reverse('orders:order-bulk-status')
+        data = {'ids': [order.id for order in orders], 'status': Order.Status.IN_PROGRESS}
+        # user lookup, status check, stats buckets, UPDATE, stats upsert, plus
+        # the savepoint pair
+        with self.assertMaxQueries(7):
+            response = self.client.post(url, data, format='json')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['updated'], 3)
+        self.assertEqual(
+            Order.objects.filter(status=Order.Status.IN_PROGRESS).count(), 3
+        )
+
+    def test_status_by_ids_rejects_cancelled(self):
+        order = self.create_order(self.user)
+        cancelled = self.create_order(self.user, status=Order.Status.CANCELLED)
+        self.authenticate(self.admin)
+        url = reverse('orders:order-bulk-status')
+        data = {'ids': [order.id, cancelled.id], 'status': Order.Status.IN_PROGRESS}
+        response = self.client.post(url, data, format='json')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        order.refresh_from_db()
+        self.assertEqual(order.status, Order.Status.NEW)
+
+    def test_status_is_staff_only(self):
+        order = self.create_order(self.user)
+        url = reverse('orders:order-bulk-status')
+        for data in ({'ids': [order.id], 'status': Order.Status.COMPLETED},
+                     {'filter': {'status': Order.Status.NEW}, 'status': Order.Status.COMPLETED}):
+            response = self.client.post(url, data, format='json')
+            self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
+        order.refresh_from_db()
+        self.assertEqual(order.status, Order.Status.NEW)
+
+    def test_status_by_ids_not_found(self):
+        order = self.create_order(self.user)
+        self.authenticate(self.admin)
+        url = reverse('orders:order-bulk-status')
+        data = {'ids': [order.id, order.id + 100], 'status': Order.Status.COMPLETED}
+        response = self.client.post(url, data, format='json')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        order.refresh_from_db()
+        self.assertEqual(order.status, Order.Status.NEW)
+
+    def test_staff_status_by_filter(self):
+        for user in (self.user, self.other):
+            self.create_order(user)
+            self.create_order(user, status=Order.Status.COMPLETED)
+        self.create_order(self.user, status=Order.Status.CANCELLED)
+        self.authenticate(self.admin)
+        url = reverse('orders:order-bulk-status')
+        data = {'filter': {'status': Order.Status.NEW}, 'status': Order.Status.IN_PROGRESS}
+        with self.assertMaxQueries(6):
+            response = self.client.post(url, data, format='json')
+        self.assertEqual(response.data['updated'], 2)
+
+        data = {'filter': {'created_at_after': '2000-01-01'}, 'status': Order.Status.COMPLETED}
+        response = self.client.post(url, data, format='json')
+        self.assertEqual(response.data['updated'], 4)
+        self.assertEqual(Order.objects.filter(status=Order.Status.CANCELLED).count(), 1)
+
+    def test_status_filter_must_match_known_fields(self):
+        self.create_order(self.user)
+        self.authenticate(self.admin)
+        url = reverse('orders:order-bulk-status')
+        data = {'filter': {'stauts': Order.Status.NEW}, 'status': Order.Status.COMPLETED}
+        response = self.client.post(url, data, format='json')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertFalse(Order.objects.filter(status=Order.Status.COMPLETED).exists())
+
+    def test_status_requires_ids_or_filter(self):
+        self.authenticate(self.admin)
+        url = reverse('orders:order-bulk-status')
+        response = self.client.post(url, {'status': Order.Status.COMPLETED}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+
+class OrderExportTests(APIUsersMixin, APITestCase):
+    def setUp(self):
+        super().setUp()
+        self.tariff = Tariff.objects.create(name='Базовый', description='Базовый пакет',
+                                            price='49999.00')
+        self.orders = [
+            Order.objects.create(
+                user=self.user,
+                tariff=self.tariff,
+                status=order_status,
+                project_name=f'Проект {number}, "с кавычками"',
+                project_description='Сайт для ресторана' if number == 2 else 'Лендинг',
+                requirements='Адаптивный дизайн\nи мобильная версия',
+                reference_links=['https://example.com'],
+                deadline=date(2030, 1, number + 1),
+                total_price=self.tariff.price
+            )
+            for number, order_status in enumerate(
+                (Order.Status.NEW, Order.Status.COMPLETED, Order.Status.NEW))
+        ]
+        Order.objects.create(user=self.user, tariff=self.tariff, project_name='Удалён',
+                             project_description='', requirements='',
+                             total_price=self.tariff.price, is_deleted=True)
+        self.url = reverse('orders:order-export')
+        self.authenticate(self.admin)
+
+    def export(self, params=None, **extra):
+        response = self.client.get(self.url, params, **extra)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertTrue(response.streaming)
+        return response, b''.join(response.streaming_content)
+
+    def test_csv(self):
+        response, content = self.export()
+        self.assertEqual(response['Content-Type'], 'text/csv; charset=utf-8')
+        self.assertIn('attachment; filename="orders-', response['Content-Disposition'])
+        rows = list(csv.DictReader(io.StringIO(content.decode())))
+        self.assertEqual([int(row['id']) for row in rows],
+                         [order.id for order in reversed(self.orders)])
+        order = OrderSerializer(self.orders[0]).data
+        row = rows[-1]
+        for field in ('project_name', 'requirements', 'status', 'deadline', 'total_price',
+                      'created_at'):
+            self.assertEqual(row[field], order[field])
+        self.assertEqual(json.loads(row['reference_links']), ['https://example.com'])
+        self.assertEqual(row['user_email'], 'test@example.com')
+        self.assertEqual(row['tariff_name'], 'Базовый')
+
+    def test_ndjson_with_filters_search_and_ordering(self):
+        response, content = self.export({'format': 'ndjson', 'status': 'NEW',
+                                         'ordering': 'deadline'})
+        self.assertEqual(response['Content-Type'], 'application/x-ndjson; charset=utf-8')
+        records = [json.loads(line) for line in content.decode().splitlines()]
+        self.assertEqual([record['id'] for record in records],
+                         [self.orders[0].id, self.orders[2].id])
+        self.assertEqual(records[0]['reference_links'], ['https://example.com'])
+
+        _, content = self.export({'format': 'ndjson', 'search': 'ресторан'})
+        self.assertEqual([json.loads(line)['id'] for line in content.decode().splitlines()],
+                         [self.orders[2].id])
+
+    def test_gzip(self):
+        response, content = self.export(HTTP_ACCEPT_ENCODING='gzip, deflate')
+        self.assertEqual(response['Content-Encoding'], 'gzip')
+        self.assertIn('Accept-Encoding', response['Vary'])
+        self.assertEqual(gzip.decompress(content), self.export()[1])
+
+    def test_single_query(self):
+        response = self.client.get(self.url)
+        with self.assertNumQueries(1):
+            b''.join(response.streaming_content)
+
+    def test_staff_only(self):
+        self.authenticate(self.user)
+        for export_format in ('csv', 'ndjson'):
+            response = self.client.get(self.url, {'format': export_format})
+            self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
+            self.assertEqual(response['Content-Type'], 'application/json')
+            self.assertIn('detail', json.loads(response.content))
+
+
+class OrderSparseFieldsTests(APIUsersMixin, QueryBudgetMixin, APITestCase):
+    def setUp(self):
+        super().setUp()
+        self.tariff = Tariff.objects.create(name='Basic Package', description='Basic',
+                                            price='999.99')
+        self.orders = [
+            Order.objects.create(
+                user=self.user,
+                tariff=self.tariff,
+                project_name=f'Project {i}',
+                project_description='A long description',
+                requirements='Requirements',
+                total_price=self.tariff.price
+            )
+            for i in range(3)
+        ]
+        self.authenticate(self.user)
+        self.url = reverse('orders:order-list-create')
+
+    def list(self, params):
+        with query_budget(3) as context:
+            response = self.client.get(self.url, params)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        select = next(query['sql'] for query in context.captured_queries
+                      if 'FROM "orders_order"' in query['sql']
+                      and 'COUNT(' not in query['sql'])
+        return response.data['results'], select
+
+    def test_fields(self):
+        results, select = self.list({'fields': 'id,status'})
+        self.assertEqual([set(order) for order in results], [{'id', 'status'}] * 3)
+        self.assertNotIn('project_description', select)
+        self.assertNotIn('tariffs_tariff', select)
+
+    def test_compact(self):
+        results, select = self.list({'compact': 'true'})
+        self.assertNotIn('tariff_details', results[0])
+        self.assertNotIn('project_description', results[0])
+        self.assertEqual(results[0]['project_name'], 'Project 2')
+        self.assertNotIn('tariffs_tariff', select)
+
+        results, select = self.list({'compact': 'true', 'expand': 'tariff_details'})
+        self.assertEqual(results[0]['tariff_details']['name'], 'Basic Package')
+        self.assertIn('tariffs_tariff', select)
+
+    def test_compact_cursor_pagination(self):
+        results, select = self.list({'compact': 'true', 'pagination': 'cursor',
+                                     'fields': 'id'})
+        self.assertEqual([order['id'] for order in results],
+                         [order.id for order in reversed(self.orders)])
+        self.assertIn('"created_at"', select)
+
+    def test_default_representation_unchanged(self):
+        results, _ = self.list({})
+        self.assertEqual(results[0], OrderSerializer(self.orders[2]).data)
+
+    def test_detail(self):
+        url = reverse('orders:order-detail', args=[self.orders[0].id])
+        with query_budget(2):
+            response = self.client.get(url, {'fields': 'id,project_name'})
+        self.assertEqual(response.data, {'id': self.orders[0].id,
+                                         'project_name': 'Project 0'})
+
+    def test_unknown_field(self):
+        response = self.client.get(self.url, {'fields': 'id,password'})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn('fields', response.data)
+
+    def test_writes_ignore_fields(self):
+        response = self.client.post(f'{self.url}?fields=id', {
+            'tariff': self.tariff.id,
+            'project_name': 'New Project',
+            'project_description': 'Description',
+            'requirements': 'Requirements',
+        }, format='json')
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(response.data['project_name'], 'New Project')
+
+
+class OrderFastSerializationTests(APIUsersMixin, QueryBudgetMixin, APITestCase):
+    def setUp(self):
+        super().setUp()
+        self.tariff = Tariff.objects.create(name='Базовый', description='Базовый пакет',
+                                            price='49999.50', features=['SEO', 'CMS'])
+        for i in range(12):
+            Order.objects.create(
+                user=self.user,
+                tariff=self.tariff,
+                status=Order.Status.NEW if i % 2 else Order.Status.COMPLETED,
+                project_name=f'Проект {i} "\u2028"',
+                project_description='Описание\n\tс переносами',
+                requirements='Requirements',
+                reference_links=['https://example.com'] if i % 3 else [],
+                attachments=[{'file': i}] if i % 4 else [],
+                deadline=date(2030, 1, i + 1) if i % 5 else None,
+                total_price=Decimal('100.5') * (i + 1)
+            )
+        self.authenticate(self.user)
+        self.url = reverse('orders:order-list-create')
+
+    def assertSameContent(self, params):
+        with override_settings(FAST_LIST_SERIALIZATION=False):
+            expected = self.client.get(self.url, params)
+        with query_budget(3), mock.patch.object(
+                ValuesSerializer, 'represent', autospec=True,
+                side_effect=ValuesSerializer.represent) as represent:
+            response = self.client.get(self.url, params)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertTrue(represent.called)
+        self.assertEqual(response.content, expected.content)
+        return response
+
+    def test_same_output(self):
+        for params in ({}, {'page': 2}, {'ordering': 'deadline'},
+                       {'status': 'NEW', 'search': 'переносами'},
+                       {'compact': 'true', 'expand': 'tariff_details'},
+                       {'fields': 'id,deadline,total_price'}):
+            with self.subTest(params=params):
+                self.assertSameContent(params)
+
+    def test_cursor_pagination(self):
+        response = self.assertSameContent({'pagination': 'cursor', 'ordering': '-deadline',
+                                           'fields': 'id'})
+        next_page = response.json()['next']
+        with override_settings(FAST_LIST_SERIALIZATION=False):
+            expected = self.client.get(next_page)
+        self.assertEqual(self.client.get(next_page).content, expected.content)
+
+    def test_count_without_join(self):
+        with query_budget(3) as context:
+            self.client.get(self.url)
+        count = next(query['sql'] for query in context.captured_queries
+                     if 'COUNT(' in query['sql'])
+        self.assertNotIn('tariffs_tariff', count)
+
+    def test_unsupported_serializer(self):
+        class Serializer(OrderSerializer):
+            label = serializers.SerializerMethodField()
+
+            class Meta(OrderSerializer.Meta):
+                fields = ('id', 'label')
+
+            def get_label(self, order):
+                return order.project_name
+
+        with self.assertRaises(UnsupportedField):
+            ValuesSerializer(Serializer())
+
+    def test_renderer_falls_back(self):
+        renderer = FastJSONRenderer()
+        for data in ({'big': 2 ** 70}, {'line': '\u2028\u2029'},
+                     {'when': timezone.now()}, [Decimal('1.50')]):
+            with self.subTest(data=data):
+                self.assertEqual(renderer.render(data), JSONRenderer().render(data))
+
+
+class OrderConditionalGetTests(APIUsersMixin, QueryBudgetMixin, APITestCase):
+    def setUp(self):
+        super().setUp()
+        self.factory = APIRequestFactory()
+        self.tariff = Tariff.objects.create(name='Basic', description='Basic', price='10.00')
+        self.order = Order.objects.create(user=self.user, tariff=self.tariff,
+                                          project_name='Site', project_description='Site',
+                                          requirements='None', total_price=self.tariff.price)
+        self.authenticate(self.user)
+        self.url = reverse('orders:order-detail', args=[self.order.id])
+
+    def get(self, params=None, etag=None):
+        extra = {'HTTP_IF_NONE_MATCH': etag} if etag else {}
+        return self.client.get(self.url, params, **extra)
+
+    def test_not_modified(self):
+        response = self.get()
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        etag = response['ETag']
+        self.assertIn('no-cache', response['Cache-Control'])
+        # user and order lookups, no serialization
+        with self.assertMaxQueries(2), mock.patch.object(
+                OrderSerializer, 'to_representation') as to_representation:
+            response = self.get(etag=etag)
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+        self.assertEqual(response.content, b'')
+        self.assertEqual(response['ETag'], etag)
+        to_representation.assert_not_called()
+        self.assertEqual(self.get(etag=f'W/{etag}').status_code,
+                         status.HTTP_304_NOT_MODIFIED)
+
+    def test_changes_invalidate(self):
+        etag = self.get()['ETag']
+        self.order.project_name = 'Shop'
+        self.order.save()
+        response = self.get(etag=etag)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['project_name'], 'Shop')
+
+        etag = response['ETag']
+        self.tariff.name = 'Premium'
+        self.tariff.save()
+        response = self.get(etag=etag)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['tariff_details']['name'], 'Premium')
+
+    def test_fields_change_etag(self):
+        etag = self.get()['ETag']
+        response = self.get({'fields': 'id'}, etag=etag)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        with self.assertMaxQueries(2):
+            response = self.get({'fields': 'id'}, etag=response['ETag'])
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+
+    def test_async_view(self):
+        etag = self.get()['ETag']
+        token = UserRefreshToken.for_user(self.user).access_token
+        request = self.factory.get(self.url, HTTP_AUTHORIZATION=f'Bearer {token}',
+                                   HTTP_IF_NONE_MATCH=etag)
+        view = async_to_sync(views.AsyncOrderDetailView.as_view())
+        response = view(request, pk=self.order.id).render()
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+
+
+class ResponseCompressionTests(APIUsersMixin, APITestCase):
+    def setUp(self):
+        super().setUp()
+        tariff = Tariff.objects.create(name='Базовый', description='Базовый пакет',
+                                       price='49999.00')
+        Order.objects.bulk_create([
+            Order(user=self.admin, tariff=tariff, project_name=f'Проект {i}',
+                  project_description='Интернет-магазин одежды с каталогом и корзиной',
+                  requirements='Адаптивный дизайн', total_price=tariff.price)
+            for i in range(10)
+        ])
+        self.authenticate(self.admin)
+        self.url = reverse('orders:order-list-create')
+
+    def test_negotiate(self):
+        cases = [
+            ('', None),
+            ('identity', None),
+            ('gzip, deflate', 'gzip'),
+            ('GZIP;q=0.5', 'gzip'),
+            ('gzip;q=0', None),
+            ('*', 'br' if compression.brotli else 'gzip'),
+            ('br;q=0.5, gzip', 'gzip'),
+            ('gzip, br', 'br' if compression.brotli else 'gzip'),
+            ('gzip;q=abc', None),
+        ]
+        for header, expected in cases:
+            with self.subTest(header=header):
+                self.assertEqual(compression.negotiate(header), expected)
+
+    def test_gzip(self):
+        expected = self.client.get(self.url)
+        self.assertNotIn('Content-Encoding', expected)
+        self.assertIn('Accept-Encoding', expected['Vary'])
+        response = self.client.get(self.url, HTTP_ACCEPT_ENCODING='gzip')
+        self.assertEqual(response['Content-Encoding'], 'gzip')
+        self.assertEqual(int(response['Content-Length']), len(response.content))
+        self.assertLess(len(response.content), len(expected.content))
+        self.assertEqual(gzip.decompress(response.content), expected.content)
+
+    @skipUnless(compression.brotli, 'brotli is not installed')
+    def test_brotli(self):
+        expected = self.client.get(self.url)
+        response = self.client.get(self.url, HTTP_ACCEPT_ENCODING='gzip, deflate, br')
+        self.assertEqual(response['Content-Encoding'], 'br')
+        self.assertEqual(compression.brotli.decompress(response.content), expected.content)
+
+    def test_small_responses_are_not_compressed(self):
+        url = reverse('orders:order-detail', args=[Order.objects.first().id])
+        with override_settings(COMPRESSION_MIN_SIZE=10_000):
+            response = self.client.get(url, HTTP_ACCEPT_ENCODING='gzip')
+        self.assertNotIn('Content-Encoding', response)
+        self.assertNotIn('Accept-Encoding', response['Vary'])
+
+    def test_etag_is_weakened(self):
+        url = reverse('orders:order-detail', args=[Order.objects.first().id])
+        with override_settings(COMPRESSION_MIN_SIZE=0):
+            response = self.client.get(url, HTTP_ACCEPT_ENCODING='gzip')
+            self.assertEqual(response['Content-Encoding'], 'gzip')
+            self.assertTrue(response['ETag'].startswith('W/"'))
+            response = self.client.get(url, HTTP_ACCEPT_ENCODING='gzip',
+                                       HTTP_IF_NONE_MATCH=response['ETag'])
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+
+    def test_streaming(self):
+        url = reverse('orders:order-export')
+        expected = b''.join(self.client.get(url).streaming_content)
+        with mock.patch.object(views.OrderExportView, 'accepts_gzip', re.compile('^$')):
+            response = self.client.get(url, {'format': 'ndjson'}, HTTP_ACCEPT_ENCODING='gzip')
+            # The view no longer compresses, the middleware does
+            self.assertEqual(response['Content-Encoding'], 'gzip')
+            content = gzip.decompress(b''.join(response.streaming_content))
+        self.assertEqual(len(content.splitlines()), 10)
+        self.assertEqual(len(expected.splitlines()), 11)
+
+    def test_precompressed_responses_are_left_alone(self):
+        url = reverse('orders:order-export')
+        response = self.client.get(url, HTTP_ACCEPT_ENCODING='br, gzip')
+        self.assertEqual(response['Content-Encoding'], 'gzip')
+        content = gzip.decompress(b''.join(response.streaming_content))
+        self.assertEqual(content, b''.join(self.client.get(url).streaming_content))
+
+
+class OrderAnalyticsTests(APIUsersMixin, APITestCase):
+    def setUp(self):
+        super().setUp()
+        self.basic = Tariff.objects.create(name='Basic', description='Basic', price='100.00')
+        self.premium = Tariff.objects.create(name='Premium', description='Premium',
+                                             price='250.00')
+        self.authenticate(self.admin)
+
+    def create_order(self, tariff, **kwargs):
+        return Order.objects.create(
+            user=self.user, tariff=tariff, project_name='Project',
+            project_description='Description', requirements='Requirements',
+            total_price=tariff.price, **kwargs
+        )
+
+    def stats(self):
+        return {
+            (row.day, row.tariff_id, row.status): (row.order_count, row.revenue)
+            for row in OrderDailyStats.objects.filter(order_count__gt=0)
+        }
+
+    def assertStatsUpToDate(self):
+        expected = {
+            (row['day'], row['tariff'], row['status']): (row['count'], row['revenue'])
+            for row in analytics.buckets(Order.objects.all())
+        }
+        self.assertEqual(self.stats(), expected)
+
+    def test_saves_and_deletes_move_orders_between_buckets(self):
+        order = self.create_order(self.basic)
+        other = self.create_order(self.premium)
+        today = timezone.localdate()
+        self.assertEqual(self.stats(), {
+            (today, self.basic.id, 'NEW'): (1, Decimal('100.00')),
+            (today, self.premium.id, 'NEW'): (1, Decimal('250.00')),
+        })
+
+        url = reverse('orders:order-update', args=[order.id])
+        response = self.client.patch(url, {'status': 'COMPLETED'}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(self.stats(), {
+            (today, self.basic.id, 'COMPLETED'): (1, Decimal('100.00')),
+            (today, self.premium.id, 'NEW'): (1, Decimal('250.00')),
+        })
+
+        response = self.client.delete(reverse('orders:order-delete', args=[other.id]))
+        self.assertEqual(response.status_code, status.HTTP_204_NO_CONTENT)
+        self.assertStatsUpToDate()
+        other.refresh_from_db()
+        other.restore()
+        self.assertStatsUpToDate()
+        order.delete()
+        self.assertEqual(self.stats(), {(today, self.premium.id, 'NEW'): (1, Decimal('250.00'))})
+
+    def test_bulk_writes(self):
+        self.create_order(self.premium, status=Order.Status.CANCELLED)
+        url = reverse('orders:order-bulk-create')
+        data = [{'tariff': tariff.id, 'project_name': 'Bulk', 'project_description': 'Bulk',
+                 'requirements': 'Bulk'} for tariff in (self.basic, self.basic, self.premium)]
+        response = self.client.post(url, data, format='json')
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertStatsUpToDate()
+
+        response = self.client.post(reverse('orders:order-bulk-status'), {
+            'filter': {'status': 'NEW'}, 'status': 'IN_PROGRESS'}, format='json')
+        self.assertEqual(response.data['updated'], 3)
+        self.assertStatsUpToDate()
+
+    def test_bulk_soft_delete(self):
+        self.create_order(self.basic)
+        self.create_order(self.basic, status=Order.Status.COMPLETED)
+        self.create_order(self.premium)
+        self.assertEqual(Order.objects.filter(tariff=self.basic).soft_delete(), 2)
+        self.assertStatsUpToDate()
+        self.assertEqual(Order.objects.all_with_deleted().restore(), 2)
+        self.assertStatsUpToDate()
+
+    def test_rebuild_command(self):
+        self.create_order(self.basic)
+        self.create_order(self.premium)
+        # Bypasses the signals
+        Order.objects.filter(tariff=self.basic).update(status=Order.Status.COMPLETED)
+        call_command('rebuild_order_stats', stdout=io.StringIO())
+        self.assertStatsUpToDate()
+
+    def test_endpoint(self):
+        first = self.create_order(self.basic)
+        self.create_order(self.basic)
+        self.create_order(self.premium, status=Order.Status.COMPLETED)
+        Order.objects.filter(pk=first.pk).update(created_at=timezone.now() - timedelta(days=40))
+        analytics.rebuild()
+        this_month = timezone.localdate().replace(day=1)
+        last_month = (this_month - timedelta(days=1)).replace(day=1)
+        url = reverse('orders:order-analytics')
+
+        with self.assertNumQueries(2):  # user lookup, stats
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.json(), [
+            {'period': str(last_month), 'tariff': self.basic.id, 'tariff_name': 'Basic',
+             'status': 'NEW', 'orders': 1, 'revenue': '100.00'},
+            {'period': str(this_month), 'tariff': self.basic.id, 'tariff_name': 'Basic',
+             'status': 'NEW', 'orders': 1, 'revenue': '100.00'},
+            {'period': str(this_month), 'tariff': self.premium.id, 'tariff_name': 'Premium',
+             'status': 'COMPLETED', 'orders': 1, 'revenue': '250.00'},
+        ])
+
+        response = self.client.get(url, {'period': 'year', 'group_by': 'status'})
+        totals = {row['status']: (row['orders'], row['revenue']) for row in response.data}
+        if last_month.year == this_month.year:
+            self.assertEqual(totals, {'NEW': (2, '200.00'), 'COMPLETED': (1, '250.00')})
+
+        response = self.client.get(url, {'group_by': '', 'status': 'NEW',
+                                         'day_after': str(this_month)})
+        self.assertEqual(response.json(), [
+            {'period': str(this_month), 'orders': 1, 'revenue': '100.00'},
+        ])
+
+    def test_endpoint_validation_and_permissions(self):
+        url = reverse('orders:order-analytics')
+        response = self.client.get(url, {'period': 'week'})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        response = self.client.get(url, {'group_by': 'user'})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.authenticate(self.user)
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
+
+
+class OrderSoftDeleteTests(APIUsersMixin, APITestCase):
+    def setUp(self):
+        super().setUp()
+        self.tariff = Tariff.objects.create(name='Basic', description='Basic', price='100.00')
+        self.orders = [
+            Order.objects.create(user=self.user, tariff=self.tariff, project_name=f'Project {i}',
+                                 project_description='Description', requirements='Requirements',
+                                 total_price=self.tariff.price)
+            for i in range(3)
+        ]
+
+    def updates(self, queries):
+        return [query['sql'] for query in queries if query['sql'].startswith('UPDATE')]
+
+    def test_default_manager_hides_deleted(self):
+        self.orders[0].soft_delete()
+        self.assertEqual(Order.objects.count(), 2)
+        self.assertEqual(self.user.orders.count(), 2)
+        self.assertEqual(Order.objects.all_with_deleted().count(), 3)
+        self.orders[0].restore()
+        self.assertEqual(Order.objects.count(), 3)
+
+    def test_queryset_soft_delete_is_one_update(self):
+        before = timezone.now()
+        with CaptureQueriesContext(connection) as queries:
+            self.assertEqual(Order.objects.soft_delete(), 3)
+        self.assertEqual(len(self.updates(queries)), 1)
+        self.assertFalse(Order.objects.exists())
+        self.assertFalse(Order.objects.all_with_deleted().filter(updated_at__lt=before).exists())
+        self.assertEqual(Order.objects.all_with_deleted().soft_delete(), 0)
+
+    def test_instance_soft_delete_writes_only_the_flag(self):
+        with CaptureQueriesContext(connection) as queries:
+            self.orders[0].soft_delete()
+        update, = self.updates(queries)
+        self.assertIn('"is_deleted"', update)
+        self.assertNotIn('"project_description"', update)
+
+    def test_user_soft_delete(self):
+        User.objects.filter(pk=self.user.pk).soft_delete()
+        self.assertFalse(User.objects.filter(pk=self.user.pk).exists())
+        # Foreign keys load through the base manager, deleted rows included
+        self.assertEqual(Order.objects.first().user, self.user)
+
+
+class OrderArchiveTests(APIUsersMixin, APITestCase):
+    def setUp(self):
+        super().setUp()
+        self.other = User.objects.create_user(username='other', password='testpass123')
+        self.tariff = Tariff.objects.create(name='Basic', description='Basic', price='100.00')
+        self.completed = self.create_order('Completed', Order.Status.COMPLETED)
+        self.cancelled = self.create_order('Cancelled', Order.Status.CANCELLED)
+        self.deleted = self.create_order('Deleted', Order.Status.NEW, is_deleted=True)
+        self.active = self.create_order('Active', Order.Status.IN_PROGRESS)
+        self.recent = self.create_order('Recent', Order.Status.COMPLETED, age=timedelta(days=1))
+        self.authenticate(self.user)
+
+    def create_order(self, name, status, age=timedelta(days=400), **kwargs):
+        order = Order.objects.create(
+            user=self.user, tariff=self.tariff, project_name=name,
+            project_description='Description', requirements='Requirements',
+            total_price=self.tariff.price, status=status, **kwargs
+        )
+        Order.objects.all_with_deleted().filter(pk=order.pk).update(
+            updated_at=timezone.now() - age)
+        return order
+
+    def list_names(self, **params):
+        response = self.client.get(reverse('orders:order-list-create'), params)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return {order['project_name'] for order in response.data['results']}
+
+    def test_archive_moves_old_finished_and_deleted_orders(self):
+        self.assertEqual(archive.archive(), 3)
+        archived = {self.completed.pk, self.cancelled.pk, self.deleted.pk}
+        self.assertEqual(set(ArchivedOrder.objects.values_list('pk', flat=True)), archived)
+        self.assertEqual(set(Order.objects.all_with_deleted().values_list('pk', flat=True)),
+                         {self.active.pk, self.recent.pk})
+        self.assertEqual(ArchivedOrder.objects.get(pk=self.completed.pk).project_name,
+                         'Completed')
+        self.assertEqual(archive.archive(), 0)
+
+    def test_archive_runs_in_resumable_batches(self):
+        cutoff = timezone.now() - timedelta(days=365)
+        self.assertEqual(archive.archive_batch(cutoff, 1), [self.completed.pk])
+        # An interrupted run leaves both tables consistent; the next one
+        # moves the rest
+        self.assertEqual(CombinedOrder.objects.all_with_deleted().count(), 5)
+        output = io.StringIO()
+        call_command('archive_orders', batch_size=1, stdout=output)
+        self.assertIn('Archived 2 orders', output.getvalue())
+        self.assertIn('2 in the orders table, 3 in the archive', output.getvalue())
+
+    def test_older_than(self):
+        call_command('archive_orders', older_than=0, stdout=io.StringIO())
+        self.assertEqual(ArchivedOrder.objects.count(), 4)
+
+    def test_list_and_detail_include_archived(self):
+        archive.archive()
+        self.assertEqual(self.list_names(), {'Active', 'Recent'})
+        self.assertEqual(self.list_names(include_archived='true'),
+                         {'Active', 'Recent', 'Completed', 'Cancelled'})
+        self.assertEqual(self.list_names(include_archived='true', status='COMPLETED'),
+                         {'Recent', 'Completed'})
+        self.assertEqual(self.list_names(include_archived='true', search='Cancelled'),
+                         {'Cancelled'})
+
+        url = reverse('orders:order-detail', args=[self.completed.pk])
+        self.assertEqual(self.client.get(url).status_code, status.HTTP_404_NOT_FOUND)
+        response = self.client.get(url, {'include_archived': 'true'})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['status'], Order.Status.COMPLETED)
+
+        self.authenticate(self.other)
+        self.assertEqual(self.list_names(include_archived='true'), set())
+        response = self.client.get(url, {'include_archived': 'true'})
+        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
+
+    def test_stats_keep_archived_orders(self):
+        before = set(OrderDailyStats.objects.values_list('day', 'tariff', 'status', 'order_count'))
+        archive.archive()
+        after = set(OrderDailyStats.objects.values_list('day', 'tariff', 'status', 'order_count'))
+        self.assertEqual(after, before)
+        analytics.rebuild()
+        rebuilt = set(OrderDailyStats.objects.filter(order_count__gt=0)
+                      .values_list('day', 'tariff', 'status', 'order_count'))
+        self.assertEqual(rebuilt, {row for row in before if row[3]})
+
+    @skipUnless(connection.vendor == 'sqlite', 'checks the SQLite FTS5 table')
+    def test_archived_orders_leave_the_search_index(self):
+        archive.archive()
+        with connection.cursor() as cursor:
+            cursor.execute('SELECT rowid FROM orders_order_fts')
+            indexed = {row[0] for row in cursor.fetchall()}
+        self.assertEqual(indexed, {self.active.pk, self.recent.pk})
+
+
+class OrderAttachmentTests(APIUsersMixin, APITestCase):
+    def setUp(self):
+        super().setUp()
+        root = tempfile.TemporaryDirectory()
+        self.addCleanup(root.cleanup)
+        overrides = override_settings(ATTACHMENT_ROOT=root.name, ATTACHMENT_THUMBNAIL_WORKERS=0)
+        overrides.enable()
+        self.addCleanup(overrides.disable)
+        self.other = User.objects.create_user(username='other', password='testpass123')
+        tariff = Tariff.objects.create(name='Basic', description='Basic', price='100.00')
+        self.order, self.second_order = [
+            Order.objects.create(user=self.user, tariff=tariff, project_name=f'Project {i}',
+                                 project_description='Description', requirements='Requirements',
+                                 total_price=tariff.price)
+            for i in range(2)
+        ]
+        self.authenticate(self.user)
+
+    def start(self, order, data, filename='notes.txt', **fields):
+        response = self.client.post(reverse('orders:order-attachments', args=[order.pk]),
+                                    {'filename': filename, 'size': len(data), **fields},
+                                    format='json')
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED, response.data)
+        self.assertEqual(response['Location'], response.data['url'])
+        return response.data['url']
+
+    def send(self, url, data, start, end=None, size=None, body=None):
+        end = start + len(data) - 1 if end is None else end
+        return self.client.patch(
+            url, data if body is None else body, content_type='application/octet-stream',
+            HTTP_CONTENT_RANGE=f'bytes {start}-{end}/{size or len(data)}')
+
+    def upload(self, order, data, chunk_size=4, **fields):
+        url = self.start(order, data, **fields)
+        for start in range(0, len(data), chunk_size):
+            response = self.send(url, data[start:start + chunk_size], start,
+                                 size=len(data))
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED, response.data)
+        return response.data
+
+    def download(self, attachment, **headers):
+        return self.client.get(reverse('orders:order-attachment',
+                                       args=[self.order.pk, attachment['id']]), **headers)
+
+    def test_chunked_upload(self):
+        data = b'Brand book, version 3'
+        url = self.start(self.order, data)
+        response = self.send(url, data[:8], 0, size=len(data))
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['offset'], 8)
+        response = self.send(url, data[8:], 8, size=len(data))
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(response.data['sha256'], hashlib.sha256(data).hexdigest())
+        self.assertEqual(response.data['size'], len(data))
+        self.assertEqual(response.data['content_type'], 'text/plain')
+        self.assertEqual(attachments.blob_path(response.data['sha256']).read_bytes(), data)
+        self.assertFalse(Upload.objects.exists())
+        self.assertEqual(list(attachments.upload_path('x').parent.iterdir()), [])
+
+        response = self.client.get(reverse('orders:order-attachments', args=[self.order.pk]))
+        self.assertEqual([item['filename'] for item in response.data], ['notes.txt'])
+
+    def test_resume(self):
+        data = b'0123456789'
+        url = self.start(self.order, data)
+        # The connection drops after five bytes of the chunk
+        response = self.send(url, data[:5], 0, end=9, size=10)
+        self.assertEqual(response.data['offset'], 5)
+        response = self.send(url, data[8:], 8, size=10)
+        self.assertEqual(response.status_code, status.HTTP_409_CONFLICT)
+        self.assertEqual(response.data['offset'], 5)
+        self.assertEqual(self.client.get(url).data['offset'], 5)
+        response = self.send(url, data[5:], 5, size=10)
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(b''.join(self.download(response.data).streaming_content), data)
+
+        response = self.send(self.start(self.order, data), data, 0, size=11)
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_identical_files_are_stored_once(self):
+        data = b'logo' * 100
+        first = self.upload(self.order, data, chunk_size=64, filename='logo.svg')
+        second = self.upload(self.second_order, data, chunk_size=64, filename='logo-copy.svg')
+        self.assertEqual(first['sha256'], second['sha256'])
+        self.assertEqual(Blob.objects.count(), 1)
+        self.assertEqual(Attachment.objects.count(), 2)
+
+    def test_download_ranges(self):
+        data = b'abcdefghij' * 300
+        attachment = self.upload(self.order, data, chunk_size=1000)
+        response = self.download(attachment, HTTP_ACCEPT_ENCODING='gzip')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(b''.join(response.streaming_content), data)
+        self.assertEqual(response['Accept-Ranges'], 'bytes')
+        self.assertEqual(response['Content-Length'], str(len(data)))
+        self.assertIn('attachment; filename="notes.txt"', response['Content-Disposition'])
+        self.assertFalse(response.has_header('Content-Encoding'))
+        etag = response['ETag']
+
+        response = self.download(attachment, HTTP_RANGE='bytes=2-5')
+        self.assertEqual(response.status_code, status.HTTP_206_PARTIAL_CONTENT)
+        self.assertEqual(b''.join(response.streaming_content), b'cdef')
+        self.assertEqual(response['Content-Range'], f'bytes 2-5/{len(data)}')
+        response = self.download(attachment, HTTP_RANGE='bytes=-3')
+        self.assertEqual(b''.join(response.streaming_content), b'hij')
+        response = self.download(attachment, HTTP_RANGE='bytes=5000-')
+        self.assertEqual(response.status_code, status.HTTP_416_REQUESTED_RANGE_NOT_SATISFIABLE)
+        response = self.download(attachment, HTTP_RANGE='bytes=2-5', HTTP_IF_RANGE='"stale"')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        response = self.download(attachment, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+
+        with override_settings(ATTACHMENT_ACCEL_REDIRECT='/protected/'):
+            response = self.download(attachment)
+        sha256 = attachment['sha256']
+        self.assertEqual(response['X-Accel-Redirect'],
+                         f'/protected/blobs/{sha256[:2]}/{sha256[2:4]}/{sha256}')
+
+    def test_thumbnail(self):
+        buffer = io.BytesIO()
+        Image.new('RGB', (1200, 600), 'teal').save(buffer, 'png')
+        with self.captureOnCommitCallbacks(execute=True):
+            attachment = self.upload(self.order, buffer.getvalue(), chunk_size=2048,
+                                     filename='mockup.png')
+        response = self.client.get(reverse('orders:order-attachments', args=[self.order.pk]))
+        url = response.data[0]['thumbnail_url']
+        response = self.client.get(url, HTTP_ACCEPT='image/webp')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response['Content-Type'], 'image/webp')
+        self.assertEqual(response['Content-Disposition'], 'inline; filename="mockup.webp"')
+        with Image.open(io.BytesIO(b''.join(response.streaming_content))) as thumbnail:
+            self.assertEqual(thumbnail.size, (320, 160))
+        attachments.thumbnail_path(attachment['sha256']).unlink()
+        self.assertEqual(self.client.get(url, HTTP_ACCEPT='image/webp').status_code,
+                         status.HTTP_404_NOT_FOUND)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            broken = self.upload(self.order, b'not a png', filename='broken.png')
+        self.assertIs(Blob.objects.get(pk=broken['sha256']).has_thumbnail, False)
+        self.assertIsNone(broken['thumbnail_url'])
+        response = self.client.get(reverse('orders:order-attachment-thumbnail',
+                                           args=[self.order.pk, attachment['id'] + 1]))
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+    def test_missing_file(self):
+        attachment = self.upload(self.order, b'lost')
+        attachments.blob_path(attachment['sha256']).unlink()
+        self.assertEqual(self.download(attachment).status_code, status.HTTP_404_NOT_FOUND)
+
+    def test_other_users_see_nothing(self):
+        attachment = self.upload(self.order, b'private')
+        url = self.start(self.order, b'draft')
+        self.authenticate(self.other)
+        self.assertEqual(self.download(attachment).status_code, status.HTTP_404_NOT_FOUND)
+        self.assertEqual(self.client.get(url).status_code, status.HTTP_404_NOT_FOUND)
+        response = self.client.get(reverse('orders:order-attachments', args=[self.order.pk]))
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+    @override_settings(ATTACHMENT_MAX_SIZE=10)
+    def test_size_limit(self):
+        response = self.client.post(reverse('orders:order-attachments', args=[self.order.pk]),
+                                    {'filename': '../video.mp4', 'size': 11}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn('size', response.data)
+
+    def test_archived_orders_keep_attachments(self):
+        attachment = self.upload(self.order, b'final files')
+        self.order.status = Order.Status.COMPLETED
+        self.order.save()
+        archive.archive(older_than=timedelta(0))
+        url = reverse('orders:order-attachments', args=[self.order.pk])
+        self.assertEqual(self.client.get(url).status_code, status.HTTP_404_NOT_FOUND)
+        response = self.client.get(url, {'include_archived': 'true'})
+        self.assertEqual([item['id'] for item in response.data], [attachment['id']])
+        response = self.client.get(attachment['url'], {'include_archived': 'true'})
+        self.assertEqual(b''.join(response.streaming_content), b'final files')
+
+    def test_purge(self):
+        attachment = self.upload(self.order, b'old version')
+        url = self.start(self.order, b'abandoned')
+        self.send(url, b'aban', 0, size=9)
+        self.client.delete(attachment['url'])
+        output = io.StringIO()
+        call_command('purge_attachments', older_than=0, stdout=output)
+        self.assertIn('Purged 1 uploads and 1 unused files', output.getvalue())
+        self.assertFalse(attachments.blob_path(attachment['sha256']).exists())
+        self.assertEqual(list(attachments.upload_path('x').parent.iterdir()), [])
+        attachment = self.upload(self.order, b'old version')
+        self.assertEqual(b''.join(self.download(attachment).streaming_content), b'old version')
+
+
+@override_settings(PERFORMANCE_METRICS=True)
+class OrderMetricsTests(APIUsersMixin, APITestCase):
+    def setUp(self):
+        super().setUp()
+        metrics.registry.reset()
+        tariff = Tariff.objects.create(name='Basic', description='Basic', price='10.00')
+        Order.objects.create(
+            user=self.user, tariff=tariff, project_name='Project',
+            project_description='Description', requirements='Requirements',
+            total_price=tariff.price
+        )
+
+    def test_server_timing_header(self):
+        self.authenticate(self.user)
+        response = self.client.get(reverse('orders:order-list-create'))
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        timing = response['Server-Timing']
+        self.assertRegex(timing, r'^total;dur=[\d.]+, db;dur=[\d.]+;desc="3 queries", '
+                                 r'serializer;dur=[\d.]+$')
+
+    def test_metrics_endpoint(self):
+        self.authenticate(self.user)
+        self.client.get(reverse('orders:order-list-create'))
+        self.client.get(reverse('orders:order-list-create'))
+
+        response = self.client.get(reverse('metrics'))
+        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
+
+        self.authenticate(self.admin)
+        response = self.client.get(reverse('metrics'))
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertTrue(response['Content-Type'].startswith('text/plain; version=0.0.4'))
+        body = response.content.decode()
+        self.assertIn('# TYPE http_request_duration_seconds histogram', body)
+        self.assertIn('http_request_duration_seconds_count'
+                      '{view="orders:order-list-create"} 2', body)
+        self.assertIn('http_request_db_queries_bucket'
+                      '{view="orders:order-list-create",le="3"} 2', body)
+        self.assertIn('http_response_size_bytes_count{view="orders:order-list-create"} 2', body)
+
+    @override_settings(PERFORMANCE_METRICS=False)
+    def test_disabled(self):
+        self.authenticate(self.admin)
+        response = self.client.get(reverse('orders:order-list-create'))
+        self.assertNotIn('Server-Timing', response)
+        self.assertEqual(self.client.get(reverse('metrics')).status_code,
+                         status.HTTP_404_NOT_FOUND)
+
+
+class OrderAsyncViewTests(APIUsersMixin, APITestCase):
+    def setUp(self):
+        super().setUp()
+        self.factory = APIRequestFactory()
+        self.other = User.objects.create_user(
+            username='otheruser',
+            password='testpass123',
+            email='other@example.com'
+        )
+        self.tariff = Tariff.objects.create(name='Basic', description='Basic', price='10.00')
+        self.orders = [
+            Order.objects.create(
+                user=self.user if i % 3 else self.other, tariff=self.tariff,
+                project_name=f'Project {i}', project_description='Интернет-магазин одежды',
+                requirements='Requirements', total_price=self.tariff.price,
+                status=Order.Status.NEW if i % 2 else Order.Status.COMPLETED,
+            )
+            for i in range(25)
+        ]
+
+    def call(self, view_class, method='get', data=None, user=None, **kwargs):
+        headers = {}
+        if user is not None:
+            token = UserRefreshToken.for_user(user).access_token
+            headers['HTTP_AUTHORIZATION'] = f'Bearer {token}'
+        if method == 'post':
+            request = self.factory.post('/api/v1/orders/', data, format='json', **headers)
+        else:
+            request = self.factory.get('/api/v1/orders/', data, **headers)
+        view = view_class.as_view()
+        if asyncio.iscoroutinefunction(view):
+            view = async_to_sync(view)
+        return view(request, **kwargs).render()
+
+    def assertSameResponse(self, sync_view, async_view, **kwargs):
+        expected = self.call(sync_view, **kwargs)
+        response = self.call(async_view, **kwargs)
+        self.assertEqual(response.status_code, expected.status_code)
+        self.assertEqual(response.content, expected.content)
+        return response
+
+    def test_list_matches_sync_view(self):
+        for data in ({}, {'page': 2}, {'status': 'NEW'}, {'ordering': 'created_at'},
+                     {'search': 'одежда'}, {'pagination': 'cursor'}):
+            with self.subTest(data=data):
+                response = self.assertSameResponse(
+                    views.OrderListCreateView, views.AsyncOrderListCreateView,
+                    data=data, user=self.user,
+                )
+                self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+    def test_list_follows_cursor(self):
+        first = self.call(views.AsyncOrderListCreateView, data={'pagination': 'cursor'},
+                          user=self.user)
+        cursor = parse_qs(urlsplit(json.loads(first.content)['next']).query)['cursor'][0]
+        self.assertSameResponse(views.OrderListCreateView, views.AsyncOrderListCreateView,
+                                data={'cursor': cursor}, user=self.user)
+
+    def test_invalid_page(self):
+        response = self.assertSameResponse(
+            views.OrderListCreateView, views.AsyncOrderListCreateView,
+            data={'page': 99}, user=self.user,
+        )
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+    def test_requires_authentication(self):
+        response = self.assertSameResponse(views.OrderListCreateView,
+                                           views.AsyncOrderListCreateView)
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+
+    def test_database_authentication(self):
+        token = RefreshToken.for_user(self.user).access_token
+        request = self.factory.get('/api/v1/orders/', HTTP_AUTHORIZATION=f'Bearer {token}')
+        response = async_to_sync(views.AsyncOrderListCreateView.as_view())(request)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['count'], 16)
+
+    def test_detail(self):
+        own, foreign = self.orders[1], self.orders[0]
+        response = self.assertSameResponse(views.OrderDetailView, views.AsyncOrderDetailView,
+                                           user=self.user, pk=own.pk)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        response = self.assertSameResponse(views.OrderDetailView, views.AsyncOrderDetailView,
+                                           user=self.user, pk=foreign.pk)
+        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
+        response = self.assertSameResponse(views.OrderDetailView, views.AsyncOrderDetailView,
+                                           user=self.user, pk=0)
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+    def test_create(self):
+        response = self.call(views.AsyncOrderListCreateView, method='post', user=self.user, data={
+            'tariff': self.tariff.id,
+            'project_name': 'Async Project',
+            'project_description': 'Description',
+            'requirements': 'Requirements',
+            'reference_links': [],
+        })
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertTrue(Order.objects.filter(project_name='Async Project',
+                                             user=self.user).exists())
+
+
+class ReplicaRoutingTests(APIUsersMixin, APITestCase):
+    def setUp(self):
+        super().setUp()
+        self.tariff = Tariff.objects.create(name='Basic', description='Basic', price='10.00')
+        self.authenticate(self.user)
+
+    def test_router(self):
+        router = ReplicaRouter()
+        with mock.patch.dict(settings.DATABASES, replica=settings.DATABASES['default']):
+            self.assertIsNone(router.db_for_read(Order))
+            with read_from_replica():
+                self.assertEqual(router.db_for_read(Order), 'replica')
+            self.assertIsNone(router.db_for_write(Order))
+        with read_from_replica():
+            # Without a replica configured everything stays on default.
+            self.assertIsNone(router.db_for_read(Order))
+        self.assertFalse(router.allow_migrate('replica', 'orders'))
+
+    def routed_reads(self, method, *args, **kwargs):
+        routed = []
+
+        def db_for_read(router, model, **hints):
+            routed.append((model, routers._use_replica.get()))
+
+        with mock.patch.object(ReplicaRouter, 'db_for_read', autospec=True,
+                               side_effect=db_for_read):
+            method(reverse('orders:order-list-create'), *args, **kwargs)
+        return routed
+
+    def test_list_reads_from_replica(self):
+        routed = [replica for model, replica in self.routed_reads(self.client.get)
+                  if model is Order]
+        self.assertTrue(routed)
+        self.assertTrue(all(routed))
+
+    def test_create_reads_from_default(self):
+        routed = self.routed_reads(self.client.post, {
+            'tariff': self.tariff.id,
+            'project_name': 'Project',
+            'project_description': 'Description',
+            'requirements': 'Requirements',
+            'reference_links': [],
+        }, format='json')
+        self.assertTrue(routed)
+        self.assertFalse(any(replica for model, replica in routed))
+
+
+class SQLiteTuningTests(TestCase):
+    def test_settings(self):
+        from config.settings import sqlite_database
+
+        with mock.patch.dict('os.environ', SQLITE_TUNING='True', SQLITE_BUSY_TIMEOUT='1000'):
+            options = sqlite_database()['OPTIONS']
+        self.assertEqual(options['transaction_mode'], 'IMMEDIATE')
+        self.assertIn('PRAGMA journal_mode = WAL', options['init_command'])
+        self.assertIn('PRAGMA busy_timeout = 1000', options['init_command'])
+        with mock.patch.dict('os.environ', SQLITE_TUNING='False'):
+            self.assertEqual(sqlite_database()['OPTIONS'], {})
+
+    def test_connection(self):
+        from django.db import connection
+
+        if connection.vendor != 'sqlite' or not settings.DATABASES['default']['OPTIONS']:
+            self.skipTest('Tuned SQLite only')
+        self.assertEqual(connection.transaction_mode, 'IMMEDIATE')
+        with connection.cursor() as cursor:
+            cursor.execute('PRAGMA busy_timeout')
+            self.assertGreater(cursor.fetchone()[0], 0)
@@ -1,11 +1,31 @@
+from django.conf import settings
 from django.urls import path
 from . import views
 
+if settings.ASYNC_VIEWS:
+    OrderListCreateView = views.AsyncOrderListCreateView
+    OrderDetailView = views.AsyncOrderDetailView
+else:
+    OrderListCreateView = views.OrderListCreateView
+    OrderDetailView = views.OrderDetailView
+
 app_name = 'orders'
 
 urlpatterns = [
-    path('', views.OrderListCreateView.as_view(), name='order-list-create'),
-    path('<int:pk>/', views.OrderDetailView.as_view(), name='order-detail'),
+    path('', OrderListCreateView.as_view(), name='order-list-create'),
+    path('analytics/', views.OrderStatsView.as_view(), name='order-analytics'),
+    path('export/', views.OrderExportView.as_view(), name='order-export'),
+    path('bulk/', views.OrderBulkCreateView.as_view(), name='order-bulk-create'),
+    path('bulk/status/', views.OrderBulkStatusView.as_view(), name='order-bulk-status'),
+    path('<int:pk>/', OrderDetailView.as_view(), name='order-detail'),
     path('<int:pk>/update/', views.OrderUpdateView.as_view(), name='order-update'),
     path('<int:pk>/delete/', views.OrderDeleteView.as_view(), name='order-delete'),
+    path('<int:pk>/attachments/', views.OrderAttachmentListView.as_view(),
+         name='order-attachments'),
+    path('<int:pk>/attachments/uploads/<uuid:upload_id>/', views.OrderUploadView.as_view(),
+         name='order-upload'),
+    path('<int:pk>/attachments/<int:attachment_id>/', views.OrderAttachmentView.as_view(),
+         name='order-attachment'),
+    path('<int:pk>/attachments/<int:attachment_id>/thumbnail/',
+         views.OrderAttachmentThumbnailView.as_view(), name='order-attachment-thumbnail'),
 ] 
\ No newline at end of file
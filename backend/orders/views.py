@@ -1,46 +1,157 @@
-from rest_framework import generics, permissions, status
+import io
+import re
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.utils.cache import patch_vary_headers
+from django.db.models import F, Sum
+from django.db.models.functions import TruncMonth, TruncYear
+from django.shortcuts import get_object_or_404
+from django.utils import timezone
+from rest_framework import generics, permissions, serializers, status
+from rest_framework.negotiation import DefaultContentNegotiation
 from rest_framework.response import Response
 from django_filters import rest_framework as filters
-from .models import Order
-from .serializers import OrderSerializer, OrderUpdateSerializer
+from drf_yasg import openapi
+from drf_yasg.utils import swagger_auto_schema
+from config.asyncviews import AsyncListAPIView, AsyncRetrieveAPIView
+from config.conditional import AsyncConditionalRetrieveMixin, ConditionalRetrieveMixin
+from config.fastserializers import FastListMixin
+from config.routers import ReplicaReadMixin
+from config.sparsefields import SparseFieldsViewMixin
+from . import analytics, attachments
+from .export import CSVRenderer, NDJSONRenderer, export_response
+from .models import Attachment, CombinedOrder, Order, OrderDailyStats, Upload
+from .pagination import OrderPagination
+from .serializers import (
+    AttachmentSerializer,
+    OrderBulkCreateSerializer,
+    OrderBulkStatusSerializer,
+    OrderListSerializer,
+    OrderSerializer,
+    OrderStatsSerializer,
+    OrderUpdateSerializer,
+    UploadSerializer,
+)
+from tariffs.models import Tariff
 
 
 class IsOwnerOrAdmin(permissions.BasePermission):
     def has_object_permission(self, request, view, obj):
-        return obj.user == request.user or request.user.is_staff
+        return obj.user_id == request.user.id or request.user.is_staff
 
 
 class OrderFilter(filters.FilterSet):
+    # Every filter is declared and no model is bound, so the filters apply
+    # to archived orders (CombinedOrder) too
     status = filters.ChoiceFilter(choices=Order.Status.choices)
     created_at = filters.DateFromToRangeFilter()
     deadline = filters.DateFromToRangeFilter()
 
-    class Meta:
-        model = Order
-        fields = ['status', 'created_at', 'deadline']
+
+def include_archived(request):
+    return request.query_params.get('include_archived') in ('true', '1')
+
+
+def visible_orders(user, archived=False):
+    queryset = (CombinedOrder if archived else Order).objects.all()
+    if user.is_staff:
+        return queryset
+    return queryset.filter(user=user)
 
 
-class OrderListCreateView(generics.ListCreateAPIView):
+class OrderListCreateView(FastListMixin, SparseFieldsViewMixin, ReplicaReadMixin,
+                          generics.ListCreateAPIView):
+    """
+    ``?compact=true`` lists orders without their long texts and nested tariff;
+    ``?fields=`` and ``?expand=`` pick fields individually.
+    """
+
     serializer_class = OrderSerializer
     permission_classes = (permissions.IsAuthenticated,)
+    pagination_class = OrderPagination
     filterset_class = OrderFilter
     search_fields = ['project_name', 'project_description']
     ordering_fields = ['created_at', 'deadline', 'total_price']
+    # Keyset pagination reads the sort key of the first and last order
+    always_fetch = OrderPagination.keyset_fields
 
     def get_queryset(self):
-        if self.request.user.is_staff:
-            return Order.objects.filter(is_deleted=False)
-        return Order.objects.filter(user=self.request.user, is_deleted=False)
+        return (visible_orders(self.request.user, include_archived(self.request))
+                .select_related('tariff'))
+
+    def get_serializer_class(self):
+        if (self.request.method == 'GET'
+                and self.request.query_params.get('compact') in ('true', '1')):
+            return OrderListSerializer
+        return super().get_serializer_class()
 
 
-class OrderDetailView(generics.RetrieveAPIView):
-    queryset = Order.objects.filter(is_deleted=False)
+class OrderExportView(generics.GenericAPIView):
+    """
+    Every order matching the list filters, search and ordering, streamed as
+    CSV (``?format=csv``, the default) or NDJSON (``?format=ndjson``), gzipped
+    for clients that accept it.
+    """
+
+    permission_classes = (permissions.IsAdminUser,)
+    renderer_classes = (CSVRenderer, NDJSONRenderer)
+    pagination_class = None
+    filterset_class = OrderFilter
+    search_fields = OrderListCreateView.search_fields
+    ordering_fields = OrderListCreateView.ordering_fields
+    accepts_gzip = re.compile(r'\bgzip\b')
+
+    def get_queryset(self):
+        return visible_orders(self.request.user, include_archived(self.request))
+
+    @swagger_auto_schema(responses={200: openapi.Response(
+        'CSV or NDJSON file', schema=openapi.Schema(type=openapi.TYPE_FILE))})
+    def get(self, request, *args, **kwargs):
+        gzip = bool(self.accepts_gzip.search(request.headers.get('Accept-Encoding', '')))
+        response = export_response(
+            self.filter_queryset(self.get_queryset()),
+            request.accepted_renderer.format,
+            settings.ORDER_EXPORT_CHUNK_SIZE,
+            gzip=gzip,
+        )
+        patch_vary_headers(response, ('Accept-Encoding',))
+        return response
+
+
+class OrderDetailView(ConditionalRetrieveMixin, SparseFieldsViewMixin, generics.RetrieveAPIView):
+    queryset = Order.objects.select_related('tariff')
     serializer_class = OrderSerializer
     permission_classes = (permissions.IsAuthenticated, IsOwnerOrAdmin)
+    # IsOwnerOrAdmin reads the owner, the ETag the modification time
+    always_fetch = ('user', 'updated_at')
+
+    def get_queryset(self):
+        if include_archived(self.request):
+            return CombinedOrder.objects.select_related('tariff')
+        return super().get_queryset()
+
+    def get_etag_values(self, instance):
+        values = super().get_etag_values(instance)
+        if type(instance).tariff.is_cached(instance):
+            # The tariff is joined when tariff_details is shown
+            values.append(instance.tariff.updated_at)
+        return values
+
+
+class AsyncOrderListCreateView(AsyncListAPIView, OrderListCreateView):
+    async def post(self, request, *args, **kwargs):
+        # Creating goes through serializer validation and save(), which are
+        # synchronous all the way down.
+        return await sync_to_async(self.create)(request, *args, **kwargs)
+
+
+class AsyncOrderDetailView(AsyncConditionalRetrieveMixin, AsyncRetrieveAPIView, OrderDetailView):
+    pass
 
 
 class OrderUpdateView(generics.UpdateAPIView):
-    queryset = Order.objects.filter(is_deleted=False)
+    queryset = Order.objects.all()
     serializer_class = OrderUpdateSerializer
     permission_classes = (permissions.IsAuthenticated, IsOwnerOrAdmin)
 
@@ -58,9 +169,287 @@ class OrderUpdateView(generics.UpdateAPIView):
 
 
 class OrderDeleteView(generics.DestroyAPIView):
-    queryset = Order.objects.filter(is_deleted=False)
+    queryset = Order.objects.all()
     permission_classes = (permissions.IsAuthenticated, IsOwnerOrAdmin)
 
     def perform_destroy(self, instance):
         instance.soft_delete()
-        return Response(status=status.HTTP_204_NO_CONTENT) 
\ No newline at end of file
+        return Response(status=status.HTTP_204_NO_CONTENT) 
+
+
+class OrderBulkCreateView(generics.CreateAPIView):
+    serializer_class = OrderBulkCreateSerializer
+    permission_classes = (permissions.IsAuthenticated,)
+
+    def get_serializer(self, *args, **kwargs):
+        if 'data' in kwargs:
+            kwargs.update(many=True, allow_empty=False,
+                          max_length=settings.ORDER_BULK_MAX_SIZE)
+        return super().get_serializer(*args, **kwargs)
+
+    def get_serializer_context(self):
+        context = super().get_serializer_context()
+        if isinstance(self.request.data, list):
+            ids = set()
+            for item in self.request.data:
+                try:
+                    ids.add(int(item['tariff']))
+                except (KeyError, TypeError, ValueError):
+                    pass
+            context['tariffs'] = Tariff.objects.in_bulk(ids)
+        return context
+
+
+class OrderBulkStatusView(generics.GenericAPIView):
+    # Customers cannot change the status of their own orders either
+    # (OrderUpdateView), so this is staff only
+    queryset = Order.objects.all()
+    serializer_class = OrderBulkStatusSerializer
+    permission_classes = (permissions.IsAdminUser,)
+
+    def post(self, request, *args, **kwargs):
+        serializer = self.get_serializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        queryset = self.get_queryset()
+
+        ids = serializer.validated_data.get('ids')
+        if ids is not None:
+            found = dict(queryset.filter(pk__in=ids).values_list('pk', 'status'))
+            missing = sorted(set(ids) - set(found))
+            if missing:
+                raise serializers.ValidationError({'ids': [f"Orders not found: {missing}"]})
+            cancelled = sorted(pk for pk, value in found.items()
+                               if value == Order.Status.CANCELLED)
+            if cancelled:
+                raise serializers.ValidationError(
+                    {'ids': [f"Cannot update a cancelled order: {cancelled}"]}
+                )
+            queryset = queryset.filter(pk__in=ids)
+        else:
+            data = serializer.validated_data['filter']
+            filterset = OrderFilter(data, queryset=queryset, request=request)
+            if not any(data.get(name) for name in self.get_filter_parameters(filterset)):
+                # Unknown keys are ignored by the filterset, which would turn
+                # a typo into an update of every visible order.
+                raise serializers.ValidationError(
+                    {'filter': ["At least one order filter is required."]}
+                )
+            if not filterset.is_valid():
+                raise serializers.ValidationError({'filter': filterset.errors})
+            queryset = filterset.qs
+
+        # One UPDATE for the whole batch; cancelled orders are excluded here
+        # too so a concurrent cancellation is never overwritten.
+        updated = analytics.update_status(
+            queryset.exclude(status=Order.Status.CANCELLED),
+            serializer.validated_data['status'],
+            updated_at=timezone.now()
+        )
+        return Response({'updated': updated})
+
+    def get_filter_parameters(self, filterset):
+        for name, field in filterset.form.fields.items():
+            suffixes = getattr(field.widget, 'suffixes', None)
+            if suffixes:
+                yield from (f'{name}_{suffix}' for suffix in suffixes)
+            else:
+                yield name
+
+
+class OrderStatsFilter(filters.FilterSet):
+    day = filters.DateFromToRangeFilter()
+    status = filters.ChoiceFilter(choices=Order.Status.choices)
+
+    class Meta:
+        model = OrderDailyStats
+        fields = ['day', 'tariff', 'status']
+
+
+class OrderStatsView(generics.ListAPIView):
+    """
+    Number of orders and revenue per period and, unless left out of
+    ``group_by``, per tariff and status. Served from the precomputed
+    ``OrderDailyStats``, so the cost depends on the number of days reported
+    on, not on the number of orders.
+    """
+
+    serializer_class = OrderStatsSerializer
+    permission_classes = (permissions.IsAdminUser,)
+    pagination_class = None
+    filter_backends = (filters.DjangoFilterBackend,)
+    filterset_class = OrderStatsFilter
+    periods = {
+        'day': F('day'),
+        'month': TruncMonth('day'),
+        'year': TruncYear('day'),
+    }
+    dimensions = {
+        'tariff': ('tariff', 'tariff__name'),
+        'status': ('status',),
+    }
+
+    def get_queryset(self):
+        return OrderDailyStats.objects.all()
+
+    @swagger_auto_schema(manual_parameters=[
+        openapi.Parameter('period', openapi.IN_QUERY, type=openapi.TYPE_STRING,
+                          enum=list(periods), default='month'),
+        openapi.Parameter('group_by', openapi.IN_QUERY, type=openapi.TYPE_STRING,
+                          description='Comma-separated subset of: tariff, status',
+                          default='tariff,status'),
+    ])
+    def get(self, request, *args, **kwargs):
+        return self.list(request, *args, **kwargs)
+
+    def list(self, request, *args, **kwargs):
+        period = request.query_params.get('period', 'month')
+        if period not in self.periods:
+            raise serializers.ValidationError(
+                {'period': [f"Choose one of: {', '.join(self.periods)}."]}
+            )
+        group_by = [name for name in request.query_params.get(
+            'group_by', ','.join(self.dimensions)).split(',') if name]
+        unknown = [name for name in group_by if name not in self.dimensions]
+        if unknown:
+            raise serializers.ValidationError(
+                {'group_by': [f"Unknown dimensions: {', '.join(unknown)}."]}
+            )
+
+        fields = [field for name in group_by for field in self.dimensions[name]]
+        rows = (self.filter_queryset(self.get_queryset())
+                .values(*fields, period=self.periods[period])
+                .annotate(orders=Sum('order_count'), revenue=Sum('revenue'))
+                .filter(orders__gt=0)
+                .order_by('period', *fields))
+        return Response(self.get_serializer(rows, many=True).data)
+
+
+class FileContentNegotiation(DefaultContentNegotiation):
+    # Files are sent as they are stored, whatever the client accepts; only
+    # errors go through the renderers
+    def select_renderer(self, request, renderers, format_suffix=None):
+        return renderers[0], renderers[0].media_type
+
+
+class OrderAttachmentMixin:
+    permission_classes = (permissions.IsAuthenticated,)
+    pagination_class = None
+    filter_backends = ()
+
+    def get_order(self, archived=False):
+        # Archived orders keep their attachments, read-only
+        return get_object_or_404(visible_orders(self.request.user, archived), pk=self.kwargs['pk'])
+
+    def get_attachment(self):
+        order = self.get_order(self.request.method == 'GET' and include_archived(self.request))
+        return get_object_or_404(Attachment.objects.select_related('blob'),
+                                 pk=self.kwargs['attachment_id'], order_id=order.pk)
+
+
+class OrderAttachmentListView(OrderAttachmentMixin, generics.ListCreateAPIView):
+    """
+    The order's attachments. ``POST`` starts an upload of ``size`` bytes;
+    its ``url`` then takes the file in one or more ``PATCH`` requests with a
+    ``Content-Range: bytes <first>-<last>/<size>`` header.
+    """
+
+    def get_queryset(self):
+        order = self.get_order(include_archived(self.request))
+        return Attachment.objects.filter(order_id=order.pk).select_related('blob')
+
+    def get_serializer_class(self):
+        if self.request.method == 'POST':
+            return UploadSerializer
+        return AttachmentSerializer
+
+    def perform_create(self, serializer):
+        serializer.instance = attachments.start_upload(
+            order=self.get_order(), user=self.request.user, **serializer.validated_data)
+
+    def get_success_headers(self, data):
+        return {'Location': data['url']}
+
+
+class OrderUploadView(OrderAttachmentMixin, generics.GenericAPIView):
+    """
+    An upload in progress: ``GET`` tells how many bytes arrived (``offset``),
+    ``PATCH`` sends the next chunk, ``DELETE`` abandons the upload. The chunk
+    completing the file returns the new attachment.
+    """
+
+    serializer_class = UploadSerializer
+
+    def get_object(self):
+        return get_object_or_404(Upload, pk=self.kwargs['upload_id'], order_id=self.get_order().pk)
+
+    def get(self, request, *args, **kwargs):
+        return Response(self.get_serializer(self.get_object()).data)
+
+    def patch(self, request, *args, **kwargs):
+        upload = self.get_object()
+        byte_range = attachments.parse_content_range(request.headers.get('Content-Range'),
+                                                     upload.size)
+        if byte_range is None:
+            raise serializers.ValidationError(
+                {'Content-Range': [f"Expected bytes <first>-<last>/{upload.size}."]}
+            )
+        start, end = byte_range
+        # The body is read from the request stream as it arrives, never
+        # through request.data
+        if (start != upload.received
+                or attachments.write_chunk(upload, start, end, request.stream or io.BytesIO()) is None):
+            upload = self.get_object()
+            return Response({'detail': f"Expected the chunk at offset {upload.received}.",
+                             'offset': upload.received}, status=status.HTTP_409_CONFLICT)
+        if upload.received < upload.size:
+            return Response(self.get_serializer(upload).data)
+        attachment = attachments.complete_upload(upload)
+        return Response(AttachmentSerializer(attachment, context=self.get_serializer_context()).data,
+                        status=status.HTTP_201_CREATED)
+
+    def delete(self, request, *args, **kwargs):
+        attachments.cancel_upload(self.get_object())
+        return Response(status=status.HTTP_204_NO_CONTENT)
+
+
+class OrderAttachmentView(OrderAttachmentMixin, generics.GenericAPIView):
+    """The file, with ``Range`` requests; ``DELETE`` removes the attachment."""
+
+    content_negotiation_class = FileContentNegotiation
+
+    @swagger_auto_schema(responses={200: openapi.Response(
+        'The file', schema=openapi.Schema(type=openapi.TYPE_FILE))})
+    def get(self, request, *args, **kwargs):
+        attachment = self.get_attachment()
+        blob = attachment.blob
+        return attachments.file_response(
+            request, attachments.blob_path(blob.sha256), blob.size, blob.sha256,
+            attachment.filename, attachment.content_type)
+
+    def delete(self, request, *args, **kwargs):
+        # The file stays until manage.py purge_attachments finds it unused
+        self.get_attachment().delete()
+        return Response(status=status.HTTP_204_NO_CONTENT)
+
+
+class OrderAttachmentThumbnailView(OrderAttachmentMixin, generics.GenericAPIView):
+    content_negotiation_class = FileContentNegotiation
+
+    @swagger_auto_schema(responses={200: openapi.Response(
+        'WebP thumbnail', schema=openapi.Schema(type=openapi.TYPE_FILE))})
+    def get(self, request, *args, **kwargs):
+        attachment = self.get_attachment()
+        blob = attachment.blob
+        if not blob.has_thumbnail:
+            if blob.has_thumbnail is None and attachment.content_type.startswith('image/'):
+                # Queued thumbnails are lost when the process stops
+                attachments.schedule_thumbnail(blob.sha256)
+            return Response({'detail': "No thumbnail."}, status=status.HTTP_404_NOT_FOUND)
+        path = attachments.thumbnail_path(blob.sha256)
+        try:
+            size = path.stat().st_size
+        except FileNotFoundError:
+            return Response({'detail': "No thumbnail."}, status=status.HTTP_404_NOT_FOUND)
+        return attachments.file_response(
+            request, path, size, f'{blob.sha256}-thumbnail',
+            f'{attachment.filename.rsplit(".", 1)[0]}.webp', 'image/webp', as_attachment=False)
@@ -0,0 +1,18 @@
+from django.apps import AppConfig
+
+
+class TariffsConfig(AppConfig):
+    default_auto_field = 'django.db.models.BigAutoField'
+    name = 'tariffs'
+
+    def ready(self):
+        from django.db.models.signals import post_delete, post_save
+        from config import search
+        from . import cache
+        from .models import Tariff
+
+        search.register(Tariff, ['name', 'description'])
+        post_save.connect(cache.invalidate, sender=Tariff,
+                          dispatch_uid='tariffs-cache-save')
+        post_delete.connect(cache.invalidate, sender=Tariff,
+                            dispatch_uid='tariffs-cache-delete')
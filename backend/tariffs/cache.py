@@ -0,0 +1,143 @@
+import hashlib
+import time
+from urllib.parse import urlencode
+
+from django.conf import settings
+from django.core.cache import caches
+from django.utils.cache import patch_cache_control
+from django.utils.dateparse import parse_datetime
+from django.utils.http import http_date, parse_http_date_safe, quote_etag
+from rest_framework import status
+from rest_framework.response import Response
+
+from config.conditional import etag_matches
+
+GENERATION_KEY = 'tariffs:generation'
+# When a tariff last changed, deletions and deactivations included
+CHANGED_KEY = 'tariffs:changed'
+
+
+def get_cache():
+    return caches[settings.TARIFF_CACHE_ALIAS]
+
+
+def get_generation():
+    return get_cache().get_or_set(GENERATION_KEY, 1, timeout=None)
+
+
+async def aget_generation():
+    return await get_cache().aget_or_set(GENERATION_KEY, 1, timeout=None)
+
+
+def now():
+    return int(time.time())
+
+
+def get_changed():
+    # Unknown after the cache lost it: assume now, which costs at most one
+    # full response per client
+    return get_cache().get_or_set(CHANGED_KEY, now, timeout=None)
+
+
+async def aget_changed():
+    return await get_cache().aget_or_set(CHANGED_KEY, now, timeout=None)
+
+
+def invalidate(**kwargs):
+    # Cached responses are keyed on the generation, so bumping it retires
+    # every entry at once; old entries simply age out of the cache.
+    cache = get_cache()
+    cache.set(CHANGED_KEY, now(), timeout=None)
+    try:
+        cache.incr(GENERATION_KEY)
+    except ValueError:
+        cache.set(GENERATION_KEY, 2, timeout=None)
+
+
+class CachedCatalogueMixin:
+    """
+    Cache GET responses of the public tariff catalogue.
+
+    Entries are keyed on the path and the full (sorted) query string and hold
+    the serialized data together with its validators, so repeat requests and
+    conditional requests (``If-None-Match``/``If-Modified-Since``) are served
+    without touching the database. Tariff save/delete signals invalidate all
+    entries, see ``tariffs.apps``.
+    """
+
+    def get(self, request, *args, **kwargs):
+        cache = get_cache()
+        key = self.get_cache_key(request)
+        entry = cache.get(key)
+        if entry is None:
+            response = super().get(request, *args, **kwargs)
+            if response.status_code != status.HTTP_200_OK:
+                return response
+            entry = self.build_cache_entry(request, response.data, get_changed())
+            cache.set(key, entry, settings.TARIFF_CACHE_TIMEOUT)
+        return self.cached_response(request, entry)
+
+    def cached_response(self, request, entry):
+        headers = {'ETag': entry['etag']}
+        if entry['last_modified'] is not None:
+            headers['Last-Modified'] = http_date(entry['last_modified'])
+        if self.is_not_modified(request, entry):
+            response = Response(status=status.HTTP_304_NOT_MODIFIED, headers=headers)
+        else:
+            response = Response(entry['data'], headers=headers)
+        patch_cache_control(response, public=True, max_age=settings.TARIFF_CACHE_MAX_AGE)
+        return response
+
+    def get_cache_key(self, request, generation=None):
+        if generation is None:
+            generation = get_generation()
+        query = urlencode(sorted(request.query_params.lists()), doseq=True)
+        digest = hashlib.md5(f'{request.path}?{query}'.encode()).hexdigest()
+        return f'tariffs:{generation}:{digest}'
+
+    def build_cache_entry(self, request, data, changed):
+        is_list = isinstance(data, dict) and 'results' in data
+        items = data['results'] if is_list else [data]
+        updated = [int(parse_datetime(item['updated_at']).timestamp()) for item in items
+                   if item.get('updated_at')]
+        if is_list:
+            # A tariff deleted or deactivated leaves the list without
+            # advancing any updated_at still in it
+            updated.append(changed)
+        fingerprint = ';'.join(f'{item.get("id")}@{item.get("updated_at")}' for item in items)
+        if isinstance(data, dict):
+            fingerprint += f';count={data.get("count")}'
+        source = f'{request.get_full_path()}|{fingerprint}'
+        return {
+            'data': data,
+            'etag': quote_etag(hashlib.md5(source.encode()).hexdigest()),
+            'last_modified': max(updated) if updated else None,
+        }
+
+    def is_not_modified(self, request, entry):
+        if_none_match = request.headers.get('If-None-Match')
+        if if_none_match:
+            return etag_matches(if_none_match, entry['etag'])
+        if_modified_since = parse_http_date_safe(request.headers.get('If-Modified-Since'))
+        return (if_modified_since is not None
+                and entry['last_modified'] is not None
+                and entry['last_modified'] <= if_modified_since)
+
+
+class AsyncCachedCatalogueMixin(CachedCatalogueMixin):
+    """
+    ``CachedCatalogueMixin`` for async views, using the cache's async API.
+    Goes before the async view class, e.g. ``AsyncListAPIView``.
+    """
+
+    async def get(self, request, *args, **kwargs):
+        cache = get_cache()
+        key = self.get_cache_key(request, await aget_generation())
+        entry = await cache.aget(key)
+        if entry is None:
+            response = await super().get(request, *args, **kwargs)
+            if response.status_code != status.HTTP_200_OK:
+                return response
+            entry = self.build_cache_entry(request, response.data, await aget_changed())
+            await cache.aset(key, entry, settings.TARIFF_CACHE_TIMEOUT)
+        return self.cached_response(request, entry)
@@ -0,0 +1,18 @@
+from django.db import migrations
+
+from config.search import create_index
+
+create_search_index, drop_search_index = create_index(
+    'tariffs', 'Tariff', ['name', 'description']
+)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tariffs', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_search_index, drop_search_index),
+    ]
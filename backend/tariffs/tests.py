@@ -1,12 +1,20 @@
-from django.test import TestCase
+import json
+from unittest import mock
+from asgiref.sync import async_to_sync
+from django.test import TestCase, override_settings
 from django.urls import reverse
+from django.utils.http import http_date, parse_http_date
 from rest_framework import status
-from rest_framework.test import APITestCase
+from rest_framework.test import APIRequestFactory, APITestCase
+from config.testing import QueryBudgetMixin, query_budget
+from . import views
+from .cache import get_cache
 from .models import Tariff
 
 
-class TariffTests(APITestCase):
+class TariffTests(QueryBudgetMixin, APITestCase):
     def setUp(self):
+        get_cache().clear()
         self.tariff = Tariff.objects.create(
             name='Basic Package',
             description='Basic web design package',
@@ -21,6 +29,16 @@ class TariffTests(APITestCase):
         self.assertEqual(len(response.data['results']), 1)
         self.assertEqual(response.data['results'][0]['name'], 'Basic Package')
 
+    def test_list_fast_serialization(self):
+        Tariff.objects.create(name='Премиум', description='Всё включено\n',
+                              price='120000.00', features=[])
+        url = reverse('tariffs:tariff-list')
+        with override_settings(FAST_LIST_SERIALIZATION=False):
+            expected = self.client.get(url, {'ordering': '-price'})
+        get_cache().clear()
+        response = self.client.get(url, {'ordering': '-price'})
+        self.assertEqual(response.content, expected.content)
+
     def test_retrieve_tariff(self):
         url = reverse('tariffs:tariff-detail', args=[self.tariff.id])
         response = self.client.get(url)
@@ -47,4 +65,205 @@ class TariffTests(APITestCase):
         response = self.client.get(url, {'search': 'basic'})
         self.assertEqual(response.status_code, status.HTTP_200_OK)
         self.assertEqual(len(response.data['results']), 1)
-        self.assertEqual(response.data['results'][0]['name'], 'Basic Package') 
\ No newline at end of file
+        self.assertEqual(response.data['results'][0]['name'], 'Basic Package') 
+
+    def test_list_query_count_does_not_grow_with_rows(self):
+        def grow():
+            for i in range(5):
+                Tariff.objects.create(
+                    name=f'Package {i}',
+                    description='Web design package',
+                    price='1999.99',
+                    features=['Responsive Design']
+                )
+
+        self.assertQueryCountStable(
+            lambda: self.client.get(reverse('tariffs:tariff-list')), grow
+        )
+
+    @query_budget(2)
+    def test_list_query_budget(self):
+        # COUNT(*) and page SELECT; the endpoint is anonymous
+        response = self.client.get(reverse('tariffs:tariff-list'))
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+    @query_budget(1)
+    def test_retrieve_query_budget(self):
+        url = reverse('tariffs:tariff-detail', args=[self.tariff.id])
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+    def test_search_tariffs_in_russian(self):
+        Tariff.objects.create(
+            name='Премиум',
+            description='Расширенный пакет для серьезных проектов',
+            price='69999.00',
+            features=[]
+        )
+        url = reverse('tariffs:tariff-list')
+        response = self.client.get(url, {'search': 'проект'})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual([t['name'] for t in response.data['results']], ['Премиум'])
+
+
+class TariffCacheTests(QueryBudgetMixin, APITestCase):
+    def setUp(self):
+        get_cache().clear()
+        self.tariff = Tariff.objects.create(
+            name='Basic Package',
+            description='Basic web design package',
+            price='999.99',
+            features=['Responsive Design', 'SEO Optimization']
+        )
+        self.url = reverse('tariffs:tariff-list')
+
+    def test_repeat_request_is_served_from_cache(self):
+        first = self.client.get(self.url)
+        with self.assertMaxQueries(0):
+            second = self.client.get(self.url)
+        self.assertEqual(second.status_code, status.HTTP_200_OK)
+        self.assertEqual(second.content, first.content)
+
+    def test_query_strings_are_cached_separately(self):
+        self.client.get(self.url + '?search=basic&ordering=name')
+        response = self.client.get(self.url, {'search': 'premium'})
+        self.assertEqual(len(response.data['results']), 0)
+        with self.assertMaxQueries(0):
+            response = self.client.get(self.url + '?ordering=name&search=basic')
+        self.assertEqual(len(response.data['results']), 1)
+
+    def test_save_invalidates(self):
+        self.client.get(self.url)
+        self.tariff.name = 'Renamed Package'
+        self.tariff.save()
+        response = self.client.get(self.url)
+        self.assertEqual(response.data['results'][0]['name'], 'Renamed Package')
+
+    def test_delete_invalidates(self):
+        detail_url = reverse('tariffs:tariff-detail', args=[self.tariff.id])
+        self.client.get(self.url)
+        self.client.get(detail_url)
+        self.tariff.delete()
+        self.assertEqual(len(self.client.get(self.url).data['results']), 0)
+        self.assertEqual(self.client.get(detail_url).status_code, status.HTTP_404_NOT_FOUND)
+
+    def test_validators(self):
+        response = self.client.get(self.url)
+        self.assertTrue(response['ETag'].startswith('"'))
+        self.assertIn('public', response['Cache-Control'])
+        self.assertGreaterEqual(
+            parse_http_date(response['Last-Modified']),
+            int(self.tariff.updated_at.timestamp())
+        )
+
+    def test_if_none_match(self):
+        etag = self.client.get(self.url)['ETag']
+        with self.assertMaxQueries(0):
+            response = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+        self.assertEqual(response.content, b'')
+        self.assertEqual(response['ETag'], etag)
+
+        self.tariff.price = '1099.99'
+        self.tariff.save()
+        response = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertNotEqual(response['ETag'], etag)
+
+    @override_settings(COMPRESSION_MIN_SIZE=0)
+    def test_if_none_match_compressed(self):
+        # Large and repetitive enough to shrink despite the BREACH padding
+        Tariff.objects.bulk_create(
+            Tariff(name=f'Package {i}', description='Landing page design. ' * 20,
+                   price='999.99', features=[])
+            for i in range(10)
+        )
+        response = self.client.get(self.url, HTTP_ACCEPT_ENCODING='gzip')
+        self.assertEqual(response['Content-Encoding'], 'gzip')
+        etag = response['ETag']
+        self.assertTrue(etag.startswith('W/'))
+        response = self.client.get(self.url, HTTP_ACCEPT_ENCODING='gzip',
+                                   HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+
+    def test_if_modified_since(self):
+        detail_url = reverse('tariffs:tariff-detail', args=[self.tariff.id])
+        last_modified = self.client.get(detail_url)['Last-Modified']
+        response = self.client.get(detail_url, HTTP_IF_MODIFIED_SINCE=last_modified)
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+        earlier = http_date(parse_http_date(last_modified) - 60)
+        response = self.client.get(detail_url, HTTP_IF_MODIFIED_SINCE=earlier)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+    def test_if_modified_since_after_deactivation(self):
+        Tariff.objects.create(name='Premium Package', description='Premium',
+                              price='1999.99', features=[])
+        last_modified = self.client.get(self.url)['Last-Modified']
+        with mock.patch('tariffs.cache.now', return_value=parse_http_date(last_modified) + 5):
+            self.tariff.is_active = False
+            self.tariff.save()
+        response = self.client.get(self.url, HTTP_IF_MODIFIED_SINCE=last_modified)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(len(response.data['results']), 1)
+
+
+class AsyncTariffViewTests(QueryBudgetMixin, APITestCase):
+    def setUp(self):
+        get_cache().clear()
+        self.factory = APIRequestFactory()
+        self.tariff = Tariff.objects.create(
+            name='Basic Package',
+            description='Basic web design package',
+            price='999.99',
+            features=['Responsive Design', 'SEO Optimization']
+        )
+
+    def call(self, view_class, data=None, **kwargs):
+        path = f'/api/v1/tariffs/{kwargs["pk"]}/' if 'pk' in kwargs else '/api/v1/tariffs/'
+        request = self.factory.get(path, data)
+        return async_to_sync(view_class.as_view())(request, **kwargs).render()
+
+    def test_list(self):
+        expected = self.client.get(reverse('tariffs:tariff-list'), {'ordering': 'name'})
+        get_cache().clear()
+        response = self.call(views.AsyncTariffListView, {'ordering': 'name'})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(json.loads(response.content), expected.json())
+        with self.assertMaxQueries(0):
+            cached = self.call(views.AsyncTariffListView, {'ordering': 'name'})
+        self.assertEqual(cached.content, response.content)
+        self.assertEqual(cached['ETag'], response['ETag'])
+
+    def test_detail(self):
+        response = self.call(views.AsyncTariffDetailView, pk=self.tariff.pk)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(json.loads(response.content)['name'], 'Basic Package')
+        response = self.call(views.AsyncTariffDetailView, pk=0)
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+    @override_settings(THROTTLE_RATES={'catalogue': '2/min'})
+    def test_throttled(self):
+        self.assertEqual(self.call(views.AsyncTariffListView).status_code, status.HTTP_200_OK)
+        self.assertEqual(self.call(views.AsyncTariffDetailView, pk=self.tariff.pk).status_code,
+                         status.HTTP_200_OK)
+        response = self.call(views.AsyncTariffListView)
+        self.assertEqual(response.status_code, status.HTTP_429_TOO_MANY_REQUESTS)
+        self.assertIn('Retry-After', response)
+
+
+@override_settings(THROTTLE_RATES={'catalogue': '3/min'})
+class TariffThrottleTests(APITestCase):
+    def setUp(self):
+        get_cache().clear()
+        self.tariff = Tariff.objects.create(name='Basic', description='Basic', price='10.00')
+
+    def test_list_and_detail_share_the_limit(self):
+        list_url = reverse('tariffs:tariff-list')
+        detail_url = reverse('tariffs:tariff-detail', kwargs={'pk': self.tariff.pk})
+        for url in (list_url, detail_url, list_url):
+            self.assertEqual(self.client.get(url).status_code, status.HTTP_200_OK)
+        response = self.client.get(detail_url)
+        self.assertEqual(response.status_code, status.HTTP_429_TOO_MANY_REQUESTS)
+        # Other clients are counted separately
+        response = self.client.get(list_url, REMOTE_ADDR='10.0.0.2')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
@@ -1,9 +1,17 @@
+from django.conf import settings
 from django.urls import path
 from . import views
 
+if settings.ASYNC_VIEWS:
+    TariffListView = views.AsyncTariffListView
+    TariffDetailView = views.AsyncTariffDetailView
+else:
+    TariffListView = views.TariffListView
+    TariffDetailView = views.TariffDetailView
+
 app_name = 'tariffs'
 
 urlpatterns = [
-    path('', views.TariffListView.as_view(), name='tariff-list'),
-    path('<int:pk>/', views.TariffDetailView.as_view(), name='tariff-detail'),
+    path('', TariffListView.as_view(), name='tariff-list'),
+    path('<int:pk>/', TariffDetailView.as_view(), name='tariff-detail'),
 ] 
\ No newline at end of file
@@ -1,5 +1,10 @@
 from rest_framework import generics, permissions
 from django_filters import rest_framework as filters
+from config.asyncviews import AsyncListAPIView, AsyncRetrieveAPIView
+from config.fastserializers import FastListMixin
+from config.routers import ReplicaReadMixin
+from config.throttling import SlidingWindowThrottle
+from .cache import AsyncCachedCatalogueMixin, CachedCatalogueMixin
 from .models import Tariff
 from .serializers import TariffSerializer
 
@@ -13,16 +18,30 @@ class TariffFilter(filters.FilterSet):
         fields = ['is_active', 'min_price', 'max_price']
 
 
-class TariffListView(generics.ListAPIView):
+class TariffListView(CachedCatalogueMixin, FastListMixin, ReplicaReadMixin, generics.ListAPIView):
     queryset = Tariff.objects.filter(is_active=True)
     serializer_class = TariffSerializer
     permission_classes = (permissions.AllowAny,)
+    throttle_classes = (SlidingWindowThrottle,)
+    throttle_scope = 'catalogue'
     filterset_class = TariffFilter
     search_fields = ['name', 'description']
     ordering_fields = ['price', 'name']
 
 
-class TariffDetailView(generics.RetrieveAPIView):
+class TariffDetailView(CachedCatalogueMixin, generics.RetrieveAPIView):
     queryset = Tariff.objects.filter(is_active=True)
     serializer_class = TariffSerializer
-    permission_classes = (permissions.AllowAny,) 
\ No newline at end of file
+    permission_classes = (permissions.AllowAny,)
+    throttle_classes = (SlidingWindowThrottle,)
+    throttle_scope = 'catalogue'
+
+
+# Async variants, routed instead of the views above with ASYNC_VIEWS=True
+
+class AsyncTariffListView(AsyncCachedCatalogueMixin, AsyncListAPIView, TariffListView):
+    pass
+
+
+class AsyncTariffDetailView(AsyncCachedCatalogueMixin, AsyncRetrieveAPIView, TariffDetailView):
+    pass
@@ -1,12 +1,13 @@
 from django.contrib import admin
 from django.contrib.auth import get_user_model
 from django.contrib.auth.admin import UserAdmin as BaseUserAdmin
+from config.softdelete import SoftDeleteAdminMixin
 
 User = get_user_model()
 
 
 @admin.register(User)
-class UserAdmin(BaseUserAdmin):
+class UserAdmin(SoftDeleteAdminMixin, BaseUserAdmin):
     list_display = ('username', 'email', 'first_name', 'last_name',
                    'is_staff', 'is_active', 'is_deleted')
     list_filter = ('is_staff', 'is_active', 'is_deleted', 'date_joined')
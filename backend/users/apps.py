@@ -0,0 +1,13 @@
+from django.apps import AppConfig
+
+
+class UsersConfig(AppConfig):
+    default_auto_field = 'django.db.models.BigAutoField'
+    name = 'users'
+
+    def ready(self):
+        from django.contrib.auth.password_validation import get_default_password_validators
+
+        # Loads CommonPasswordValidator's 20,000 passwords now rather than
+        # in the first registration request
+        get_default_password_validators()
@@ -0,0 +1,60 @@
+from asgiref.sync import sync_to_async
+from django.utils.translation import gettext_lazy as _
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.exceptions import AuthenticationFailed, InvalidToken
+from rest_framework_simplejwt.settings import api_settings
+
+from .models import StatelessUser
+
+
+class StatelessJWTAuthentication(JWTAuthentication):
+    """
+    JWT authentication that trusts the token's user claims.
+
+    Tokens issued by UserRefreshToken carry ``is_staff``, ``is_active`` and
+    ``is_deleted``, which is all most views need, so the user is built from
+    the token without a query. Tokens without those claims fall back to the
+    regular database lookup.
+
+    ``aauthenticate()`` is the same for async views (``config.asyncviews``).
+    """
+
+    def get_user(self, validated_token):
+        if self.has_claims(validated_token):
+            user = self.get_stateless_user(validated_token)
+        else:
+            user = super().get_user(validated_token)
+        return self.check_user(user)
+
+    async def aauthenticate(self, request):
+        header = self.get_header(request)
+        if header is None:
+            return None
+        raw_token = self.get_raw_token(header)
+        if raw_token is None:
+            return None
+        validated_token = self.get_validated_token(raw_token)
+
+        if self.has_claims(validated_token):
+            user = self.get_stateless_user(validated_token)
+        else:
+            user = await sync_to_async(super().get_user)(validated_token)
+        return self.check_user(user), validated_token
+
+    def has_claims(self, validated_token):
+        return all(name in validated_token for name in StatelessUser.CLAIM_FIELDS)
+
+    def get_stateless_user(self, validated_token):
+        try:
+            user_id = validated_token[api_settings.USER_ID_CLAIM]
+        except KeyError:
+            raise InvalidToken(_("Token contained no recognizable user identification"))
+        user = StatelessUser.from_claims(user_id, validated_token)
+        if api_settings.CHECK_USER_IS_ACTIVE and not user.is_active:
+            raise AuthenticationFailed(_("User is inactive"), code="user_inactive")
+        return user
+
+    def check_user(self, user):
+        if user.is_deleted:
+            raise AuthenticationFailed(_("User is deleted"), code="user_deleted")
+        return user
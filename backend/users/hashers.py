@@ -0,0 +1,147 @@
+"""
+Password hashing in a bounded process pool.
+
+PBKDF2 at Django's 1,000,000 iterations costs about half a second of CPU per
+login or registration. Hashed on the request thread, a burst of logins takes
+every worker thread and core, and order traffic queues behind it.
+
+``PooledPBKDF2PasswordHasher`` (first in ``PASSWORD_HASHERS``) sends encode
+and verify to ``PASSWORD_HASHING_WORKERS`` processes running at a lower CPU
+priority (``PASSWORD_HASHING_NICE``). The request thread waits without
+holding the GIL, and at most that many hashes run at once per web process.
+Hashes stay ``pbkdf2_sha256`` as with Django's hasher, so stored passwords
+keep working. ``PASSWORD_HASH_ITERATIONS`` sets the cost per environment;
+Django re-hashes a password at its next login when the count changes. With
+``PASSWORD_HASHING_WORKERS=0`` hashing runs on the calling thread.
+
+``acheck_password()`` and ``amake_password()`` await the pool without
+blocking the event loop.
+"""
+import asyncio
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from multiprocessing import get_context
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.contrib.auth import hashers
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def init_worker(nice):
+    if nice:
+        os.nice(nice)
+
+
+def get_pool():
+    """The hashing pool, started on first use, or None when it is disabled."""
+    global _pool
+    if not settings.PASSWORD_HASHING_WORKERS:
+        return None
+    with _pool_lock:
+        if _pool is None:
+            # Workers are spawned, not forked: the web process has threads,
+            # and the workers only import the hasher.
+            _pool = ProcessPoolExecutor(
+                max_workers=settings.PASSWORD_HASHING_WORKERS,
+                mp_context=get_context('spawn'),
+                initializer=init_worker,
+                initargs=(settings.PASSWORD_HASHING_NICE,),
+            )
+        return _pool
+
+
+def shutdown_pool():
+    global _pool
+    with _pool_lock:
+        pool, _pool = _pool, None
+    if pool is not None:
+        pool.shutdown()
+
+
+class PooledPBKDF2PasswordHasher(hashers.PBKDF2PasswordHasher):
+    @property
+    def iterations(self):
+        return settings.PASSWORD_HASH_ITERATIONS
+
+    def worker_call(self, method):
+        # Django's hasher does the work, so the workers never come back here
+        hasher = hashers.PBKDF2PasswordHasher()
+        hasher.iterations = self.iterations
+        return getattr(hasher, method)
+
+    def run(self, method, *args):
+        call = self.worker_call(method)
+        pool = get_pool()
+        if pool is None:
+            return call(*args)
+        try:
+            return pool.submit(call, *args).result()
+        except BrokenProcessPool:
+            # A worker died (e.g. killed for memory); start a new pool once
+            shutdown_pool()
+            return get_pool().submit(call, *args).result()
+
+    async def arun(self, method, *args):
+        call = self.worker_call(method)
+        pool = get_pool()
+        if pool is None:
+            return await sync_to_async(call, thread_sensitive=False)(*args)
+        return await asyncio.wrap_future(pool.submit(call, *args))
+
+    def encode(self, password, salt, iterations=None):
+        return self.run('encode', password, salt, iterations or self.iterations)
+
+    def verify(self, password, encoded):
+        return self.run('verify', password, encoded)
+
+    async def aencode(self, password, salt, iterations=None):
+        return await self.arun('encode', password, salt, iterations or self.iterations)
+
+    async def averify(self, password, encoded):
+        return await self.arun('verify', password, encoded)
+
+    async def aharden_runtime(self, password, encoded):
+        decoded = self.decode(encoded)
+        extra_iterations = self.iterations - decoded['iterations']
+        if extra_iterations > 0:
+            await self.aencode(password, decoded['salt'], extra_iterations)
+
+
+async def acheck_password(password, encoded, setter=None, preferred='default'):
+    """
+    ``django.contrib.auth.hashers.acheck_password()``, which hashes on the
+    event loop's thread, awaiting the pool instead.
+    """
+    try:
+        hasher = hashers.identify_hasher(encoded)
+    except ValueError:
+        hasher = None
+    if (password is None or not hashers.is_password_usable(encoded)
+            or not isinstance(hasher, PooledPBKDF2PasswordHasher)):
+        # Unusable and legacy passwords: Django's own checks, on a thread
+        is_correct, must_update = await sync_to_async(
+            hashers.verify_password, thread_sensitive=False)(password, encoded, preferred)
+    else:
+        preferred_hasher = hashers.get_hasher(preferred)
+        hasher_changed = hasher.algorithm != preferred_hasher.algorithm
+        must_update = hasher_changed or preferred_hasher.must_update(encoded)
+        is_correct = await hasher.averify(password, encoded)
+        if not is_correct and not hasher_changed and must_update:
+            await hasher.aharden_runtime(password, encoded)
+    if setter and is_correct and must_update:
+        await setter(password)
+    return is_correct
+
+
+async def amake_password(password, salt=None, hasher='default'):
+    """``make_password()`` awaiting the pool."""
+    hasher = hashers.get_hasher(hasher)
+    if password is None or not isinstance(hasher, PooledPBKDF2PasswordHasher):
+        return await sync_to_async(hashers.make_password, thread_sensitive=False)(
+            password, salt, hasher)
+    return await hasher.aencode(password, salt or hasher.salt())
@@ -22,9 +22,9 @@ class Command(BaseCommand):
     def handle(self, *args, **options):
         if options['clear']:
             self.stdout.write('Clearing existing data...')
-            Order.objects.all().delete()
+            Order.objects.all_with_deleted().delete()
             Tariff.objects.all().delete()
-            User.objects.filter(is_superuser=False).delete()
+            User.objects.all_with_deleted().filter(is_superuser=False).delete()
             self.stdout.write(self.style.SUCCESS('Existing data cleared.'))
 
         # Create tariffs
@@ -130,7 +130,7 @@ class Command(BaseCommand):
         self.created_users = []
         for user_data in users_data:
             password = user_data.pop('password')
-            user, created = User.objects.get_or_create(
+            user, created = User.objects.all_with_deleted().get_or_create(
                 username=user_data['username'],
                 defaults=user_data
             )
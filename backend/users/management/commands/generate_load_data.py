@@ -0,0 +1,291 @@
+import multiprocessing
+import random
+import time
+from contextlib import contextmanager
+from datetime import timedelta
+
+from django.contrib.auth import get_user_model
+from django.contrib.auth.hashers import make_password
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections, transaction
+from django.utils import timezone
+
+from config import search
+from orders import analytics
+from orders.models import Order
+from tariffs.models import Tariff
+
+User = get_user_model()
+
+PROJECT_NAMES = [
+    'Корпоративный сайт', 'Интернет-магазин одежды', 'Лендинг IT-услуг',
+    'Портфолио дизайнера', 'Сайт ресторана', 'Сайт стоматологии',
+    'Каталог мебели', 'Блог о путешествиях', 'Онлайн-школа', 'Сайт автосервиса',
+]
+WORDS = (
+    'сайт компании каталог товаров интернет магазин одежды заказов доставка '
+    'оплата онлайн адаптивный дизайн меню бронирование столиков галерея работ '
+    'блог новости отзывы клиентов форма обратной связи интеграция CRM 1С '
+    'аналитика отчеты анимации личный кабинет корзина поиск фильтры'
+).split()
+FIRST_NAMES = ['Иван', 'Мария', 'Александр', 'Анна', 'Дмитрий', 'Елена', 'Сергей', 'Ольга']
+LAST_NAMES = ['Петров', 'Сидорова', 'Козлов', 'Иванова', 'Смирнов', 'Кузнецова']
+
+# Options the order generator reads; the rest (stdout and friends) is not
+# picklable and stays in the parent process.
+GENERATOR_OPTIONS = (
+    'seed', 'batch_size', 'status_weights', 'days', 'created_at_distribution',
+    'deadline_days', 'no_deadline_ratio', 'description_words',
+    'requirements_words', 'deleted_ratio',
+)
+
+# Filled in each worker process by _init_worker()
+_state = {}
+
+
+@contextmanager
+def explicit_timestamps(model, *field_names):
+    # auto_now/auto_now_add overwrite whatever is set on the instance, which
+    # would give every generated row the same created_at.
+    fields = [model._meta.get_field(name) for name in field_names]
+    saved = [(field.auto_now, field.auto_now_add) for field in fields]
+    for field in fields:
+        field.auto_now = field.auto_now_add = False
+    try:
+        yield
+    finally:
+        for field, (auto_now, auto_now_add) in zip(fields, saved):
+            field.auto_now, field.auto_now_add = auto_now, auto_now_add
+
+
+def parse_range(value):
+    try:
+        low, _, high = value.partition(':')
+        low, high = int(low), int(high or low)
+    except ValueError:
+        raise CommandError(f'Expected MIN:MAX, got {value!r}')
+    if low < 0 or high < low:
+        raise CommandError(f'Invalid range {value!r}')
+    return low, high
+
+
+def parse_weights(value):
+    weights = {}
+    for item in value.split(','):
+        name, _, weight = item.partition('=')
+        name = name.strip().upper()
+        if name not in Order.Status.values:
+            raise CommandError(f'Unknown order status {name!r}')
+        try:
+            weights[name] = float(weight)
+        except ValueError:
+            raise CommandError(f'Invalid weight for {name}: {weight!r}')
+    return weights
+
+
+def random_text(rng, low, high):
+    return ' '.join(rng.choices(WORDS, k=rng.randint(low, high))).capitalize()
+
+
+def build_orders(rng, count, options, user_ids, tariffs, now):
+    statuses, weights = zip(*options['status_weights'].items())
+    days = options['days']
+    deadline_low, deadline_high = options['deadline_days']
+    orders = []
+    for status in rng.choices(statuses, weights, k=count):
+        if options['created_at_distribution'] == 'recent':
+            # Exponential with a quarter of the span as the mean: most orders
+            # are recent, like a growing business.
+            age = min(rng.expovariate(4 / days), days) if days else 0
+        else:
+            age = rng.uniform(0, days)
+        created_at = now - timedelta(days=age)
+        deadline = None
+        if rng.random() >= options['no_deadline_ratio']:
+            deadline = created_at.date() + timedelta(days=rng.randint(deadline_low, deadline_high))
+        tariff_id, price = rng.choice(tariffs)
+        orders.append(Order(
+            user_id=rng.choice(user_ids),
+            tariff_id=tariff_id,
+            status=status,
+            project_name=rng.choice(PROJECT_NAMES),
+            project_description=random_text(rng, *options['description_words']),
+            requirements=random_text(rng, *options['requirements_words']),
+            deadline=deadline,
+            total_price=price,
+            is_deleted=rng.random() < options['deleted_ratio'],
+            created_at=created_at,
+            updated_at=created_at,
+        ))
+    return orders
+
+
+def insert_orders(task):
+    index, count = task
+    options = _state['options']
+    rng = random.Random(options['seed'] * 1_000_003 + index)
+    orders = build_orders(rng, count, options, _state['user_ids'],
+                          _state['tariffs'], _state['now'])
+    with transaction.atomic(), explicit_timestamps(Order, 'created_at', 'updated_at'):
+        Order.objects.bulk_create(orders, batch_size=options['batch_size'])
+    return count
+
+
+def _init_worker(databases, options, user_ids, tariffs, now):
+    import django
+    from django.apps import apps
+    from django.conf import settings
+
+    if not apps.ready:
+        # Spawned (not forked) workers start from scratch.
+        settings.DATABASES = databases
+        django.setup()
+    _state.update(options=options, user_ids=user_ids, tariffs=tariffs, now=now)
+
+
+class Command(BaseCommand):
+    help = 'Generate a large synthetic dataset of users and orders for load testing'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=10000,
+                            help='Number of synthetic users to create')
+        parser.add_argument('--orders', type=int, default=1000000,
+                            help='Number of orders to create')
+        parser.add_argument('--batch-size', type=int, default=5000,
+                            help='Rows per bulk_create batch and transaction')
+        parser.add_argument('--workers', type=int, default=1,
+                            help='Processes inserting orders in parallel')
+        parser.add_argument('--seed', type=int, default=42,
+                            help='Random seed, the same seed produces the same data')
+        parser.add_argument('--status-weights',
+                            default='NEW=30,IN_PROGRESS=25,COMPLETED=40,CANCELLED=5',
+                            help='Relative status frequencies, e.g. NEW=30,COMPLETED=70')
+        parser.add_argument('--days', type=int, default=3 * 365,
+                            help='Spread created_at over this many days before now')
+        parser.add_argument('--created-at-distribution', choices=('uniform', 'recent'),
+                            default='recent')
+        parser.add_argument('--deadline-days', default='7:180',
+                            help='Deadline offset from created_at in days, MIN:MAX')
+        parser.add_argument('--no-deadline-ratio', type=float, default=0.1,
+                            help='Share of orders without a deadline')
+        parser.add_argument('--description-words', default='8:60',
+                            help='Project description length in words, MIN:MAX')
+        parser.add_argument('--requirements-words', default='4:20',
+                            help='Requirements length in words, MIN:MAX')
+        parser.add_argument('--deleted-ratio', type=float, default=0.02,
+                            help='Share of soft-deleted orders')
+        parser.add_argument('--password', default='loadtest123',
+                            help='Password shared by all synthetic users')
+        parser.add_argument('--skip-search-index', action='store_true',
+                            help='Do not rebuild the search index afterwards')
+
+    def handle(self, *args, **options):
+        if options['batch_size'] < 1 or options['workers'] < 1:
+            raise CommandError('--batch-size and --workers must be positive')
+        options['status_weights'] = parse_weights(options['status_weights'])
+        options['deadline_days'] = parse_range(options['deadline_days'])
+        options['description_words'] = parse_range(options['description_words'])
+        options['requirements_words'] = parse_range(options['requirements_words'])
+
+        tariffs = list(Tariff.objects.values_list('id', 'price'))
+        if not tariffs:
+            raise CommandError('No tariffs found, run create_mock_data first.')
+
+        self.create_users(options)
+        # Orders are spread over every customer, not only the new ones.
+        user_ids = list(User.objects.filter(is_staff=False).values_list('id', flat=True))
+        if not user_ids and options['orders']:
+            raise CommandError('No users to assign orders to.')
+
+        if options['orders']:
+            self.create_orders(options, user_ids, tariffs)
+            if not options['skip_search_index']:
+                self.rebuild_search_index()
+            self.rebuild_order_stats()
+
+        self.stdout.write(self.style.SUCCESS('Load data generated successfully!'))
+
+    def report(self, label, count, started):
+        elapsed = time.perf_counter() - started
+        rate = count / elapsed if elapsed else 0
+        self.stdout.write(f'  {label}: {count} rows in {elapsed:.1f}s ({rate:,.0f} rows/s)')
+
+    def create_users(self, options):
+        total = options['users']
+        if not total:
+            return
+        self.stdout.write(f'Creating {total} users...')
+        started = time.perf_counter()
+        # Hashing is deliberately slow; one hash shared by every user keeps
+        # generation I/O-bound.
+        password = make_password(options['password'])
+        run = format(int(time.time() * 1000), 'x')
+        rng = random.Random(options['seed'])
+        for offset in range(0, total, options['batch_size']):
+            users = [
+                User(
+                    username=f'load-{run}-{i}@example.com',
+                    email=f'load-{run}-{i}@example.com',
+                    first_name=rng.choice(FIRST_NAMES),
+                    last_name=rng.choice(LAST_NAMES),
+                    password=password,
+                )
+                for i in range(offset, min(offset + options['batch_size'], total))
+            ]
+            with transaction.atomic():
+                User.objects.bulk_create(users)
+        self.report('users', total, started)
+
+    def create_orders(self, options, user_ids, tariffs):
+        total = options['orders']
+        batch_size = options['batch_size']
+        tasks = [(index, min(batch_size, total - offset))
+                 for index, offset in enumerate(range(0, total, batch_size))]
+        generator_options = {name: options[name] for name in GENERATOR_OPTIONS}
+        worker_state = (generator_options, user_ids, tariffs, timezone.now())
+        self.stdout.write(f'Creating {total} orders with {options["workers"]} worker(s)...')
+        started = time.perf_counter()
+        done = 0
+
+        if options['workers'] == 1:
+            _init_worker(None, *worker_state)
+            results = map(insert_orders, tasks)
+            pool = None
+        else:
+            # Children must not share the parent's database connections.
+            connections.close_all()
+            method = 'fork' if 'fork' in multiprocessing.get_all_start_methods() else 'spawn'
+            pool = multiprocessing.get_context(method).Pool(
+                options['workers'], initializer=_init_worker,
+                initargs=(connections.settings, *worker_state),
+            )
+            results = pool.imap_unordered(insert_orders, tasks)
+
+        try:
+            for count in results:
+                done += count
+                elapsed = time.perf_counter() - started
+                self.stdout.write(f'\r  {done}/{total} orders ({done / elapsed:,.0f} rows/s)',
+                                  ending='')
+                self.stdout.flush()
+        finally:
+            if pool is not None:
+                pool.close()
+                pool.join()
+        self.stdout.write('')
+        self.report('orders', total, started)
+
+    def rebuild_search_index(self):
+        # bulk_create() does not send the signals that maintain the index.
+        index = search.get_index(Order)
+        if index is None:
+            return
+        started = time.perf_counter()
+        index.rebuild()
+        self.stdout.write(f'  search index rebuilt in {time.perf_counter() - started:.1f}s')
+
+    def rebuild_order_stats(self):
+        # Recounting every bucket in one pass beats one upsert per batch.
+        started = time.perf_counter()
+        analytics.rebuild()
+        self.stdout.write(f'  order stats rebuilt in {time.perf_counter() - started:.1f}s')
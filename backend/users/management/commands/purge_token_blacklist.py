@@ -0,0 +1,21 @@
+import time
+
+from django.core.management.base import BaseCommand
+from users.tokens import purge_blacklist
+
+
+class Command(BaseCommand):
+    help = 'Delete expired refresh tokens from the blacklist, in batches'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=None,
+                            help='Rows per DELETE (default: TOKEN_BLACKLIST_PURGE_BATCH)')
+
+    def handle(self, *args, **options):
+        started = time.perf_counter()
+        total = 0
+        while deleted := purge_blacklist(options['batch_size']):
+            total += deleted
+        self.stdout.write(self.style.SUCCESS(
+            f'Purged {total} expired tokens in {time.perf_counter() - started:.1f}s.'
+        ))
@@ -0,0 +1,24 @@
+# Generated by Django 5.2.18 on 2026-10-18 20:21
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('users', '0002_statelessuser'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='BlacklistedToken',
+            fields=[
+                ('jti', models.UUIDField(primary_key=True, serialize=False)),
+                ('expires', models.BigIntegerField(db_index=True)),
+            ],
+            options={
+                'verbose_name': 'Blacklisted token',
+                'verbose_name_plural': 'Blacklisted tokens',
+            },
+        ),
+    ]
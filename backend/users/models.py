@@ -1,5 +1,10 @@
-from django.contrib.auth.models import AbstractUser
-from django.db import models
+from django.contrib.auth.models import AbstractUser, UserManager as BaseUserManager
+from django.db import DEFAULT_DB_ALIAS, models
+from config.softdelete import SoftDeleteManager
+
+
+class UserManager(SoftDeleteManager, BaseUserManager):
+    pass
 
 
 class User(AbstractUser):
@@ -9,6 +14,8 @@ class User(AbstractUser):
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
+    objects = UserManager()
+
     class Meta:
         verbose_name = 'User'
         verbose_name_plural = 'Users'
@@ -19,8 +26,67 @@ class User(AbstractUser):
 
     def soft_delete(self):
         self.is_deleted = True
-        self.save()
+        self.save(update_fields=['is_deleted', 'updated_at'])
 
     def restore(self):
         self.is_deleted = False
-        self.save() 
\ No newline at end of file
+        self.save(update_fields=['is_deleted', 'updated_at'])
+
+
+class StatelessUser(User):
+    """
+    A user built from access-token claims without a database query.
+
+    Only ``id`` and the claim fields are set; the first access to any other
+    field loads the rest of the row in a single query.
+    """
+
+    CLAIM_FIELDS = ('is_staff', 'is_active', 'is_deleted')
+
+    class Meta:
+        proxy = True
+
+    @classmethod
+    def from_claims(cls, user_id, claims, using=DEFAULT_DB_ALIAS):
+        user_id = cls._meta.pk.to_python(user_id)
+        user = cls.from_db(using, ['id', *cls.CLAIM_FIELDS],
+                           [user_id, *(claims[name] for name in cls.CLAIM_FIELDS)])
+        user._claims = {name: claims[name] for name in cls.CLAIM_FIELDS}
+        return user
+
+    def refresh_from_db(self, using=None, fields=None, from_queryset=None):
+        deferred = self.get_deferred_fields()
+        if fields is not None and deferred and set(fields) <= deferred:
+            fields = deferred
+        super().refresh_from_db(using, fields, from_queryset)
+
+    def save(self, *args, **kwargs):
+        # Claims may be stale, so they are written back only when changed,
+        # and columns that were never loaded are left alone.
+        if kwargs.get('update_fields') is None:
+            deferred = self.get_deferred_fields()
+            kwargs['update_fields'] = [
+                field.attname for field in self._meta.concrete_fields
+                if not field.primary_key
+                and (field.attname not in deferred or getattr(field, 'auto_now', False))
+                and not (field.attname in self._claims
+                         and getattr(self, field.attname) == self._claims[field.attname])
+            ]
+        super().save(*args, **kwargs)
+
+
+class BlacklistedToken(models.Model):
+    """
+    A rotated refresh token that may not be used again, kept until it expires.
+
+    Only the ``jti`` and ``exp`` claims are stored; simplejwt's token_blacklist
+    app keeps a row with the whole token for every token ever issued.
+    """
+
+    jti = models.UUIDField(primary_key=True)
+    # The exp claim, in seconds since the epoch
+    expires = models.BigIntegerField(db_index=True)
+
+    class Meta:
+        verbose_name = 'Blacklisted token'
+        verbose_name_plural = 'Blacklisted tokens'
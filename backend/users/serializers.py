@@ -1,11 +1,26 @@
 from rest_framework import serializers
 from django.contrib.auth import get_user_model
 from django.contrib.auth.password_validation import validate_password
+from django.contrib.auth.validators import UnicodeUsernameValidator
+from rest_framework.validators import UniqueValidator
+from rest_framework_simplejwt.exceptions import AuthenticationFailed
+from rest_framework_simplejwt.serializers import TokenObtainPairSerializer, TokenRefreshSerializer
+from rest_framework_simplejwt.settings import api_settings
+from .tokens import UserRefreshToken
 
 User = get_user_model()
 
 
 class UserRegistrationSerializer(serializers.ModelSerializer):
+    # Deleted users keep their username
+    username = serializers.CharField(
+        max_length=150,
+        validators=[
+            UnicodeUsernameValidator(),
+            UniqueValidator(User.objects.all_with_deleted(),
+                            message=User._meta.get_field('username').error_messages['unique']),
+        ],
+    )
     password = serializers.CharField(write_only=True, required=True, validators=[validate_password])
     password2 = serializers.CharField(write_only=True, required=True)
 
@@ -44,6 +59,40 @@ class UserUpdateSerializer(serializers.ModelSerializer):
 
     def validate_email(self, value):
         user = self.context['request'].user
-        if User.objects.exclude(pk=user.pk).filter(email=value).exists():
+        if User.objects.all_with_deleted().exclude(pk=user.pk).filter(email=value).exists():
             raise serializers.ValidationError("This email is already in use.")
-        return value 
\ No newline at end of file
+        return value 
+
+
+class UserTokenObtainPairSerializer(TokenObtainPairSerializer):
+    token_class = UserRefreshToken
+
+
+class UserTokenRefreshSerializer(TokenRefreshSerializer):
+    token_class = UserRefreshToken
+
+    def validate(self, attrs):
+        # TokenRefreshSerializer.validate, with the claims taken from the
+        # user row rather than copied from the old token: rotation renews
+        # the token's expiry, so copied claims would never catch up.
+        refresh = self.token_class(attrs['refresh'])
+        try:
+            user = User.objects.get(
+                **{api_settings.USER_ID_FIELD: refresh[api_settings.USER_ID_CLAIM]})
+        except (KeyError, User.DoesNotExist):
+            # Deleted since the token was issued
+            raise AuthenticationFailed(self.error_messages['no_active_account'],
+                                       'no_active_account')
+        if not api_settings.USER_AUTHENTICATION_RULE(user):
+            raise AuthenticationFailed(self.error_messages['no_active_account'],
+                                       'no_active_account')
+        refresh.set_user_claims(user)
+        data = {'access': str(refresh.access_token)}
+        if api_settings.ROTATE_REFRESH_TOKENS:
+            if api_settings.BLACKLIST_AFTER_ROTATION:
+                refresh.blacklist()
+            refresh.set_jti()
+            refresh.set_exp()
+            refresh.set_iat()
+            data['refresh'] = str(refresh)
+        return data
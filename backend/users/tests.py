@@ -1,14 +1,34 @@
-from django.test import TestCase
+import tempfile
+import threading
+import time
+import uuid
+from io import StringIO
+from pathlib import Path
+
+from asgiref.sync import async_to_sync
+from django.contrib.auth.hashers import check_password, make_password
+from django.core.cache import cache
+from django.core.management import CommandError, call_command
+from django.test import TestCase, override_settings
+from django.utils import timezone
 from django.urls import reverse
 from rest_framework import status
 from rest_framework.test import APITestCase
 from django.contrib.auth import get_user_model
-from rest_framework_simplejwt.tokens import RefreshToken
+from rest_framework_simplejwt.exceptions import TokenError
+from rest_framework_simplejwt.tokens import AccessToken, RefreshToken
+from config import search, throttling
+from users import hashers
+from users.models import BlacklistedToken
+from users.tokens import UserRefreshToken, purge_blacklist
+from config.testing import QueryBudgetMixin
+from orders.models import Order
+from tariffs.models import Tariff
 
 User = get_user_model()
 
 
-class UserTests(APITestCase):
+class UserTests(QueryBudgetMixin, APITestCase):
     def setUp(self):
         self.user_data = {
             'username': 'testuser',
@@ -41,6 +61,13 @@ class UserTests(APITestCase):
         self.assertEqual(User.objects.count(), 2)
         self.assertEqual(User.objects.latest('id').username, 'testuser')
 
+    def test_registration_keeps_deleted_usernames(self):
+        self.user.soft_delete()
+        response = self.client.post(reverse('users:register'),
+                                    {**self.user_data, 'username': 'existinguser'}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn('username', response.data)
+
     def test_user_login(self):
         url = reverse('users:token_obtain_pair')
         response = self.client.post(url, {
@@ -81,4 +108,399 @@ class UserTests(APITestCase):
         response = self.client.delete(url)
         self.assertEqual(response.status_code, status.HTTP_204_NO_CONTENT)
         self.user.refresh_from_db()
-        self.assertTrue(self.user.is_deleted) 
\ No newline at end of file
+        self.assertTrue(self.user.is_deleted) 
+
+    def test_user_detail_query_budget(self):
+        tokens = self.get_tokens_for_user(self.user)
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {tokens["access"]}')
+        url = reverse('users:user-detail')
+        # user lookup only
+        with self.assertMaxQueries(1):
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+    def test_user_update_query_budget(self):
+        tokens = self.get_tokens_for_user(self.user)
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {tokens["access"]}')
+        url = reverse('users:user-update')
+        # user lookup, email uniqueness check, UPDATE
+        with self.assertMaxQueries(3):
+            response = self.client.patch(url, {'email': 'new@example.com'}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+
+class StatelessAuthenticationTests(QueryBudgetMixin, APITestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(
+            username='existinguser',
+            password='existingpass123',
+            email='existing@example.com',
+            first_name='Existing'
+        )
+
+    def login(self):
+        url = reverse('users:token_obtain_pair')
+        response = self.client.post(url, {
+            'username': 'existinguser',
+            'password': 'existingpass123'
+        }, format='json')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return response.data
+
+    def authenticate(self, access):
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {access}')
+
+    def test_login_embeds_claims(self):
+        access = AccessToken(self.login()['access'])
+        self.assertEqual(str(access['user_id']), str(self.user.id))
+        self.assertFalse(access['is_staff'])
+        self.assertTrue(access['is_active'])
+        self.assertFalse(access['is_deleted'])
+
+    def test_refresh_keeps_claims(self):
+        url = reverse('users:token_refresh')
+        response = self.client.post(url, {'refresh': self.login()['refresh']}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertIn('is_staff', AccessToken(response.data['access']))
+
+    def test_refresh_reads_claims_from_database(self):
+        self.user.is_staff = True
+        self.user.save()
+        refresh = self.login()['refresh']
+        self.user.is_staff = False
+        self.user.save()
+        response = self.client.post(reverse('users:token_refresh'), {'refresh': refresh},
+                                    format='json')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertFalse(AccessToken(response.data['access'])['is_staff'])
+        self.assertFalse(RefreshToken(response.data['refresh'])['is_staff'])
+
+    def test_owner_can_retrieve_order(self):
+        tariff = Tariff.objects.create(name='Basic', description='Basic', price='10.00')
+        order = Order.objects.create(user=self.user, tariff=tariff, project_name='Site',
+                                     project_description='Site', requirements='None',
+                                     total_price=tariff.price)
+        self.authenticate(self.login()['access'])
+        response = self.client.get(reverse('orders:order-detail', args=[order.id]))
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+    def test_order_list_skips_user_lookup(self):
+        self.authenticate(self.login()['access'])
+        # COUNT(*) and page SELECT only
+        with self.assertMaxQueries(2):
+            response = self.client.get(reverse('orders:order-list-create'))
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+    def test_user_detail_loads_row_once(self):
+        self.authenticate(self.login()['access'])
+        with self.assertMaxQueries(1):
+            response = self.client.get(reverse('users:user-detail'))
+        self.assertEqual(response.data['username'], 'existinguser')
+        self.assertEqual(response.data['first_name'], 'Existing')
+        self.assertEqual(response.data['email'], 'existing@example.com')
+
+    def test_user_detail_etag(self):
+        self.authenticate(self.login()['access'])
+        url = reverse('users:user-detail')
+        etag = self.client.get(url)['ETag']
+        with self.assertMaxQueries(1):
+            response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+
+        # A session login (e.g. the admin) only saves last_login
+        self.user.last_login = timezone.now()
+        self.user.save(update_fields=['last_login'])
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        etag = response['ETag']
+        self.client.patch(reverse('users:user-update'), {'first_name': 'Changed'},
+                          format='json')
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['first_name'], 'Changed')
+
+    def test_update_does_not_write_stale_claims(self):
+        self.authenticate(self.login()['access'])
+        User.objects.filter(pk=self.user.pk).update(is_staff=True)
+        updated_at = User.objects.get(pk=self.user.pk).updated_at
+        response = self.client.patch(reverse('users:user-update'),
+                                     {'phone': '9876543210'}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.user.refresh_from_db()
+        self.assertTrue(self.user.is_staff)
+        self.assertEqual(self.user.phone, '9876543210')
+        self.assertEqual(self.user.first_name, 'Existing')
+        self.assertGreater(self.user.updated_at, updated_at)
+
+    def test_delete_marks_user_deleted(self):
+        self.authenticate(self.login()['access'])
+        response = self.client.delete(reverse('users:user-delete'))
+        self.assertEqual(response.status_code, status.HTTP_204_NO_CONTENT)
+        self.user.refresh_from_db()
+        self.assertTrue(self.user.is_deleted)
+        self.assertEqual(self.user.first_name, 'Existing')
+
+    def test_deleted_user_is_rejected(self):
+        self.user.soft_delete()
+        response = self.client.post(reverse('users:token_obtain_pair'), {
+            'username': 'existinguser',
+            'password': 'existingpass123'
+        }, format='json')
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+        self.authenticate(str(UserRefreshToken.for_user(self.user).access_token))
+        response = self.client.get(reverse('users:user-detail'))
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+
+    def test_token_without_claims_falls_back_to_lookup(self):
+        self.authenticate(str(RefreshToken.for_user(self.user).access_token))
+        # user lookup, COUNT(*), page SELECT
+        with self.assertMaxQueries(3):
+            response = self.client.get(reverse('orders:order-list-create'))
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+
+class TokenBlacklistTests(APITestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username='existinguser', password='existingpass123')
+
+    def refresh(self, token):
+        return self.client.post(reverse('users:token_refresh'), {'refresh': str(token)},
+                                format='json')
+
+    def blacklist(self, count, expires):
+        BlacklistedToken.objects.bulk_create(
+            BlacklistedToken(jti=uuid.uuid4(), expires=expires) for _ in range(count))
+
+    def test_rotated_token_is_rejected(self):
+        token = UserRefreshToken.for_user(self.user)
+        response = self.refresh(token)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(BlacklistedToken.objects.get().expires, token['exp'])
+        self.assertEqual(self.refresh(token).status_code, status.HTTP_401_UNAUTHORIZED)
+        self.assertEqual(self.refresh(response.data['refresh']).status_code,
+                         status.HTTP_200_OK)
+
+    def test_deleted_user_cannot_refresh(self):
+        token = UserRefreshToken.for_user(self.user)
+        self.user.soft_delete()
+        self.assertEqual(self.refresh(token).status_code, status.HTTP_401_UNAUTHORIZED)
+
+    def test_concurrent_rotation(self):
+        # Both refreshes pass the check before either one blacklists
+        token = UserRefreshToken.for_user(self.user)
+        UserRefreshToken(str(token)).blacklist()
+        with self.assertRaises(TokenError):
+            UserRefreshToken(str(token), verify=False).blacklist()
+
+    def test_purge(self):
+        now = int(time.time())
+        self.blacklist(5, now - 1)
+        self.blacklist(2, now + 60)
+        self.assertEqual(purge_blacklist(3), 3)
+        self.assertEqual(purge_blacklist(3), 2)
+        self.assertEqual(purge_blacklist(3), 0)
+        self.assertEqual(BlacklistedToken.objects.count(), 2)
+
+    @override_settings(TOKEN_BLACKLIST_PURGE_INTERVAL=1)
+    def test_blacklisting_purges(self):
+        self.blacklist(3, int(time.time()) - 1)
+        self.assertEqual(self.refresh(UserRefreshToken.for_user(self.user)).status_code,
+                         status.HTTP_200_OK)
+        self.assertEqual(BlacklistedToken.objects.count(), 1)
+
+    def test_command(self):
+        self.blacklist(5, int(time.time()) - 1)
+        stdout = StringIO()
+        call_command('purge_token_blacklist', batch_size=2, stdout=stdout)
+        self.assertIn('Purged 5 expired tokens', stdout.getvalue())
+        self.assertFalse(BlacklistedToken.objects.exists())
+
+
+class ThrottleTests(APITestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(username='existinguser', password='existingpass123')
+
+    def login(self, username='existinguser', password='wrong', address='127.0.0.1'):
+        return self.client.post(reverse('users:token_obtain_pair'),
+                                {'username': username, 'password': password},
+                                format='json', REMOTE_ADDR=address)
+
+    def throttle(self, now, scope='login'):
+        throttle = throttling.SlidingWindowThrottle()
+        throttle.timer = lambda: now
+        request = self.client_class().get('/').wsgi_request
+        view = type('View', (), {'throttle_scope': scope})()
+        return throttle, lambda: throttle.allow_request(request, view)
+
+    @override_settings(THROTTLE_RATES={'login': '3/min'})
+    def test_login_limited_per_address(self):
+        for _ in range(3):
+            self.assertEqual(self.login().status_code, status.HTTP_401_UNAUTHORIZED)
+        response = self.login(password='existingpass123')
+        self.assertEqual(response.status_code, status.HTTP_429_TOO_MANY_REQUESTS)
+        self.assertGreater(int(response['Retry-After']), 0)
+        self.assertEqual(self.login(address='10.0.0.2').status_code,
+                         status.HTTP_401_UNAUTHORIZED)
+
+    @override_settings(THROTTLE_RATES={'login_account': '2/min'})
+    def test_login_limited_per_account(self):
+        self.login(address='10.0.0.1')
+        self.login(username='EXISTINGUSER ', address='10.0.0.2')
+        self.assertEqual(self.login(address='10.0.0.3').status_code,
+                         status.HTTP_429_TOO_MANY_REQUESTS)
+        self.assertEqual(self.login(username='other', address='10.0.0.3').status_code,
+                         status.HTTP_401_UNAUTHORIZED)
+
+    @override_settings(THROTTLE_RATES={'register': '1/hour'})
+    def test_register_limited(self):
+        url = reverse('users:register')
+        self.assertEqual(self.client.post(url, {}, format='json').status_code,
+                         status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(self.client.post(url, {}, format='json').status_code,
+                         status.HTTP_429_TOO_MANY_REQUESTS)
+
+    @override_settings(THROTTLE_RATES={'login': ''})
+    def test_empty_rate_disables_limit(self):
+        for _ in range(5):
+            self.assertEqual(self.login().status_code, status.HTTP_401_UNAUTHORIZED)
+
+    @override_settings(THROTTLE_RATES={'login': '4/min'})
+    def test_window_slides(self):
+        for _ in range(4):
+            self.assertTrue(self.throttle(600)[1]())
+        throttle, allow = self.throttle(659)
+        self.assertFalse(allow())
+        self.assertAlmostEqual(throttle.wait(), 1 + 60 * 0.4)
+        # Half way through the next window half of the previous one counts
+        self.assertTrue(self.throttle(690)[1]())
+        throttle, allow = self.throttle(690)
+        self.assertFalse(allow())
+        self.assertAlmostEqual(throttle.wait(), 60 * 0.8 - 30)
+        self.assertTrue(self.throttle(720)[1]())
+
+    def test_sqlite_store_is_shared(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        store = throttling.SQLiteCounterStore(str(Path(directory.name) / 'counters.sqlite3'))
+
+        def hit():
+            for _ in range(50):
+                store.hit('key', 'previous', 60)
+        threads = [threading.Thread(target=hit) for _ in range(4)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(store.hit('key', 'previous', 60), (201, 0))
+        self.assertEqual(store.hit('next', 'key', 60), (1, 201))
+        # Expired counters are dropped when a new window starts
+        store.hit('old', 'none', -1)
+        store.hit('new', 'none', 60)
+        self.assertEqual(store.hit('old', 'none', 60), (1, 0))
+
+    def test_sqlite_store_setting(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        path = Path(directory.name) / 'counters.sqlite3'
+        with override_settings(THROTTLE_STORE='sqlite', THROTTLE_SQLITE_PATH=path,
+                               THROTTLE_RATES={'login': '1/min'}):
+            self.assertEqual(self.login().status_code, status.HTTP_401_UNAUTHORIZED)
+            self.assertEqual(self.login().status_code, status.HTTP_429_TOO_MANY_REQUESTS)
+        self.assertTrue(path.exists())
+
+
+@override_settings(PASSWORD_HASH_ITERATIONS=1000, PASSWORD_HASHING_WORKERS=1)
+class PasswordHashingTests(APITestCase):
+    def setUp(self):
+        self.addCleanup(hashers.shutdown_pool)
+
+    def test_hashes_in_the_pool(self):
+        encoded = make_password('secret123')
+        self.assertTrue(encoded.startswith('pbkdf2_sha256$1000$'))
+        self.assertIsNotNone(hashers._pool)
+        self.assertTrue(check_password('secret123', encoded))
+        self.assertFalse(check_password('wrong', encoded))
+        # Django's own hasher reads the same hashes
+        plain = hashers.hashers.PBKDF2PasswordHasher()
+        plain.iterations = 1000
+        self.assertEqual(encoded, plain.encode('secret123', encoded.split('$')[2]))
+
+    @override_settings(PASSWORD_HASHING_WORKERS=0)
+    def test_inline(self):
+        self.assertTrue(check_password('secret123', make_password('secret123')))
+        self.assertIsNone(hashers._pool)
+
+    def test_login_rehashes_after_iterations_change(self):
+        user = User.objects.create_user(username='hashed', password='existingpass123')
+        with override_settings(PASSWORD_HASH_ITERATIONS=2000):
+            response = self.client.post(reverse('users:token_obtain_pair'),
+                                        {'username': 'hashed', 'password': 'existingpass123'},
+                                        format='json')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        user.refresh_from_db()
+        self.assertTrue(user.password.startswith('pbkdf2_sha256$2000$'))
+
+    def test_async(self):
+        encoded = async_to_sync(hashers.amake_password)('secret123')
+        self.assertTrue(encoded.startswith('pbkdf2_sha256$1000$'))
+        self.assertTrue(async_to_sync(hashers.acheck_password)('secret123', encoded))
+        self.assertFalse(async_to_sync(hashers.acheck_password)('wrong', encoded))
+        self.assertFalse(async_to_sync(hashers.acheck_password)(None, encoded))
+
+        updated = []
+
+        async def setter(password):
+            updated.append(password)
+        with override_settings(PASSWORD_HASH_ITERATIONS=2000):
+            self.assertTrue(async_to_sync(hashers.acheck_password)('secret123', encoded, setter))
+        self.assertEqual(updated, ['secret123'])
+        # Other hashers are checked on a thread
+        sha1 = make_password('secret123', hasher='pbkdf2_sha1')
+        self.assertTrue(async_to_sync(hashers.acheck_password)('secret123', sha1))
+
+
+class GenerateLoadDataTests(TestCase):
+    def setUp(self):
+        self.tariff = Tariff.objects.create(name='Basic', description='Basic', price='10.00')
+
+    def generate(self, **options):
+        call_command('generate_load_data', stdout=StringIO(), **options)
+
+    def test_generates_users_and_orders(self):
+        self.generate(users=5, orders=50, batch_size=20,
+                      status_weights='NEW=1,COMPLETED=1', deleted_ratio=0)
+
+        users = User.objects.filter(username__startswith='load-')
+        self.assertEqual(users.count(), 5)
+        self.assertEqual(len(set(users.values_list('password', flat=True))), 1)
+        self.assertTrue(users.first().check_password('loadtest123'))
+
+        orders = Order.objects.all()
+        self.assertEqual(orders.count(), 50)
+        self.assertEqual(set(orders.values_list('status', flat=True)) - {'NEW', 'COMPLETED'}, set())
+        self.assertFalse(orders.filter(is_deleted=True).exists())
+        self.assertEqual(orders.filter(total_price=self.tariff.price).count(), 50)
+        # created_at is spread out rather than stamped by auto_now_add
+        self.assertGreater(len(set(orders.values_list('created_at', flat=True))), 1)
+        self.assertEqual(Order.objects.filter(created_at__gt=timezone.now()).count(), 0)
+
+    def test_same_seed_produces_same_orders(self):
+        self.generate(users=3, orders=10, seed=7)
+        first = list(Order.objects.order_by('id').values_list('project_description', flat=True))
+        Order.objects.all().delete()
+        self.generate(users=0, orders=10, seed=7)
+        second = list(Order.objects.order_by('id').values_list('project_description', flat=True))
+        self.assertEqual(first, second)
+
+    def test_generated_orders_are_searchable(self):
+        self.generate(users=2, orders=20)
+        order = Order.objects.first()
+        word = order.project_name.split()[-1]
+        self.assertTrue(search.get_index(Order).search(Order.objects.all(), word).exists())
+
+    def test_invalid_options(self):
+        with self.assertRaises(CommandError):
+            self.generate(orders=1, status_weights='UNKNOWN=1')
+        with self.assertRaises(CommandError):
+            self.generate(orders=1, deadline_days='10:5')
@@ -0,0 +1,74 @@
+import itertools
+import time
+import uuid
+
+from django.conf import settings
+from django.db import IntegrityError, transaction
+from django.utils.translation import gettext_lazy as _
+from rest_framework_simplejwt.exceptions import TokenError
+from rest_framework_simplejwt.settings import api_settings
+from rest_framework_simplejwt.tokens import RefreshToken
+
+from .models import BlacklistedToken, StatelessUser
+
+# Blacklisted tokens in this process, for TOKEN_BLACKLIST_PURGE_INTERVAL
+blacklisted = itertools.count(1)
+
+
+def purge_blacklist(batch_size=None):
+    """Delete up to ``batch_size`` expired blacklist entries and return how many."""
+    batch_size = batch_size or settings.TOKEN_BLACKLIST_PURGE_BATCH
+    expired = (BlacklistedToken.objects.filter(expires__lt=int(time.time()))
+               .order_by().values('pk')[:batch_size])
+    deleted, _ = BlacklistedToken.objects.filter(pk__in=expired).delete()
+    return deleted
+
+
+class UserRefreshToken(RefreshToken):
+    """
+    Refresh token carrying the claims StatelessJWTAuthentication needs.
+
+    The claims are read from the user at login and again at every refresh
+    (UserTokenRefreshSerializer), so an access token's claims lag behind
+    the database for at most ACCESS_TOKEN_LIFETIME.
+
+    A rotated token is blacklisted (``BlacklistedToken``) until it expires.
+    Expired entries are purged in batches as new ones come in.
+    """
+
+    @classmethod
+    def for_user(cls, user):
+        token = super().for_user(user)
+        token.set_user_claims(user)
+        return token
+
+    def set_user_claims(self, user):
+        for name in StatelessUser.CLAIM_FIELDS:
+            self[name] = getattr(user, name)
+
+    def verify(self):
+        super().verify()
+        self.check_blacklist()
+
+    def jti(self):
+        try:
+            return uuid.UUID(self.payload[api_settings.JTI_CLAIM])
+        except (KeyError, TypeError, ValueError):
+            raise TokenError(_('Token has no id'))
+
+    def check_blacklist(self):
+        if BlacklistedToken.objects.filter(pk=self.jti()).exists():
+            raise TokenError(_('Token is blacklisted'))
+
+    def blacklist(self):
+        # The insert fails for the second of two concurrent refreshes with
+        # the same token, so only one of them gets a new token.
+        try:
+            with transaction.atomic():
+                token = BlacklistedToken.objects.create(jti=self.jti(), expires=self['exp'])
+        except IntegrityError:
+            raise TokenError(_('Token is blacklisted'))
+        interval = settings.TOKEN_BLACKLIST_PURGE_INTERVAL
+        if interval and next(blacklisted) % interval == 0:
+            purge_blacklist()
+        return token
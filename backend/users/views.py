@@ -2,6 +2,8 @@ from rest_framework import generics, permissions, status
 from rest_framework.response import Response
 from rest_framework_simplejwt.views import TokenObtainPairView
 from django.contrib.auth import get_user_model
+from config.conditional import ConditionalRetrieveMixin
+from config.throttling import CredentialThrottle, SlidingWindowThrottle
 from .serializers import (
     UserRegistrationSerializer,
     UserSerializer,
@@ -11,15 +13,27 @@ from .serializers import (
 User = get_user_model()
 
 
+class TokenObtainView(TokenObtainPairView):
+    # Every attempt hashes a password: limit attempts per address and per
+    # account, before the serializer runs.
+    throttle_classes = (SlidingWindowThrottle, CredentialThrottle)
+    throttle_scope = 'login'
+    credential_throttle_scope = 'login_account'
+
+
 class RegisterView(generics.CreateAPIView):
     queryset = User.objects.all()
     permission_classes = (permissions.AllowAny,)
     serializer_class = UserRegistrationSerializer
+    throttle_classes = (SlidingWindowThrottle,)
+    throttle_scope = 'register'
 
 
-class UserDetailView(generics.RetrieveAPIView):
+class UserDetailView(ConditionalRetrieveMixin, generics.RetrieveAPIView):
     serializer_class = UserSerializer
     permission_classes = (permissions.IsAuthenticated,)
+    # Logging in only saves last_login
+    etag_fields = ('updated_at', 'last_login')
 
     def get_object(self):
         return self.request.user
@@ -144,7 +144,9 @@ class AuthManager {
 
     // Get user orders
     async getUserOrders() {
-        const response = await this.makeAuthenticatedRequest(`${this.baseURL}/api/v1/orders/`);
+        // The profile only shows a summary card per order
+        const fields = 'id,project_name,status,created_at';
+        const response = await this.makeAuthenticatedRequest(`${this.baseURL}/api/v1/orders/?fields=${fields}`);
         
         if (response.ok) {
             return await response.json();